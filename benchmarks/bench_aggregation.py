@@ -0,0 +1,63 @@
+"""Compare the streaming report with the pure Python and NumPy columnar backends.
+
+Usage: python3 benchmarks/bench_aggregation.py [--rows N] [--files N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate_history import write_history
+from timetracking_reports import build_report
+from timetracking_vectorized import has_numpy, load_columns
+
+def timed(label, fn):
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<40} {elapsed:8.3f}s")
+    return result, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000, help="rows per file")
+    parser.add_argument('--files', type=int, default=5, help="number of CSV files to roll up")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, f"entries_{i}.csv") for i in range(args.files)]
+        for i, path in enumerate(paths):
+            write_history(path, args.rows, seed_day=i)
+        print(f"{args.files} files x {args.rows} rows")
+
+        def streaming():
+            totals = {}
+            for path in paths:
+                for project, minutes in build_report(path).by_project.items():
+                    totals[project] = totals.get(project, 0) + minutes
+            return totals
+
+        expected, baseline = timed("streaming report (per-row datetime)", streaming)
+        python_result, python_time = timed(
+            "columnar, pure Python", lambda: load_columns(paths, use_numpy=False).project_minutes()
+        )
+        assert python_result == expected
+
+        if not has_numpy():
+            print("NumPy is not installed; skipping the vectorized backend")
+            return
+
+        columns, load_time = timed("columnar, NumPy load", lambda: load_columns(paths))
+        numpy_result, aggregate_time = timed("columnar, NumPy aggregate", columns.project_minutes)
+        timed("columnar, NumPy histograms", lambda: (columns.duration_histogram(), columns.start_hour_histogram()))
+        assert numpy_result == expected
+
+        print(f"NumPy speedup over streaming report: {baseline / (load_time + aggregate_time):.1f}x "
+              f"(aggregate alone: {baseline / aggregate_time:.0f}x)")
+        print(f"NumPy speedup over pure Python columns: {python_time / (load_time + aggregate_time):.1f}x")
+
+if __name__ == "__main__":
+    main()
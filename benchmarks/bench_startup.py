@@ -0,0 +1,64 @@
+"""Check that headless CLI commands start within STARTUP_BUDGET_MS and never load PySide6.
+
+Usage: python3 benchmarks/bench_startup.py [--runs N]
+Exits non-zero if a command goes over budget or imports PySide6.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from timetracking_cli import STARTUP_BUDGET_MS
+
+CLI = os.path.join(ROOT, 'timetracking_cli.py')
+COMMANDS = [
+    ['projects', 'list'],
+    ['add', 'Benchmark', '--start', '2024-01-02 09:30'],
+    ['report', '--days', '1', '--weeks', '1'],
+    ['export', '-o', os.devnull],
+]
+
+def median_ms(argv, cwd, runs):
+    """Median wall-clock time of running argv, in milliseconds."""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(argv, cwd=cwd, check=True, stdout=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=15)
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = median_ms([sys.executable, '-c', 'pass'], tmp, args.runs)
+        print(f"{'python3 -c pass':<40} {baseline:7.1f} ms")
+        for command in COMMANDS:
+            argv = [sys.executable, CLI] + command
+            overhead = median_ms(argv, tmp, args.runs) - baseline
+
+            imports = subprocess.run(
+                [sys.executable, '-X', 'importtime', CLI] + command,
+                cwd=tmp, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+            ).stderr
+            loads_qt = 'PySide6' in imports
+
+            ok = overhead <= STARTUP_BUDGET_MS and not loads_qt
+            failed |= not ok
+            note = " (imports PySide6!)" if loads_qt else ""
+            print(f"{' '.join(command):<40} +{overhead:6.1f} ms  "
+                  f"{'ok' if ok else 'OVER BUDGET'}{note}")
+    print(f"Budget: +{STARTUP_BUDGET_MS} ms over a bare interpreter")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Generate a synthetic timetracking_entries.csv and timetracking_projects.json.
+
+Usage: python3 benchmarks/generate_history.py [--rows N] [--projects N] [--dir DIR]
+Rows are written in day-sized chunks without going through csv or strftime
+per row, so even 10M rows take well under a minute.
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timetracking_core import CSV_FILE, CSV_HEADERS, PROJECTS_FILE
+
+# The scheduler's 17 half-hour slots, 09:30-10:00 through 17:30-18:00
+SLOTS_PER_DAY = 17
+_SLOT_TIMES = [
+    (f"{minute // 60:02d}:{minute % 60:02d}", f"{(minute + 30) // 60:02d}:{(minute + 30) % 60:02d}")
+    for minute in range(9 * 60 + 30, 9 * 60 + 30 + 30 * SLOTS_PER_DAY, 30)
+]
+
+def project_names(count):
+    """Return count synthetic project names."""
+    return [f"Project {i}" for i in range(count)]
+
+def write_projects(path, count):
+    """Write a projects file with count synthetic projects."""
+    with open(path, 'w') as f:
+        json.dump(project_names(count), f)
+
+def write_history(path, rows, seed_day=0, projects=23):
+    """Write a synthetic entries CSV with 17 half-hour entries per day.
+
+    The output is byte-for-byte what the entry writer would produce for the
+    same entries (CSV quoting rules never kick in for these names).
+    """
+    names = project_names(projects)
+    day = datetime.date(2015, 1, 5) + datetime.timedelta(days=seed_day)
+    with open(path, 'w', newline='') as f:
+        f.write(",".join(CSV_HEADERS) + "\r\n")
+        written = 0
+        while written < rows:
+            date = day.strftime("%m/%d/%Y")
+            lines = []
+            for slot in range(min(SLOTS_PER_DAY, rows - written)):
+                project = names[(written + slot) % projects]
+                start, end = _SLOT_TIMES[slot]
+                lines.append(f"Timetracking: {project},{date},{start},{date},{end},"
+                             f"Time tracking for {project}\r\n")
+            f.write("".join(lines))
+            written += len(lines)
+            day += datetime.timedelta(days=1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000, help="entries to write (default: 100000)")
+    parser.add_argument('--projects', type=int, default=23, help="distinct projects (default: 23)")
+    parser.add_argument('--dir', default='.', help="directory to write the two files into")
+    args = parser.parse_args()
+
+    os.makedirs(args.dir, exist_ok=True)
+    write_history(os.path.join(args.dir, CSV_FILE), args.rows, projects=args.projects)
+    write_projects(os.path.join(args.dir, PROJECTS_FILE), args.projects)
+    print(f"Wrote {args.rows} entries over {args.projects} projects to {os.path.abspath(args.dir)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""Run the benchmark suite offscreen and save the results as JSON.
+
+Usage: python3 benchmarks/run_benchmarks.py [--sizes 1000,100000] [--output FILE] [--compare FILE]
+Everything runs in a scratch directory against generated history, so your
+own entries are never touched. Pass an earlier results file to --compare to
+see what got slower.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# No display needed for the dialog benchmarks
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from generate_history import write_history, write_projects
+from timetracking_calendar import WorkCalendar
+from timetracking_core import build_csv_row, load_projects
+from timetracking_storage import CsvStorage
+from timetracking_writer import EntryWriter
+
+# A result this much slower than the compared run is flagged
+REGRESSION_RATIO = 1.2
+
+def measure(name, fn, number=1, repeat=5, rows=None, items=None):
+    """Time fn: best and median seconds per call over repeat runs of number calls.
+
+    items is how many things one call processes (rows, entries...), used for
+    the throughput column.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - started) / number)
+    median = statistics.median(timings)
+    result = {
+        'name': name, 'rows': rows, 'best': min(timings), 'median': median,
+        'number': number, 'repeat': repeat,
+        'per_second': (items or 1) / median if median else None,
+    }
+    print(f"{name:<44} {'' if rows is None else rows:>9} {median * 1000:11.3f} ms"
+          f"  {result['per_second']:14,.0f}/s")
+    return result
+
+def bench_rounding():
+    now = datetime.datetime(2024, 3, 4, 14, 47, 12)
+    calendar = WorkCalendar()
+    return [measure("WorkCalendar.round_down", lambda: calendar.round_down(now), number=100_000)]
+
+def bench_entry_writes(tmp):
+    """What create_csv_entries does: build the row and hand it to the writer."""
+    results = []
+    slot = datetime.datetime(2024, 3, 4, 9, 30)
+    end = slot + datetime.timedelta(minutes=30)
+
+    path = os.path.join(tmp, 'writes.csv')
+    writer = EntryWriter(storage=CsvStorage(path)).start()
+
+    def one_at_a_time():
+        writer.submit(build_csv_row("Project", slot, end)).result()
+    results.append(measure("create_csv_entries, waiting for each", one_at_a_time, number=200))
+
+    def batched(count=5000):
+        futures = [writer.submit(build_csv_row("Project", slot, end)) for _ in range(count)]
+        for future in futures:
+            future.result()
+    results.append(measure("create_csv_entries, 5000 queued", batched, repeat=3, items=5000))
+    writer.close()
+    return results
+
+def bench_ingest(tmp, count=5000):
+    """Entries sent through the remote writer to an ingestion server on localhost."""
+    import asyncio
+    import threading
+    from timetracking_remote import RemoteEntryWriter
+    from timetracking_server import IngestServer
+
+    loop = asyncio.new_event_loop()
+    server = IngestServer(storage=CsvStorage(os.path.join(tmp, 'ingest.csv')), port=0)
+    loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    slot = datetime.datetime(2024, 3, 4, 9, 30)
+    row = build_csv_row("Project", slot, slot + datetime.timedelta(minutes=30))
+    writers = [RemoteEntryWriter(f"http://127.0.0.1:{server.port}", spool_path=os.path.join(tmp, 'spool.jsonl'))
+               for _ in range(4)]
+
+    def one_at_a_time():
+        writers[0].submit(row).result()
+
+    def queued():
+        futures = [writers[i % len(writers)].submit(row) for i in range(count)]
+        for future in futures:
+            future.result()
+    results = [
+        measure("ingest server, waiting for each", one_at_a_time, number=200),
+        measure(f"ingest server, {count} queued from 4 clients", queued, repeat=3, items=count),
+    ]
+    for writer in writers:
+        writer.close()
+    asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+    return results
+
+def bench_projects(tmp, count=5000):
+    from timetracking_catalog import ProjectCatalog, ProjectIndex
+
+    results = []
+    cwd = os.getcwd()
+    os.chdir(tmp)
+    try:
+        write_projects('timetracking_projects.json', count)
+        results.append(measure(f"load_projects ({count} projects)", load_projects, number=20))
+        catalog = ProjectCatalog(CsvStorage())
+        catalog.projects()
+        results.append(measure(f"catalog projects, cached ({count})", catalog.projects, number=1000))
+        results.append(measure(f"ProjectIndex build ({count})", lambda: ProjectIndex(load_projects()), number=5))
+        index = catalog.index()
+        results.append(measure(f"ProjectIndex search ({count})", lambda: index.search("ject 12"), number=1000))
+    finally:
+        os.chdir(cwd)
+    return results
+
+def bench_dialogs(count=500):
+    try:
+        from PySide6.QtWidgets import QApplication
+    except ImportError:
+        print("PySide6 is not installed; skipping dialog benchmarks")
+        return []
+    app = QApplication.instance() or QApplication([])
+    import timetracking_csv
+
+    projects = [f"Project {i}" for i in range(count)]
+    results = []
+
+    def construct():
+        timetracking_csv.TimeEntryDialog(projects, use_scheduler=True).deleteLater()
+        app.processEvents()
+    results.append(measure(f"TimeEntryDialog construction ({count} projects)", construct, number=10))
+
+    dialog = timetracking_csv.TimeEntryDialog(projects, use_scheduler=True)
+    results.append(measure(f"TimeEntryDialog.prepare reuse ({count} projects)",
+                           lambda: dialog.prepare(projects), number=100))
+    return results
+
+def bench_scans(tmp, rows):
+    from timetracking_index import DateIndex
+    from timetracking_vectorized import has_numpy, load_columns
+
+    path = os.path.join(tmp, f'history_{rows}.csv')
+    write_history(path, rows)
+    storage = CsvStorage(path)
+    repeat = 3 if rows <= 1_000_000 else 1
+    results = [
+        measure("full scan: iterate rows", lambda: sum(1 for _ in storage.iter_rows()),
+                repeat=repeat, rows=rows, items=rows),
+        measure("full scan: build_report", storage.build_report, repeat=repeat, rows=rows, items=rows),
+    ]
+    if has_numpy():
+        results.append(measure("full scan: NumPy columns + totals",
+                               lambda: load_columns([path]).project_minutes(),
+                               repeat=repeat, rows=rows, items=rows))
+
+    if rows >= 100_000:
+        results += bench_parallel_report(storage, rows, repeat)
+
+    # Read the last week through a loaded date index, as the app's shared index does
+    index = DateIndex(path)
+    results.append(measure("date index: build sidecar", index.rebuild, repeat=repeat, rows=rows, items=rows))
+    last_day = datetime.date(2015, 1, 5) + datetime.timedelta(days=max(0, rows // 17 - 1))
+    week = (last_day - datetime.timedelta(days=6), last_day)
+    results.append(measure("ranged read: last 7 days via date index",
+                           lambda: sum(1 for _ in index.read_rows(*week)),
+                           number=10, rows=rows))
+    return results
+
+def bench_parallel_report(storage, rows, repeat):
+    """build_report on 1, 2, 4 and 8 worker processes, pool start-up included."""
+    import timetracking_parallel
+    # Use the pool even for histories below the usual size cut-off
+    min_bytes = timetracking_parallel.PARALLEL_MIN_BYTES
+    timetracking_parallel.PARALLEL_MIN_BYTES = 0
+    results = []
+    try:
+        for workers in (1, 2, 4, 8):
+            results.append(measure(f"full scan: build_report, workers={workers}",
+                                   lambda: storage.build_report(workers=workers),
+                                   repeat=repeat, rows=rows, items=rows))
+    finally:
+        timetracking_parallel.PARALLEL_MIN_BYTES = min_bytes
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, old_path):
+    """Print each benchmark's change against an earlier results file."""
+    with open(old_path) as f:
+        old = {(r['name'], r['rows']): r for r in json.load(f)['results']}
+    print(f"\nCompared with {old_path}:")
+    regressions = 0
+    for result in results:
+        before = old.get((result['name'], result['rows']))
+        if before is None:
+            continue
+        ratio = result['median'] / before['median'] if before['median'] else 1.0
+        flag = ""
+        if ratio > REGRESSION_RATIO:
+            flag = "  SLOWER"
+            regressions += 1
+        rows = '' if result['rows'] is None else result['rows']
+        print(f"{result['name']:<44} {rows:>9} {ratio:6.2f}x{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help="history sizes for the scan benchmarks, comma separated "
+                             "(default: 1000,10000,100000; up to 10000000)")
+    parser.add_argument('--output', default='benchmark-results.json', help="where to write the results")
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        results += bench_rounding()
+        results += bench_entry_writes(tmp)
+        results += bench_ingest(tmp)
+        results += bench_projects(tmp)
+        results += bench_dialogs()
+        for rows in sizes:
+            results += bench_scans(tmp, rows)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sizes': sizes,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {os.path.abspath(args.output)}")
+
+    if args.compare:
+        sys.exit(1 if compare(results, args.compare) else 0)
+
+if __name__ == "__main__":
+    main()
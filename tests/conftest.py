@@ -0,0 +1,30 @@
+"""Shared fixtures: the tests import the flat timetracking_* modules from the repo root."""
+import datetime
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from timetracking_core import build_csv_row
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    """Run every test in its own folder, so files with default names never touch the repo."""
+    import timetracking_index
+    import timetracking_storage
+    monkeypatch.chdir(tmp_path)
+    # The shared storage and index hold state for the folder they were first used in
+    monkeypatch.setattr(timetracking_storage, '_storage', {})
+    monkeypatch.setattr(timetracking_index, '_default_index', None)
+    return tmp_path
+
+def entry(project, day, start, minutes=30, description=''):
+    """Return a CSV row dict for project on day (a date) from 'HH:MM', minutes long."""
+    hour, minute = map(int, start.split(':'))
+    started = datetime.datetime.combine(day, datetime.time(hour, minute))
+    row = build_csv_row(project, started, started + datetime.timedelta(minutes=minutes))
+    row['Description'] = description or row['Description']
+    return row
@@ -0,0 +1,34 @@
+import datetime
+
+from conftest import entry
+from timetracking_cli import main
+from timetracking_storage import get_storage
+
+DAY = datetime.date(2024, 3, 4)
+
+def test_report_and_export_without_an_entries_csv(capsys):
+    assert main(['report']) == 0
+    assert main(['export', '-o', '-']) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == 'Subject,Start Date,Start Time,End Date,End Time,Description'
+
+def test_export_to_an_unwritable_path_is_an_error(capsys, tmp_path):
+    assert main(['export', '-o', str(tmp_path / 'missing' / 'out.csv')]) == 1
+    assert capsys.readouterr().err.startswith('Error: ')
+
+def test_overlaps_lists_pairs_and_reports_unreadable_storage(capsys, tmp_path):
+    storage = get_storage()
+    storage.initialize()
+    storage.append_rows([entry('A', DAY, '09:00', 60), entry('B', DAY, '09:30')])
+    assert main(['overlaps']) == 1
+    assert '1 overlapping pairs' in capsys.readouterr().out
+
+    # An edit log that can't be read
+    (tmp_path / 'timetracking_entries.csv.edits').mkdir()
+    assert main(['overlaps']) == 2
+    assert capsys.readouterr().err.startswith('Error: ')
+
+def test_fold_reports_an_unreadable_edit_log(capsys, tmp_path):
+    get_storage().initialize()
+    (tmp_path / 'timetracking_entries.csv.edits').mkdir()
+    assert main(['entries', '--fold']) == 2
+    assert capsys.readouterr().err.startswith('Error: ')
@@ -0,0 +1,105 @@
+import datetime
+import threading
+
+import pytest
+
+import timetracking_edits
+from conftest import entry
+from timetracking_storage import CsvStorage, StorageError
+
+DAY = datetime.date(2024, 3, 4)
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = CsvStorage(str(tmp_path / 'entries.csv'), partition_by_month=False)
+    storage.initialize()
+    storage.append_rows([entry('A', DAY, '09:00'), entry('B', DAY, '10:00'), entry('Twin', DAY, '12:00'),
+                         entry('Twin', DAY, '12:00')])
+    storage.compact()
+    # Folds only when a test asks for one
+    with storage.folds_suspended():
+        yield storage
+
+def ids(storage, subject):
+    return [row_id for row_id, row in storage.find_entries(DAY, DAY) if row[0] == f"Timetracking: {subject}"]
+
+def subjects(storage):
+    return sorted(row[0].split(': ')[1] for row in storage.iter_rows())
+
+def test_updates_and_deletes_apply_on_read(storage):
+    a, = ids(storage, 'A')
+    storage.update_entry(a, entry('A2', DAY, '09:00'))
+    storage.delete_entry(ids(storage, 'B')[0])
+
+    assert subjects(storage) == ['A2', 'Twin', 'Twin']
+    assert storage.entry(a)[0] == 'Timetracking: A2'
+
+def test_an_edit_changes_one_of_identical_rows(storage):
+    storage.delete_entry(ids(storage, 'Twin')[0])
+    assert subjects(storage) == ['A', 'B', 'Twin']
+
+    storage.fold_edits()
+
+    assert subjects(storage) == ['A', 'B', 'Twin']
+
+def test_unknown_ids_are_refused(storage):
+    with pytest.raises(StorageError):
+        storage.delete_entry('20240304-000000000000')
+    with pytest.raises(StorageError):
+        storage.delete_entry('not an id')
+
+def test_fold_writes_the_edits_into_the_csv_and_counts_a_generation(storage):
+    storage.update_entry(ids(storage, 'A')[0], entry('A2', DAY, '09:00'))
+    assert storage.edits().snapshot()[2] == 0
+
+    assert storage.fold_edits() == 1
+
+    live, _, generation = storage.edits().snapshot()
+    assert (live, generation) == ({}, 1)
+    with open(storage.path) as f:
+        assert 'A2' in f.read()
+    assert subjects(storage) == ['A2', 'B', 'Twin', 'Twin']
+
+    storage.delete_entry(ids(storage, 'B')[0])
+    storage.fold_edits()
+    assert storage.edits().snapshot()[2] == 2
+    assert subjects(storage) == ['A2', 'Twin', 'Twin']
+
+def test_an_edit_made_during_a_fold_is_kept(storage, monkeypatch):
+    storage.update_entry(ids(storage, 'A')[0], entry('A2', DAY, '09:00'))
+    b, = ids(storage, 'B')
+    paused, resume = threading.Event(), threading.Event()
+    real_apply = timetracking_edits.apply_in_place
+
+    def apply_in_place(rows, live, dates, remaining):
+        paused.set()
+        resume.wait(10)
+        return real_apply(rows, live, dates, remaining)
+    monkeypatch.setattr(timetracking_edits, 'apply_in_place', apply_in_place)
+    fold = threading.Thread(target=storage.fold_edits)
+    fold.start()
+    assert paused.wait(10)
+
+    # Waits for the fold's locks
+    edit = threading.Thread(target=storage.update_entry, args=(b, entry('B2', DAY, '10:00')))
+    edit.start()
+    resume.set()
+    fold.join(10)
+    edit.join(10)
+
+    assert subjects(storage) == ['A2', 'B2', 'Twin', 'Twin']
+    storage.fold_edits()
+    assert subjects(storage) == ['A2', 'B2', 'Twin', 'Twin']
+
+def test_a_read_that_a_fold_overtakes_applies_each_edit_once(storage):
+    storage.append_rows([entry('Later', DAY + datetime.timedelta(days=1), '09:00')])
+    storage.compact()
+    storage.update_entry(ids(storage, 'A')[0], entry('A2', DAY, '09:00'))
+    storage.delete_entry(ids(storage, 'Twin')[0])
+
+    reader = storage.iter_rows()
+    first = next(reader)
+    storage.fold_edits()
+    rows = [first] + list(reader)
+
+    assert sorted(row[0].split(': ')[1] for row in rows) == ['A2', 'B', 'Later', 'Twin']
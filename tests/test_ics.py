@@ -0,0 +1,80 @@
+import datetime
+import io
+
+from conftest import entry
+from timetracking_core import CSV_HEADERS
+from timetracking_ics import event_entry, import_ics, iter_events, seen_uids, write_ics
+from timetracking_overlaps import OverlapIndex, OverlapPolicy
+from timetracking_storage import CsvStorage
+
+DAY = datetime.date(2024, 3, 4)
+
+def as_lists(rows):
+    return [[row[name] for name in CSV_HEADERS] for row in rows]
+
+def export(rows):
+    out = io.StringIO(newline='')
+    write_ics(as_lists(rows), out, stamp=datetime.datetime(2024, 3, 5, tzinfo=datetime.timezone.utc))
+    return out.getvalue()
+
+def import_into(storage, text, policy=None):
+    return import_ics(io.StringIO(text, newline=''), storage.append_rows, seen_uids(storage.iter_rows()),
+                      OverlapIndex(storage), policy)
+
+def new_storage(tmp_path, name):
+    storage = CsvStorage(str(tmp_path / name))
+    storage.initialize()
+    return storage
+
+def test_export_then_import_twice_adds_each_entry_once(tmp_path):
+    rows = [entry('A', DAY, '09:00', description='Notes, with; commas\nand lines'),
+            entry('B', DAY, '10:00', description='Ünïcode ' * 20),
+            entry('A', DAY + datetime.timedelta(days=1), '09:00')]
+    text = export(rows)
+    storage = new_storage(tmp_path, 'entries.csv')
+
+    added, duplicates, skipped, rejected = import_into(storage, text)
+    assert (added, duplicates, skipped, rejected) == (3, 0, 0, [])
+    assert sorted(storage.iter_rows()) == sorted(as_lists(rows))
+
+    added, duplicates, _, _ = import_into(storage, text)
+    assert (added, duplicates) == (0, 3)
+    assert len(list(storage.iter_rows())) == 3
+
+def test_importing_an_export_of_the_same_entries_adds_nothing(tmp_path):
+    storage = new_storage(tmp_path, 'entries.csv')
+    storage.append_rows([entry('A', DAY, '09:00')])
+
+    added, duplicates, _, _ = import_into(storage, export([entry('A', DAY, '09:00')]))
+
+    assert (added, duplicates) == (0, 1)
+
+def test_overlapping_events_follow_the_policy(tmp_path):
+    storage = new_storage(tmp_path, 'entries.csv')
+    storage.append_rows([entry('A', DAY, '09:00', 60)])
+    text = export([entry('C', DAY, '09:30', 60)])
+
+    added, _, _, rejected = import_into(storage, text)
+    assert added == 0 and len(rejected) == 1
+
+    added, _, _, rejected = import_into(storage, text, OverlapPolicy.TRIM)
+    assert (added, rejected) == (1, [])
+    assert [row[2:5] for row in storage.iter_rows() if row[0] == 'Timetracking: C'] == [
+        ['10:00', '03/04/2024', '10:30']]
+
+CALENDAR = (
+    "BEGIN:VCALENDAR\r\n"
+    "BEGIN:VEVENT\r\nSUMMARY:Folded\r\n  project\r\nDTSTART:20240304T090000\r\nDURATION:PT1H30M\r\n"
+    "BEGIN:VALARM\r\nSUMMARY:Alarm\r\nEND:VALARM\r\nEND:VEVENT\r\n"
+    "BEGIN:VEVENT\r\nSUMMARY:All day\r\nDTSTART;VALUE=DATE:20240304\r\nEND:VEVENT\r\n"
+    "BEGIN:VEVENT\r\nSUMMARY:Cancelled\r\nSTATUS:CANCELLED\r\n"
+    "DTSTART:20240304T090000\r\nDTEND:20240304T100000\r\nEND:VEVENT\r\n"
+    "BEGIN:VEVENT\r\nSUMMARY:Backwards\r\nDTSTART:20240304T100000\r\nDTEND:20240304T090000\r\nEND:VEVENT\r\n"
+    "END:VCALENDAR\r\n"
+)
+
+def test_parser_unfolds_lines_and_leaves_out_events_that_are_not_entries():
+    entries = [event_entry(event) for event in iter_events(CALENDAR.splitlines(keepends=True))]
+
+    at = datetime.datetime(2024, 3, 4, 9, 0)
+    assert entries == [('Folded project', at, at + datetime.timedelta(minutes=90)), None, None, None]
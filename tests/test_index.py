@@ -0,0 +1,54 @@
+import datetime
+
+import pytest
+
+from conftest import entry
+from timetracking_index import DateIndex
+from timetracking_storage import format_csv_rows
+
+MONDAY = datetime.date(2024, 3, 4)
+
+def write_csv(path, rows):
+    path.write_bytes(format_csv_rows(rows, header=True))
+
+def test_read_rows_returns_only_the_asked_dates(tmp_path):
+    path = tmp_path / 'entries.csv'
+    write_csv(path, [entry(f"P{day}", MONDAY + datetime.timedelta(days=day), '09:00') for day in range(7)])
+    index = DateIndex(str(path))
+
+    rows = list(index.read_rows(MONDAY + datetime.timedelta(days=2), MONDAY + datetime.timedelta(days=3)))
+
+    assert [row['Subject'] for row in rows] == ['Timetracking: P2', 'Timetracking: P3']
+
+def test_read_rows_streams(tmp_path):
+    path = tmp_path / 'entries.csv'
+    write_csv(path, [entry('A', MONDAY, '09:00'), entry('B', MONDAY, '09:30')])
+    index = DateIndex(str(path))
+
+    rows = index.read_rows(MONDAY, MONDAY)
+    assert next(rows)['Subject'] == 'Timetracking: A'
+    rows.close()
+
+def test_stale_offsets_rebuild_before_anything_is_yielded(tmp_path):
+    path = tmp_path / 'entries.csv'
+    write_csv(path, [entry('A', MONDAY, '09:00'), entry('B', MONDAY + datetime.timedelta(days=1), '09:00')])
+    index = DateIndex(str(path)).load()
+    # Same size, different order: the stamped offsets now point at the wrong days
+    write_csv(path, [entry('B', MONDAY + datetime.timedelta(days=1), '09:00'), entry('A', MONDAY, '09:00')])
+    index._signature = index._csv_signature()
+
+    rows = list(index.read_rows(MONDAY, MONDAY))
+
+    assert [row['Subject'] for row in rows] == ['Timetracking: A']
+
+def test_csv_changing_mid_read_raises(tmp_path):
+    path = tmp_path / 'entries.csv'
+    # More rows than one read buffer holds, so later rows come from the changed file
+    write_csv(path, [entry('A', MONDAY, '09:00')] * 2000)
+    index = DateIndex(str(path)).load()
+
+    reader = index.read_rows(MONDAY, MONDAY)
+    next(reader)
+    write_csv(path, [entry('X', MONDAY + datetime.timedelta(days=5), '09:00')] * 2000)
+    with pytest.raises(IOError):
+        list(reader)
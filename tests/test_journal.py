@@ -0,0 +1,94 @@
+import datetime
+import struct
+import zlib
+
+from conftest import entry
+from timetracking_core import CSV_HEADERS
+from timetracking_journal import EntryJournal
+from timetracking_storage import CsvStorage, format_csv_rows
+
+DAY = datetime.date(2024, 3, 4)
+
+def csv_rows(path):
+    with open(path, newline='') as f:
+        return [line.rstrip('\r\n') for line in f if line.strip()]
+
+def test_compact_moves_rows_and_reports_offsets(tmp_path):
+    path = str(tmp_path / 'entries.csv')
+    journal = EntryJournal(path)
+    journal.append(format_csv_rows([entry('A', DAY, '09:00')]))
+    journal.append(format_csv_rows([entry('B', DAY, '09:30'), entry('C', DAY, '10:00')]))
+
+    rows, offsets = journal.compact()
+
+    assert [row['Subject'] for row in rows] == ['Timetracking: A', 'Timetracking: B', 'Timetracking: C']
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert data.startswith(','.join(CSV_HEADERS).encode())
+    for row, offset in zip(rows, offsets):
+        assert data[offset:].startswith(row['Subject'].encode())
+    assert journal.size() == 0
+
+def test_torn_tail_is_dropped_and_later_records_survive(tmp_path):
+    path = str(tmp_path / 'entries.csv')
+    journal = EntryJournal(path)
+    journal.append(format_csv_rows([entry('A', DAY, '09:00')]))
+    # A writer died half-way through its record
+    payload = format_csv_rows([entry('Lost', DAY, '09:30')])
+    with open(journal.path, 'ab') as f:
+        f.write(struct.pack('<II', len(payload), zlib.crc32(payload)) + payload[:10])
+
+    journal.append(format_csv_rows([entry('B', DAY, '10:00')]))
+    rows, _ = journal.snapshot()
+
+    assert [row[0] for row in rows] == ['Timetracking: A', 'Timetracking: B']
+
+def test_record_with_a_bad_checksum_ends_the_journal(tmp_path):
+    path = str(tmp_path / 'entries.csv')
+    journal = EntryJournal(path)
+    journal.append(format_csv_rows([entry('A', DAY, '09:00')]))
+    payload = format_csv_rows([entry('Corrupt', DAY, '09:30')])
+    with open(journal.path, 'ab') as f:
+        f.write(struct.pack('<II', len(payload), zlib.crc32(payload) ^ 1) + payload)
+
+    rows, _ = journal.compact()
+
+    assert [row['Subject'] for row in rows] == ['Timetracking: A']
+    assert not any('Corrupt' in line for line in csv_rows(path))
+
+def test_interrupted_compaction_is_redone(tmp_path):
+    path = str(tmp_path / 'entries.csv')
+    storage = CsvStorage(path)
+    storage.initialize()
+    storage.append_rows([entry('A', DAY, '09:00')])
+    storage.compact()
+    base = (tmp_path / 'entries.csv').stat().st_size
+    storage.append_rows([entry('B', DAY, '09:30')])
+
+    journal = storage.journal
+    with journal._locked() as f:
+        payloads = journal._recover(f)
+        data = b''.join(payloads)
+        # The header says a copy started; the CSV only got half of it
+        journal._write_header(f, base, base + len(data))
+    with open(path, 'ab') as csvfile:
+        csvfile.write(data[:len(data) // 2])
+
+    CsvStorage(path).initialize()
+
+    lines = csv_rows(path)
+    assert [line.split(',')[0] for line in lines[1:]] == ['Timetracking: A', 'Timetracking: B']
+
+def test_csv_without_a_trailing_newline_keeps_its_last_row(tmp_path):
+    path = tmp_path / 'entries.csv'
+    hand_edited = format_csv_rows([entry('A', DAY, '09:00'), entry('Beta', DAY, '09:30')], header=True)
+    path.write_bytes(hand_edited.rstrip(b'\r\n'))
+    storage = CsvStorage(str(path))
+    storage.append_rows([entry('C', DAY, '10:00')])
+    expected_size = storage.entries_signature()[0]
+
+    storage.compact()
+
+    assert path.stat().st_size == expected_size
+    assert [row[0] for row in storage.iter_rows()] == [
+        'Timetracking: A', 'Timetracking: Beta', 'Timetracking: C']
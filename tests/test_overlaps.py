@@ -0,0 +1,73 @@
+import datetime
+import random
+
+import pytest
+
+from conftest import entry
+from timetracking_overlaps import (
+    IntervalTree, OverlapError, OverlapIndex, OverlapPolicy, find_overlaps
+)
+from timetracking_reports import Entry
+from timetracking_storage import CsvStorage
+
+DAY = datetime.date(2024, 3, 4)
+
+def at(time):
+    hour, minute = map(int, time.split(':'))
+    return datetime.datetime.combine(DAY, datetime.time(hour, minute))
+
+@pytest.fixture
+def index(tmp_path):
+    storage = CsvStorage(str(tmp_path / 'entries.csv'))
+    storage.initialize()
+    storage.append_rows([entry('A', DAY, '09:00', 60), entry('B', DAY, '11:00', 30)])
+    return OverlapIndex(storage)
+
+def test_reject_raises_with_the_overlapping_entries(index):
+    with pytest.raises(OverlapError) as raised:
+        index.resolve('C', at('09:30'), at('10:30'))
+    assert raised.value.overlaps == [Entry('A', at('09:00'), at('10:00'))]
+
+def test_free_slot_is_written_as_entered(index):
+    assert index.resolve('C', at('10:00'), at('11:00')) == [Entry('C', at('10:00'), at('11:00'))]
+
+def test_exact_duplicate_resolves_to_nothing(index):
+    for policy in OverlapPolicy:
+        assert index.resolve('A', at('09:00'), at('10:00'), policy) == []
+
+def test_trim_keeps_only_uncovered_time(index):
+    pieces = index.resolve('C', at('09:30'), at('12:00'), OverlapPolicy.TRIM)
+    assert pieces == [Entry('C', at('10:00'), at('11:00')), Entry('C', at('11:30'), at('12:00'))]
+
+def test_merge_only_trims_the_same_project(index):
+    pieces = index.resolve('A', at('09:30'), at('11:30'), OverlapPolicy.MERGE)
+    assert pieces == [Entry('A', at('10:00'), at('11:30'))]
+
+def test_allow_writes_it_anyway(index):
+    assert index.resolve('C', at('09:30'), at('10:30'), OverlapPolicy.ALLOW) == [
+        Entry('C', at('09:30'), at('10:30'))]
+
+def test_added_entries_are_seen_without_reading_storage(index):
+    index.overlapping(at('08:00'), at('09:00'))
+    index.add(Entry('D', at('13:00'), at('14:00')))
+    with pytest.raises(OverlapError):
+        index.resolve('C', at('13:30'), at('14:30'))
+
+def test_interval_tree_matches_a_linear_scan():
+    rng = random.Random(7)
+    entries = []
+    for i in range(500):
+        start = at('00:00') + datetime.timedelta(minutes=rng.randrange(0, 2000))
+        entries.append(Entry(f"P{i}", start, start + datetime.timedelta(minutes=rng.randrange(1, 120))))
+    tree = IntervalTree(entries)
+    for _ in range(100):
+        start = at('00:00') + datetime.timedelta(minutes=rng.randrange(0, 2000))
+        end = start + datetime.timedelta(minutes=rng.randrange(1, 240))
+        expected = [e for e in entries if e.start < end and e.end > start]
+        assert sorted(tree.overlapping(start, end)) == sorted(expected)
+
+def test_find_overlaps_marks_every_pair():
+    a = Entry('A', at('09:00'), at('10:00'))
+    b = Entry('B', at('09:30'), at('10:30'))
+    c = Entry('C', at('10:30'), at('11:00'))
+    assert list(find_overlaps([c, b, a, a])) == [(a, a), (a, b), (a, b)]
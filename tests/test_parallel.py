@@ -0,0 +1,62 @@
+import csv
+import datetime
+
+import pytest
+
+import timetracking_parallel
+from conftest import entry
+from timetracking_edits import entry_id
+from timetracking_storage import CsvStorage
+
+MONDAY = datetime.date(2024, 3, 4)
+
+def totals(report):
+    return ({day: dict(projects) for day, projects in report.by_day.items()},
+            {week: dict(projects) for week, projects in report.by_week.items()},
+            report.entry_count)
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = CsvStorage(str(tmp_path / 'entries.csv'), partition_by_month=False)
+    storage.initialize()
+    rows = [entry(f"P{i % 3}", MONDAY + datetime.timedelta(days=i % 10), '09:00', 15 + i % 4)
+            for i in range(60)]
+    # Identical rows share an id; an edit replaces only one of them
+    rows += [entry('Twin', MONDAY, '12:00', 45)] * 3
+    storage.append_rows(rows)
+    storage.compact()
+    return storage
+
+def edit_some(storage):
+    found = storage.find_entries(MONDAY, MONDAY + datetime.timedelta(days=9))
+    twin = next(row_id for row_id, row in found if row[0] == 'Timetracking: Twin')
+    others = [row_id for row_id, row in found if row[0] != 'Timetracking: Twin']
+    storage.update_entry(twin, entry('Twin', MONDAY, '12:00', 90))
+    storage.update_entry(others[0], entry('Moved', MONDAY + datetime.timedelta(days=20), '08:00', 60))
+    storage.delete_entries(others[1:4])
+    return others[4]
+
+@pytest.mark.parametrize('min_bytes', [None, 0])
+def test_parallel_matches_serial_with_edits(storage, monkeypatch, min_bytes):
+    if min_bytes is not None:
+        monkeypatch.setattr(timetracking_parallel, 'PARALLEL_MIN_BYTES', min_bytes)
+    # Keep the edits in the log rather than folded into the CSV
+    with storage.folds_suspended():
+        edit_some(storage)
+        storage.append_rows([entry('Pending', MONDAY, '18:00')])
+
+        for start, end in [(None, None), (MONDAY, MONDAY + datetime.timedelta(days=2))]:
+            assert totals(storage.build_report(start, end, workers=2)) == totals(
+                storage.build_report(start, end, workers=1))
+
+def test_edit_of_a_row_no_longer_stored_is_not_subtracted(storage):
+    with storage.folds_suspended():
+        edited = edit_some(storage)
+        storage.update_entry(edited, entry('Gone', MONDAY, '07:00', 30))
+        # The edited row is removed from the CSV by hand
+        with open(storage.path, newline='') as f:
+            stored = [row for row in csv.reader(f) if entry_id(row) != edited]
+        with open(storage.path, 'w', newline='') as f:
+            csv.writer(f).writerows(stored)
+
+        assert totals(storage.build_report(workers=2)) == totals(storage.build_report(workers=1))
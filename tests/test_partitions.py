@@ -0,0 +1,101 @@
+import datetime
+import os
+
+import pytest
+
+from conftest import entry
+from timetracking_partitions import PartitionArchive, archive_dir_for
+from timetracking_storage import CsvStorage
+
+MONTHS = [datetime.date(2024, 1, 15), datetime.date(2024, 2, 15), datetime.date(2024, 3, 15)]
+TODAY = datetime.date(2024, 3, 20)
+
+class Crash(Exception):
+    pass
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = CsvStorage(str(tmp_path / 'entries.csv'), partition_by_month=False)
+    storage.initialize()
+    storage.append_rows([entry(f"P{i}", day, '09:00') for i, day in enumerate(MONTHS)])
+    storage.compact()
+    return storage
+
+def subjects(rows):
+    return sorted(row[0] for row in rows)
+
+ALL = ['Timetracking: P0', 'Timetracking: P1', 'Timetracking: P2']
+
+def test_rotate_archives_earlier_months_and_reads_still_see_them(storage):
+    assert storage.rotate(TODAY) == 2
+
+    assert sorted(storage.archive().partitions()) == ['2024-01', '2024-02']
+    assert subjects(storage.iter_rows()) == ALL
+    assert subjects(storage.iter_rows(MONTHS[1], MONTHS[1])) == ['Timetracking: P1']
+    with open(storage.path) as f:
+        assert 'P0' not in f.read()
+
+def test_rotate_again_adds_to_an_archived_month(storage):
+    storage.rotate(TODAY)
+    storage.append_rows([entry('Late', MONTHS[0], '10:00')])
+    storage.compact()
+
+    assert storage.rotate(TODAY) == 1
+    assert subjects(storage.iter_rows(MONTHS[0], MONTHS[0])) == ['Timetracking: Late', 'Timetracking: P0']
+
+def test_rows_not_yet_exported_stay_in_the_csv(storage):
+    watermark = os.path.getsize(storage.path)
+    storage.append_rows([entry('New', MONTHS[0], '11:00')])
+    storage.compact()
+
+    moved, new_watermark = storage.archive().rotate(storage.path, TODAY.replace(day=1), watermark)
+
+    assert moved == 2
+    with open(storage.path, 'rb') as f:
+        f.seek(new_watermark)
+        assert f.read().startswith(b'Timetracking: New')
+
+def test_crash_after_the_commit_is_finished_on_start(storage, monkeypatch):
+    archive = storage.archive()
+    real_recover = archive.recover
+    calls = []
+
+    def recover(csv_path):
+        calls.append(csv_path)
+        if len(calls) == 2:
+            raise Crash()
+        real_recover(csv_path)
+    monkeypatch.setattr(archive, 'recover', recover)
+    with pytest.raises(Crash):
+        storage.rotate(TODAY)
+
+    reopened = CsvStorage(storage.path, partition_by_month=False)
+    reopened.initialize()
+    assert subjects(reopened.iter_rows()) == ALL
+    assert not os.path.exists(storage.path + '.rotate')
+
+def test_crash_before_the_commit_is_discarded_on_start(storage, monkeypatch):
+    def crash(self, manifest):
+        raise Crash()
+    monkeypatch.setattr(PartitionArchive, '_write', crash)
+    with pytest.raises(Crash):
+        storage.rotate(TODAY)
+    monkeypatch.undo()
+
+    reopened = CsvStorage(storage.path, partition_by_month=False)
+    reopened.initialize()
+    assert subjects(reopened.iter_rows()) == ALL
+    directory = archive_dir_for(storage.path)
+    assert not [name for name in os.listdir(directory) if name.endswith('.csv.gz')]
+    assert not os.path.exists(storage.path + '.rotate')
+
+def test_uncommitted_rewrite_is_dropped_by_recover(storage):
+    storage.rotate(TODAY)
+    archive = storage.archive()
+    archive.rewrite(['2024-01'], lambda rows: rows)
+    assert len(os.listdir(archive.directory)) == 4
+
+    archive.recover(storage.path)
+
+    assert subjects(storage.iter_rows()) == ALL
+    assert len(os.listdir(archive.directory)) == 3
@@ -0,0 +1,43 @@
+import atexit
+import datetime
+
+import pytest
+
+import timetracking_rollups
+import timetracking_writer
+from conftest import entry
+from timetracking_rollups import get_rollups
+from timetracking_storage import get_storage
+
+DAY = datetime.date(2024, 3, 4)
+
+@pytest.fixture(autouse=True)
+def shared(monkeypatch):
+    """Start each test without the shared writer or rollups, and leave nothing to run at exit."""
+    monkeypatch.setattr(timetracking_writer, '_default_writer', None)
+    monkeypatch.setattr(timetracking_rollups, '_default_rollups', None)
+    monkeypatch.setattr(atexit, 'register', lambda callback: callback)
+    monkeypatch.delenv('TIMETRACKER_SERVER', raising=False)
+    yield
+    if timetracking_writer._default_writer is not None:
+        timetracking_writer._default_writer.close()
+
+def test_rows_from_the_entry_writer_are_added_and_stamped():
+    storage = get_storage()
+    storage.append_rows([entry('A', DAY, '08:00')])
+    storage.compact()
+    rollups = get_rollups()
+    assert rollups.day(DAY) == {'A': 30}
+    writer = timetracking_writer.get_entry_writer()
+    writer.submit([entry('A', DAY, '09:00', 90)]).result()
+    writer.close()
+
+    assert rollups.day(DAY) == {'A': 120}
+    assert rollups.signature == timetracking_rollups._normalize(rollups._storage().entries_signature())
+
+def test_rollups_do_not_listen_to_an_ingestion_server_writer(monkeypatch):
+    monkeypatch.setenv('TIMETRACKER_SERVER', 'http://127.0.0.1:9')
+
+    get_rollups()
+
+    assert timetracking_writer.get_entry_writer()._listeners == []
@@ -0,0 +1,75 @@
+import asyncio
+import datetime
+import http.client
+import json
+import threading
+
+import pytest
+
+from conftest import entry
+from timetracking_remote import RemoteEntryWriter
+from timetracking_server import IngestServer
+from timetracking_storage import CsvStorage, StorageError
+
+DAY = datetime.date(2024, 3, 4)
+
+class FailingStorage(CsvStorage):
+    """Refuses rows whose Subject names an exception to raise."""
+
+    def append_rows(self, rows):
+        for row in rows:
+            if row['Subject'] == 'Timetracking: bad':
+                raise ValueError("unusable row")
+            if row['Subject'] == 'Timetracking: broken':
+                raise StorageError("disk on fire")
+        return super().append_rows(rows)
+
+@pytest.fixture
+def server(tmp_path):
+    loop = asyncio.new_event_loop()
+    server = IngestServer(storage=FailingStorage(str(tmp_path / 'ingest.csv')), port=0)
+    loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield server
+    asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+def post(server, rows):
+    connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=10)
+    try:
+        connection.request('POST', '/entries', json.dumps(rows), {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+def test_rows_are_written(server):
+    assert post(server, [entry('A', DAY, '09:00')]) == (200, {'written': 1})
+    assert [row[0] for row in server.writer.storage.iter_rows()] == ['Timetracking: A']
+
+def test_malformed_rows_are_rejected(server):
+    status, result = post(server, [{'Subject': 'x'}])
+    assert status == 400 and 'missing' in result['error']
+
+def test_a_row_the_storage_refuses_is_a_bad_request(server):
+    status, result = post(server, [entry('bad', DAY, '09:00')])
+    assert status == 400 and 'unusable row' in result['error']
+    # The connection and the writer are still fine
+    assert post(server, [entry('A', DAY, '09:00')])[0] == 200
+
+def test_a_storage_failure_is_a_server_error(server):
+    status, result = post(server, [entry('broken', DAY, '09:00')])
+    assert status == 500 and 'disk on fire' in result['error']
+
+def test_remote_writer_drops_a_rejected_batch_instead_of_retrying(server, tmp_path):
+    writer = RemoteEntryWriter(f"http://127.0.0.1:{server.port}", spool_path=str(tmp_path / 'spool.jsonl'))
+    try:
+        with pytest.raises(ValueError):
+            writer.submit(entry('bad', DAY, '09:00')).result(timeout=10)
+        writer.submit(entry('A', DAY, '09:30')).result(timeout=10)
+    finally:
+        writer.close()
+    assert not (tmp_path / 'spool.jsonl').exists()
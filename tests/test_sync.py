@@ -0,0 +1,91 @@
+import datetime
+
+import pytest
+
+from conftest import entry
+from timetracking_core import CSV_FILE, CSV_HEADERS
+from timetracking_storage import CsvStorage
+from timetracking_sync import FolderPeer, StorePeer, merge_days, open_peer, sync
+from timetracking_writer import EntryWriter
+
+MONDAY = datetime.date(2024, 3, 4)
+TUESDAY = MONDAY + datetime.timedelta(days=1)
+
+def tracker(folder, rows):
+    folder.mkdir()
+    storage = CsvStorage(str(folder / CSV_FILE), partition_by_month=False)
+    storage.initialize()
+    storage.append_rows(rows)
+    storage.compact()
+    return storage
+
+def as_list(row):
+    return [row[name] for name in CSV_HEADERS]
+
+def stored(storage):
+    storage.flush()
+    return sorted(storage.iter_rows())
+
+@pytest.fixture
+def state(tmp_path):
+    return str(tmp_path / 'state.json')
+
+def test_two_trackers_end_up_with_each_others_entries(tmp_path, state):
+    here = tracker(tmp_path / 'here', [entry('A', MONDAY, '09:00', description='mine')])
+    there = tracker(tmp_path / 'there', [entry('B', TUESDAY, '09:00')])
+
+    result = sync(StorePeer(here), open_peer(str(tmp_path / 'there')), state)
+    assert (result.pulled, result.pushed) == ([TUESDAY], [MONDAY])
+
+    reopened = CsvStorage(there.path, partition_by_month=False)
+    assert stored(here) == stored(reopened) == sorted(
+        [as_list(entry('A', MONDAY, '09:00', description='mine')), as_list(entry('B', TUESDAY, '09:00'))])
+    result = sync(StorePeer(here), open_peer(str(tmp_path / 'there')), state)
+    assert result.pulled == result.pushed == result.merged == []
+
+def test_a_deletion_on_one_side_reaches_the_other(tmp_path, state):
+    here = tracker(tmp_path / 'here', [entry('A', MONDAY, '09:00'), entry('B', MONDAY, '10:00')])
+    tracker(tmp_path / 'there', [])
+    sync(StorePeer(here), open_peer(str(tmp_path / 'there')), state)
+
+    here.delete_entry(next(row_id for row_id, row in here.find_entries(MONDAY, MONDAY)
+                           if row[0] == 'Timetracking: B'))
+    sync(StorePeer(here), open_peer(str(tmp_path / 'there')), state)
+
+    there = CsvStorage(str(tmp_path / 'there' / CSV_FILE), partition_by_month=False)
+    assert stored(there) == [as_list(entry('A', MONDAY, '09:00'))]
+
+def test_entries_travel_between_trackers_through_a_sync_folder(tmp_path):
+    here = tracker(tmp_path / 'here', [entry('A', MONDAY, '09:00')])
+    there = tracker(tmp_path / 'there', [entry('B', TUESDAY, '09:00')])
+    folder = str(tmp_path / 'shared')
+
+    sync(StorePeer(here), FolderPeer(folder), str(tmp_path / 'here.json'))
+    sync(StorePeer(there), FolderPeer(folder), str(tmp_path / 'there.json'))
+    sync(StorePeer(here), FolderPeer(folder), str(tmp_path / 'here.json'))
+
+    assert stored(here) == stored(there)
+    assert len(stored(here)) == 2
+
+def test_entries_taken_from_the_other_side_go_through_the_writer(tmp_path, state):
+    here = tracker(tmp_path / 'here', [])
+    tracker(tmp_path / 'there', [entry('B', TUESDAY, '09:00')])
+    writer = EntryWriter(storage=here)
+    written = []
+    writer.add_listener(lambda rows, offsets: written.extend(rows))
+
+    sync(StorePeer(here, writer), open_peer(str(tmp_path / 'there')), state)
+    writer.close()
+
+    assert [row['Subject'] for row in written] == ['Timetracking: B']
+    assert stored(here) == [as_list(entry('B', TUESDAY, '09:00'))]
+
+def test_merging_a_day_picks_the_same_rows_from_either_side():
+    local = [as_list(entry('A', MONDAY, '09:00', description='here')), as_list(entry('B', MONDAY, '10:00'))]
+    remote = [as_list(entry('A', MONDAY, '09:00', description='there'))]
+
+    merged, overlaps = merge_days(local, remote)
+
+    assert merged == merge_days(remote, local)[0]
+    assert [row[-1] for row in merged] == ['there', 'Time tracking for B']
+    assert overlaps == []
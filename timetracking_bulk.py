@@ -0,0 +1,126 @@
+"""Bulk entry: many slots over one or more days, checked together and written in one batch.
+
+Slots come as a list, one "YYYY-MM-DD HH:MM[-HH:MM] Project" per line, or
+as a grid: a CSV whose first row holds dates, first column slot start
+times and cells the project for that slot (blank cells are skipped). A
+slot without an end lasts one calendar interval.
+"""
+import csv
+import datetime
+
+from timetracking_calendar import get_work_calendar
+from timetracking_core import build_csv_row
+from timetracking_overlaps import OverlapError, OverlapPolicy, describe_entry, find_overlaps
+from timetracking_reports import Entry
+
+class BulkEntryError(ValueError):
+    """Raised with every problem found in a set of slots; nothing has been written."""
+
+    def __init__(self, problems):
+        self.problems = problems
+        super().__init__("\n".join(problems))
+
+def _parse_time(date, value):
+    return datetime.datetime.combine(date, datetime.datetime.strptime(value.strip(), "%H:%M").time())
+
+def parse_slot_list(lines, interval=None):
+    """Return Entries for 'YYYY-MM-DD HH:MM[-HH:MM] Project' lines; blank and '#' lines are skipped."""
+    interval = interval or get_work_calendar().interval
+    entries, problems = [], []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        parts = line.split(None, 2)
+        try:
+            if len(parts) < 3:
+                raise ValueError("expected 'YYYY-MM-DD HH:MM[-HH:MM] Project'")
+            date = datetime.date.fromisoformat(parts[0])
+            start_text, _, end_text = parts[1].partition('-')
+            start = _parse_time(date, start_text)
+            end = _parse_time(date, end_text) if end_text else start + interval
+        except ValueError as e:
+            problems.append(f"Line {number}: {e}")
+            continue
+        entries.append(Entry(parts[2].strip(), start, end))
+    if problems:
+        raise BulkEntryError(problems)
+    return entries
+
+def parse_slot_grid(lines, interval=None):
+    """Return Entries for a CSV grid of dates across, slot start times down and projects in the cells."""
+    interval = interval or get_work_calendar().interval
+    rows = [row for row in csv.reader(lines) if any(cell.strip() for cell in row)]
+    if not rows:
+        return []
+    entries, problems = [], []
+    dates = []
+    for column, cell in enumerate(rows[0][1:], 2):
+        try:
+            dates.append(datetime.date.fromisoformat(cell.strip()))
+        except ValueError:
+            problems.append(f"Column {column}: '{cell}' is not a YYYY-MM-DD date")
+            dates.append(None)
+    for number, row in enumerate(rows[1:], 2):
+        cells = [(date, project.strip()) for date, project in zip(dates, row[1:]) if project.strip()]
+        if not cells:
+            continue
+        try:
+            start_time = datetime.datetime.strptime(row[0].strip(), "%H:%M").time()
+        except ValueError:
+            problems.append(f"Row {number}: '{row[0]}' is not an HH:MM time")
+            continue
+        for date, project in cells:
+            if date is not None:
+                start = datetime.datetime.combine(date, start_time)
+                entries.append(Entry(project, start, start + interval))
+    if problems:
+        raise BulkEntryError(problems)
+    return entries
+
+def validate_entries(entries, index=None, policy=OverlapPolicy.REJECT):
+    """Check every entry at once and return the Entries to write.
+
+    Raises BulkEntryError listing every entry without a project or with its
+    end before its start, every pair of entries that overlap each other,
+    and, under REJECT, every entry that overlaps a stored one. Other
+    policies trim or merge against stored entries as a single entry would.
+    """
+    if index is None:
+        from timetracking_overlaps import get_overlap_index
+        index = get_overlap_index()
+    problems = []
+    valid = []
+    for project, start, end in entries:
+        entry = Entry(project.strip(), start, end)
+        if not entry.project:
+            problems.append(f"No project for {entry.start:%a %m/%d %H:%M}")
+        elif entry.end <= entry.start:
+            problems.append(f"{describe_entry(entry)} ends before it starts")
+        else:
+            valid.append(entry)
+    for earlier, later in find_overlaps(valid):
+        problems.append(f"{describe_entry(earlier)} and {describe_entry(later)} overlap")
+    resolved = []
+    for entry in sorted(valid, key=lambda entry: (entry.start, entry.end)):
+        try:
+            resolved.extend(index.resolve(entry.project, entry.start, entry.end, policy))
+        except OverlapError as e:
+            problems.append(f"{describe_entry(entry)} overlaps "
+                            + ", ".join(describe_entry(other) for other in e.overlaps))
+    if problems:
+        raise BulkEntryError(problems)
+    return resolved
+
+def bulk_add(entries, policy=OverlapPolicy.REJECT, writer=None, index=None):
+    """Validate entries and queue them as one batch; return (Entries written, the writer's Future).
+
+    Nothing is written if any entry has a problem (see validate_entries).
+    """
+    if writer is None:
+        from timetracking_writer import get_entry_writer
+        writer = get_entry_writer()
+    resolved = validate_entries(entries, index, policy)
+    if not resolved:
+        return [], None
+    return resolved, writer.submit([build_csv_row(*entry) for entry in resolved])
@@ -0,0 +1,198 @@
+"""Working calendar: per-weekday hours, prompt interval, holidays and PTO.
+
+The calendar is read from timetracking_calendar.json when it exists, e.g.
+
+    {
+        "interval_minutes": 30,
+        "hours": {"mon": ["09:00-12:30", "13:00-17:30"], "fri": ["09:00-15:00"]},
+        "holidays": ["12-25", "01-01", "2026-11-26"],
+        "pto": ["2026-08-03..2026-08-14", "2026-10-09"]
+    }
+
+Weekdays left out of "hours" are days off. Holidays given as MM-DD recur
+every year. Without the file it's Monday to Friday, 09:00-17:30, every 30
+minutes, which prompts at 09:30, 10:00, ... 17:30 as before.
+"""
+import bisect
+import datetime
+import json
+import os
+from array import array
+
+from timetracking_core import EPOCH_ORDINAL, from_epoch_minutes, to_epoch_minutes
+
+CALENDAR_FILE = 'timetracking_calendar.json'
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+DEFAULT_HOURS = {day: ["09:00-17:30"] for day in WEEKDAYS[:5]}
+DEFAULT_INTERVAL_MINUTES = 30
+# How many years past the one asked about next_slot() searches before giving up
+LOOKAHEAD_YEARS = 2
+
+def _parse_minutes(text):
+    hours, minutes = text.strip().split(':')
+    return int(hours) * 60 + int(minutes)
+
+def _parse_date(text):
+    return datetime.datetime.strptime(text.strip(), "%Y-%m-%d").date()
+
+class WorkCalendar:
+    """Working days and prompt slots, compiled per year into a bitmap and a slot table.
+
+    A slot is the end of one interval of working time, which is when the
+    scheduler prompts for it. Each year is compiled the first time it's
+    asked about: a bitmap with one bit per working day and a sorted array of
+    every slot in the year as epoch minutes. is_working_day() and
+    is_working_slot() are then O(1) and next_slot() a single bisect, however
+    many holidays or days off lie in between.
+    """
+
+    def __init__(self, hours=None, interval_minutes=DEFAULT_INTERVAL_MINUTES, holidays=(), pto=()):
+        if interval_minutes <= 0:
+            raise ValueError("interval_minutes must be positive")
+        self.interval = datetime.timedelta(minutes=interval_minutes)
+        hours = DEFAULT_HOURS if hours is None else hours
+
+        # Slot end times (minutes after midnight) for each weekday, Monday first
+        self.weekday_slots = []
+        for day in WEEKDAYS:
+            slots = set()
+            for span in hours.get(day, ()):
+                start, end = (_parse_minutes(part) for part in span.split('-'))
+                if end <= start:
+                    raise ValueError(f"Working hours {span!r} on {day} end before they start")
+                slots.update(range(start + interval_minutes, end + 1, interval_minutes))
+            self.weekday_slots.append(tuple(sorted(slots)))
+        self._weekday_slot_sets = [frozenset(slots) for slots in self.weekday_slots]
+
+        self.recurring_holidays = set()
+        self.holidays = set()
+        for holiday in holidays:
+            if holiday.count('-') == 1:
+                month, day = holiday.split('-')
+                self.recurring_holidays.add((int(month), int(day)))
+            else:
+                self.holidays.add(_parse_date(holiday))
+
+        self.pto = set()
+        for period in pto:
+            first, _, last = period.partition('..')
+            first = _parse_date(first)
+            last = _parse_date(last) if last else first
+            if last < first:
+                raise ValueError(f"PTO period {period!r} ends before it starts")
+            self.pto.update(first + datetime.timedelta(days=i) for i in range((last - first).days + 1))
+
+        self._bitmaps = {}
+        self._slot_tables = {}
+
+    def _compile(self, year):
+        """Build the working-day bitmap and the slot table for year."""
+        first = datetime.date(year, 1, 1)
+        days = (datetime.date(year + 1, 1, 1) - first).days
+        bitmap = 0
+        table = array('q')
+        for i in range(days):
+            date = first + datetime.timedelta(days=i)
+            slots = self.weekday_slots[date.weekday()]
+            if (not slots or date in self.holidays or date in self.pto
+                    or (date.month, date.day) in self.recurring_holidays):
+                continue
+            bitmap |= 1 << i
+            midnight = (date.toordinal() - EPOCH_ORDINAL) * 1440
+            table.extend(midnight + minute for minute in slots)
+        self._bitmaps[year] = bitmap
+        self._slot_tables[year] = table
+
+    def _bitmap(self, year):
+        if year not in self._bitmaps:
+            self._compile(year)
+        return self._bitmaps[year]
+
+    def _slot_table(self, year):
+        if year not in self._slot_tables:
+            self._compile(year)
+        return self._slot_tables[year]
+
+    def is_working_day(self, date):
+        """Return True if date has working hours and isn't a holiday or PTO."""
+        return bool(self._bitmap(date.year) >> (date.timetuple().tm_yday - 1) & 1)
+
+    def day_off_reason(self, date):
+        """Return why date isn't a working day ('PTO', 'a holiday', 'a day off'), or None."""
+        if self.is_working_day(date):
+            return None
+        if date in self.pto:
+            return "PTO"
+        if date in self.holidays or (date.month, date.day) in self.recurring_holidays:
+            return "a holiday"
+        return "a day off"
+
+    def is_working_slot(self, moment):
+        """Return True if the local datetime moment is a prompt slot on a working day."""
+        minute = moment.hour * 60 + moment.minute
+        return (moment.second == 0 and minute in self._weekday_slot_sets[moment.weekday()]
+                and self.is_working_day(moment.date()))
+
+    def round_down(self, moment):
+        """Round a local datetime down to a whole interval since midnight."""
+        step = int(self.interval.total_seconds() // 60)
+        minute = (moment.hour * 60 + moment.minute) // step * step
+        return moment.replace(hour=minute // 60, minute=minute % 60, second=0, microsecond=0)
+
+    def describe(self):
+        """Summarise the calendar in a sentence for the scheduler window."""
+        minutes = int(self.interval.total_seconds() // 60)
+        days = [day.capitalize() for day, slots in zip(WEEKDAYS, self.weekday_slots) if slots]
+        text = f"Prompts every {minutes} minutes during working hours on {', '.join(days) or 'no days'}"
+        days_off = len(self.holidays) + len(self.recurring_holidays) + len(self.pto)
+        if days_off:
+            text += f", skipping {days_off} holiday and PTO days"
+        return text
+
+    def next_slot(self, now):
+        """Return the first slot strictly after the local datetime now, or None if there is none."""
+        minute = to_epoch_minutes(now)
+        for year in range(now.year, now.year + LOOKAHEAD_YEARS + 1):
+            table = self._slot_table(year)
+            i = bisect.bisect_right(table, minute)
+            if i < len(table):
+                return from_epoch_minutes(table[i])
+        return None
+
+    def slots_between(self, start, end):
+        """Return the slots in [start, end) in order."""
+        first, last = to_epoch_minutes(start), to_epoch_minutes(end)
+        if start.second or start.microsecond:
+            first += 1
+        slots = []
+        for year in range(start.year, end.year + 1):
+            table = self._slot_table(year)
+            slots.extend(from_epoch_minutes(minute) for minute in
+                         table[bisect.bisect_left(table, first):bisect.bisect_left(table, last)])
+        return slots
+
+def load_calendar(path=CALENDAR_FILE):
+    """Load the calendar from path, falling back to the default if it's missing or invalid."""
+    if not os.path.exists(path):
+        return WorkCalendar()
+    try:
+        with open(path, 'r') as f:
+            config = json.load(f)
+        return WorkCalendar(
+            hours=config.get('hours'),
+            interval_minutes=config.get('interval_minutes', DEFAULT_INTERVAL_MINUTES),
+            holidays=config.get('holidays', ()),
+            pto=config.get('pto', ()),
+        )
+    except (json.JSONDecodeError, IOError, ValueError, AttributeError) as e:
+        print(f"Ignoring {path}, using the default calendar: {e}")
+        return WorkCalendar()
+
+_default_calendar = None
+
+def get_work_calendar():
+    """Return the shared calendar, loaded once per run."""
+    global _default_calendar
+    if _default_calendar is None:
+        _default_calendar = load_calendar()
+    return _default_calendar
@@ -0,0 +1,139 @@
+"""Cached project list with a prefix and trigram index for type-ahead search."""
+import bisect
+import re
+import threading
+from collections import defaultdict
+
+from timetracking_metrics import span
+
+# How many matches type-ahead shows at most
+SEARCH_LIMIT = 200
+# The entry dialog only offers a filter box for lists at least this long
+TYPE_AHEAD_MIN_PROJECTS = 15
+
+_WORD_START = re.compile(r'[\s\-_/.:]+')
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class ProjectIndex:
+    """Find projects by name prefix, word prefix or substring without scanning them all.
+
+    Prefixes are found by bisecting a sorted list of lowercased names and of
+    the words inside them; substrings of three or more characters by
+    intersecting trigram posting sets and checking only those candidates.
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        self._folded = [name.casefold() for name in self.names]
+        self._prefixes = []
+        self._trigram_postings = defaultdict(set)
+        for i, folded in enumerate(self._folded):
+            self._prefixes.append((folded, 0, i))
+            for word in _WORD_START.split(folded)[1:]:
+                if word:
+                    self._prefixes.append((word, 1, i))
+            for trigram in _trigrams(folded):
+                self._trigram_postings[trigram].add(i)
+        self._prefixes.sort()
+
+    def _prefix_matches(self, query):
+        """Return (kind, position) for names or words starting with query."""
+        found = []
+        for key, kind, i in self._prefixes[bisect.bisect_left(self._prefixes, (query,)):]:
+            if not key.startswith(query):
+                break
+            found.append((kind, i))
+        return found
+
+    def _substring_matches(self, query):
+        postings = [self._trigram_postings.get(trigram, ()) for trigram in _trigrams(query)]
+        postings.sort(key=len)
+        candidates = set(postings[0]).intersection(*postings[1:]) if postings else set()
+        return sorted(i for i in candidates if query in self._folded[i])
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """Return matching names: name prefixes first, then word prefixes, then substrings."""
+        query = query.strip().casefold()
+        if not query:
+            return self.names[:limit]
+
+        ranked = sorted(self._prefix_matches(query))
+        if len(query) >= 3:
+            ranked += [(2, i) for i in self._substring_matches(query)]
+
+        seen = set()
+        results = []
+        for _, i in ranked:
+            if i not in seen:
+                seen.add(i)
+                results.append(self.names[i])
+                if limit and len(results) >= limit:
+                    break
+        return results
+
+class ProjectCatalog:
+    """The project list from storage, parsed once and re-read only when it changes.
+
+    Each call checks a cheap signature from storage (the projects file's size
+    and mtime, or SQLite's data version) instead of re-reading the file.
+    """
+
+    def __init__(self, storage=None):
+        self.storage = storage
+        self._projects = None
+        self._signature = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    def _storage(self):
+        if self.storage is None:
+            from timetracking_storage import get_storage
+            self.storage = get_storage()
+        return self.storage
+
+    def _refresh(self):
+        storage = self._storage()
+        signature = storage.projects_signature()
+        if self._projects is None or signature != self._signature:
+            with span('load_projects'):
+                self._projects = storage.load_projects()
+            self._signature = signature
+            self._index = None
+
+    def projects(self):
+        """Return a copy of the project list, or None if none are set up yet."""
+        with self._lock:
+            self._refresh()
+            return list(self._projects) if self._projects is not None else None
+
+    def index(self):
+        """Return the search index for the current project list."""
+        with self._lock:
+            self._refresh()
+            if self._index is None:
+                self._index = ProjectIndex(self._projects or [])
+            return self._index
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        return self.index().search(query, limit)
+
+    def save(self, projects):
+        """Save the project list through storage and keep it as the cached copy."""
+        with self._lock:
+            storage = self._storage()
+            with span('save_projects'):
+                storage.save_projects(projects)
+            self._projects = list(projects)
+            self._signature = storage.projects_signature()
+            self._index = None
+
+_default_catalog = None
+
+def get_project_catalog():
+    """Return the shared project catalog."""
+    global _default_catalog
+    if _default_catalog is None:
+        _default_catalog = ProjectCatalog()
+    return _default_catalog
@@ -0,0 +1,565 @@
+"""Command-line interface for logging, reporting and exporting without starting the GUI.
+
+Only the modules a command needs are imported, and PySide6 is imported only
+when the window is asked for, so scripts and shell hooks start quickly.
+"""
+import argparse
+import datetime
+import os
+import sys
+
+from timetracking_core import CSV_FILE, CSV_HEADERS, PROJECTS_FILE, build_csv_row
+
+# How much slower than a bare `python3 -c pass` a headless command may start
+STARTUP_BUDGET_MS = 75
+
+def parse_when(value, default_date=None):
+    """Parse 'HH:MM' (on default_date, or today) or 'YYYY-MM-DD HH:MM'."""
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m-%d %H:%M")
+    except ValueError:
+        pass
+    time_value = datetime.datetime.strptime(value, "%H:%M").time()
+    return datetime.datetime.combine(default_date or datetime.date.today(), time_value)
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD date argument."""
+    return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+
+def cmd_add(args):
+    """Append one entry through the shared entry writer."""
+    if not args.start or not (args.end or args.minutes):
+        # Only loaded when needed: the calendar file is read on first use
+        from timetracking_calendar import get_work_calendar
+        calendar = get_work_calendar()
+    try:
+        start = parse_when(args.start) if args.start else calendar.round_down(datetime.datetime.now())
+        if args.end:
+            end = parse_when(args.end, start.date())
+        elif args.minutes:
+            end = start + datetime.timedelta(minutes=args.minutes)
+        else:
+            end = start + calendar.interval
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    if end <= start:
+        print("Error: End time must be after start time", file=sys.stderr)
+        return 2
+
+    from timetracking_overlaps import OverlapError, OverlapIndex, OverlapPolicy
+    from timetracking_writer import get_entry_writer
+    try:
+        entries = OverlapIndex().resolve(args.project, start, end, OverlapPolicy(args.on_overlap))
+    except OverlapError as e:
+        print(f"Error: {e}. Use --on-overlap trim, merge or allow to log it anyway.", file=sys.stderr)
+        return 1
+    if not entries:
+        print("Already logged; nothing added")
+        return 0
+
+    writer = get_entry_writer()
+    try:
+        rows = writer.submit([build_csv_row(*entry) for entry in entries]).result()
+    except (IOError, OSError) as e:
+        print(f"Error: Could not save entry: {e}", file=sys.stderr)
+        return 1
+    finally:
+        writer.close()
+    for row in rows:
+        print(f"Entry added: {row['Subject']} on {row['Start Date']} at {row['Start Time']}-{row['End Time']}")
+    return 0
+
+def cmd_backfill(args):
+    """Log many slots at once from a list or grid, checking them all before writing any."""
+    from timetracking_bulk import BulkEntryError, bulk_add, parse_slot_grid, parse_slot_list, validate_entries
+    from timetracking_overlaps import OverlapIndex, OverlapPolicy, describe_entry
+    from timetracking_writer import get_entry_writer
+
+    grid = args.grid or args.file.lower().endswith('.csv')
+    try:
+        f = sys.stdin if args.file == '-' else open(args.file, newline='')
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    try:
+        entries = (parse_slot_grid if grid else parse_slot_list)(f)
+        policy = OverlapPolicy(args.on_overlap)
+        if args.check:
+            entries = validate_entries(entries, OverlapIndex(), policy)
+            for entry in entries:
+                print(f"Would add: {describe_entry(entry)}")
+            return 0
+        writer = get_entry_writer()
+        try:
+            entries, future = bulk_add(entries, policy, writer, OverlapIndex())
+            if future is not None:
+                future.result()
+        finally:
+            writer.close()
+    except BulkEntryError as e:
+        print("Error: nothing was added:", file=sys.stderr)
+        for problem in e.problems:
+            print(f"  {problem}", file=sys.stderr)
+        return 1
+    except (IOError, OSError) as e:
+        print(f"Error: Could not save entries: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    print(f"Added {len(entries)} entries")
+    return 0
+
+def _describe_row(row):
+    from timetracking_reports import project_from_subject
+    return f"{row[1]} {row[2]}-{row[4]}  {project_from_subject(row[0])}"
+
+def cmd_entries(args):
+    """List entries with the ids edit and delete take, or fold the edit log into the CSV."""
+    from timetracking_storage import CsvStorage, get_storage
+    storage = get_storage()
+    if args.fold:
+        if not isinstance(storage, CsvStorage):
+            print("Error: only the CSV backend keeps an edit log", file=sys.stderr)
+            return 2
+        try:
+            folded = storage.fold_edits()
+        except (IOError, OSError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        print(f"Folded {folded} edits into {storage.path}")
+        return 0
+    start = args.start_date or datetime.date.today()
+    try:
+        entries = storage.find_entries(start, args.end_date or start)
+    except (IOError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    for entry_id, row in entries:
+        print(f"{entry_id}  {_describe_row(row)}")
+    if not entries:
+        print("No entries")
+    return 0
+
+def cmd_edit(args):
+    """Change an entry's project or times."""
+    from timetracking_core import csv_epoch_minutes, from_epoch_minutes
+    from timetracking_reports import project_from_subject
+    from timetracking_storage import StorageError, get_storage
+    storage = get_storage()
+    try:
+        row = storage.entry(args.id)
+        if row is None:
+            print(f"Error: No entry with id {args.id}", file=sys.stderr)
+            return 1
+        start = from_epoch_minutes(csv_epoch_minutes(row[1], row[2]))
+        end = from_epoch_minutes(csv_epoch_minutes(row[3], row[4]))
+        if args.start:
+            start = parse_when(args.start, start.date())
+        if args.end:
+            end = parse_when(args.end, start.date())
+        if end <= start:
+            print("Error: End time must be after start time", file=sys.stderr)
+            return 2
+        new_row = build_csv_row(args.project or project_from_subject(row[0]), start, end)
+        storage.update_entry(args.id, new_row)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    except (IOError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Was: {_describe_row(row)}")
+    print(f"Now: {_describe_row([new_row[name] for name in CSV_HEADERS])}")
+    return 0
+
+def cmd_delete(args):
+    """Delete an entry."""
+    from timetracking_storage import get_storage
+    storage = get_storage()
+    try:
+        row = storage.entry(args.id)
+        if row is None:
+            print(f"Error: No entry with id {args.id}", file=sys.stderr)
+            return 1
+        storage.delete_entry(args.id)
+    except (IOError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Deleted: {_describe_row(row)}")
+    return 0
+
+def cmd_report(args):
+    """Print per-project, per-week and per-day totals."""
+    from timetracking_reports import format_report
+    from timetracking_storage import get_storage
+    try:
+        storage = get_storage()
+        storage.initialize()
+        totals = storage.build_report(args.start_date, args.end_date, workers=args.workers)
+    except (IOError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(format_report(totals, days=args.days, weeks=args.weeks))
+    return 0
+
+def cmd_export(args):
+    """Write entries as a Google Calendar CSV or an iCalendar to a file or stdout."""
+    import csv
+    from timetracking_storage import get_storage
+
+    if args.new and (args.start_date or args.end_date):
+        print("Error: --new can't be combined with --from/--to", file=sys.stderr)
+        return 2
+    try:
+        storage = get_storage()
+        storage.initialize()
+        if args.reset:
+            storage.reset_export_watermark()
+        if args.new:
+            rows, watermark = storage.rows_since(storage.export_watermark())
+        else:
+            rows = storage.iter_rows(args.start_date, args.end_date)
+        ics = args.format == 'ics' or (args.format is None and args.output.lower().endswith('.ics'))
+        output = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+        try:
+            if ics:
+                from timetracking_ics import write_ics
+                write_ics(rows, output)
+            else:
+                writer = csv.writer(output)
+                writer.writerow(CSV_HEADERS)
+                writer.writerows(rows)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        # Only move the watermark once the rows are safely written
+        if args.new:
+            storage.save_export_watermark(watermark)
+    except (IOError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+def cmd_import(args):
+    """Add the events of an iCalendar file that aren't entries yet."""
+    from timetracking_ics import import_ics, seen_uids
+    from timetracking_overlaps import OverlapIndex, OverlapPolicy, describe_entry
+    from timetracking_storage import get_storage
+    from timetracking_writer import get_entry_writer
+
+    writer = get_entry_writer()
+    try:
+        storage = get_storage()
+        seen = seen_uids(storage.iter_rows())
+        with open(args.file, encoding='utf-8', errors='replace', newline='') as f:
+            added, duplicates, skipped, rejected = import_ics(
+                f, lambda rows: writer.submit(rows).result(), seen,
+                OverlapIndex(storage), OverlapPolicy(args.on_overlap))
+    except (IOError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        writer.close()
+    print(f"Imported {added} entries; {duplicates} already there, {skipped} events skipped")
+    if rejected:
+        print(f"{len(rejected)} events overlap logged entries and were not imported "
+              f"(use --on-overlap trim, merge or allow to import them anyway):", file=sys.stderr)
+        for entry in rejected:
+            print(f"  {describe_entry(entry)}", file=sys.stderr)
+        return 1
+    return 0
+
+def cmd_sync(args):
+    """Sync entries with another tracker's folder or a sync folder, day by day."""
+    from timetracking_overlaps import describe_entry
+    from timetracking_storage import CsvStorage, get_storage
+    from timetracking_sync import StorePeer, open_peer, sync
+    from timetracking_writer import EntryWriter, get_entry_writer
+
+    storage = get_storage()
+    if not isinstance(storage, CsvStorage):
+        print("Error: sync needs the CSV backend", file=sys.stderr)
+        return 2
+    writer = get_entry_writer()
+    try:
+        # Entries taken from the other side belong here, not on an ingestion server
+        local = StorePeer(storage, writer if isinstance(writer, EntryWriter) else None)
+        result = sync(local, open_peer(args.path), dry_run=args.dry_run)
+    except (IOError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        writer.close()
+    verb = "Would sync" if args.dry_run else "Synced"
+    print(f"{verb} with {args.path}: {len(result.pulled)} days taken, {len(result.pushed)} days sent, "
+          f"{len(result.merged)} days merged")
+    for _, local, remote in result.overlaps:
+        print(f"overlap: {describe_entry(local)} (here) / {describe_entry(remote)} (there)")
+    return 0
+
+def cmd_overlaps(args):
+    """List every pair of overlapping entries; exact duplicates are marked."""
+    from timetracking_overlaps import describe_entry, find_overlaps
+    from timetracking_reports import entries_from_rows
+    from timetracking_storage import get_storage
+
+    count = 0
+    try:
+        entries = entries_from_rows(get_storage().iter_rows(args.start_date, args.end_date))
+        for earlier, later in find_overlaps(entries):
+            label = "duplicate" if earlier == later else "overlap"
+            print(f"{label}: {describe_entry(earlier)} / {describe_entry(later)}")
+            count += 1
+    except (IOError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    print(f"{count} overlapping pairs")
+    return 1 if count else 0
+
+def cmd_projects(args):
+    """List, add or remove predefined projects."""
+    from timetracking_storage import get_storage
+    storage = get_storage()
+    projects = storage.load_projects() or []
+    if args.action == 'list':
+        for project in projects:
+            print(project)
+        return 0
+
+    name = (args.name or '').strip()
+    if args.action == 'search':
+        from timetracking_catalog import ProjectIndex
+        for project in ProjectIndex(projects).search(name):
+            print(project)
+        return 0
+    if not name:
+        print(f"Error: 'projects {args.action}' needs a project name", file=sys.stderr)
+        return 2
+    if args.action == 'add':
+        if name not in projects:
+            projects.append(name)
+            storage.save_projects(projects)
+    elif args.action == 'remove':
+        if name not in projects:
+            print(f"Error: No project named '{name}'", file=sys.stderr)
+            return 1
+        if len(projects) == 1:
+            print("Error: You must have at least one project.", file=sys.stderr)
+            return 1
+        projects.remove(name)
+        storage.save_projects(projects)
+    return 0
+
+def cmd_migrate(args):
+    """Copy the CSV history and projects file into a SQLite database."""
+    from timetracking_storage import SqliteStorage
+    storage = SqliteStorage(args.database)
+    try:
+        count = storage.migrate_from_csv(args.csv, args.projects)
+    except (IOError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        storage.close()
+    print(f"Migrated {count} entries into {args.database}")
+    print("Set TIMETRACKER_STORAGE=sqlite to use it")
+    return 0
+
+def cmd_serve(args):
+    """Run the ingestion server until interrupted."""
+    import asyncio
+    from timetracking_server import IngestServer
+
+    server = IngestServer(host=args.host, port=args.port, unix_path=args.unix,
+                          max_pending=args.max_pending, token=args.token)
+
+    async def run():
+        await server.start()
+        where = args.unix or f"http://{server.host}:{server.port}"
+        print(f"Collecting entries on {where} into {server.writer.storage.describe()}")
+        await server.serve_forever()
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+def cmd_archive(args):
+    """List the monthly archive partitions, rotating old rows into them first if asked."""
+    from timetracking_storage import CsvStorage, get_storage
+    storage = get_storage()
+    if not isinstance(storage, CsvStorage):
+        print("Error: only the CSV backend keeps a monthly archive", file=sys.stderr)
+        return 2
+    if args.rotate:
+        try:
+            print(f"Moved {storage.rotate()} entries into the archive")
+        except (IOError, OSError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+    partitions = storage.archive().partitions()
+    if not partitions:
+        print("No archived months")
+        return 0
+    for month, info in sorted(partitions.items()):
+        hours = sum(info['minutes'].values()) / 60
+        print(f"{month}  {info['first']} - {info['last']}  {info['rows']:>7} entries  {hours:9.1f} h  {info['file']}")
+    return 0
+
+def cmd_summary(args):
+    """Print today's, this week's and this month's hours from the rollup tables."""
+    from timetracking_rollups import RollupTables, format_summary
+    rollups = RollupTables()
+    today = datetime.date.today()
+    try:
+        if args.rebuild:
+            rollups.rebuild()
+        if args.verify:
+            start = args.start_date or today.replace(day=1)
+            drifted = rollups.verify(start, args.end_date or today)
+            print(f"{len(drifted)} day(s) didn't match the entries and were corrected")
+        print(f"Today:      {format_summary(rollups.day(today), limit=5)}")
+        print(f"This week:  {format_summary(rollups.week(today), limit=5)}")
+        print(f"This month: {format_summary(rollups.month(today), limit=5)}")
+    except (IOError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+def cmd_gui(args):
+    """Start the GUI. This is the only command that imports PySide6."""
+    import timetracking_csv
+    timetracking_csv.main()
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="timetracking_cli.py",
+        description="Log and report time tracking entries. Run without a command to open the window."
+    )
+    commands = parser.add_subparsers(dest='command')
+
+    add = commands.add_parser('add', help="log an entry")
+    add.add_argument('project', help="project name")
+    add.add_argument('--start', help="start time, 'HH:MM' or 'YYYY-MM-DD HH:MM' "
+                                     "(default: now, rounded down to the calendar's interval)")
+    add.add_argument('--end', help="end time, 'HH:MM' or 'YYYY-MM-DD HH:MM'")
+    add.add_argument('--minutes', type=int,
+                     help="length if --end isn't given (default: the calendar's interval, 30 minutes unless set)")
+    add.add_argument('--on-overlap', choices=['reject', 'trim', 'merge', 'allow'], default='reject',
+                     help="what to do if the entry overlaps a logged one (default: reject)")
+    add.set_defaults(handler=cmd_add)
+
+    backfill = commands.add_parser('backfill', help="log many slots at once from a list or a grid")
+    backfill.add_argument('file', help="slots file, '-' for stdin: 'YYYY-MM-DD HH:MM[-HH:MM] Project' lines, "
+                                       "or a CSV grid of dates across and start times down")
+    backfill.add_argument('--grid', action='store_true', help="read a grid (the default for .csv files)")
+    backfill.add_argument('--on-overlap', choices=['reject', 'trim', 'merge', 'allow'], default='reject',
+                          help="what to do with slots that overlap stored entries (default: reject)")
+    backfill.add_argument('--check', action='store_true', help="only check the slots and show what would be added")
+    backfill.set_defaults(handler=cmd_backfill)
+
+    entries = commands.add_parser('entries', help="list entries with their ids (today by default)")
+    entries.add_argument('--from', dest='start_date', type=parse_date, help="first date, YYYY-MM-DD")
+    entries.add_argument('--to', dest='end_date', type=parse_date, help="last date, YYYY-MM-DD")
+    entries.add_argument('--fold', action='store_true', help="fold the edit log into the CSV now")
+    entries.set_defaults(handler=cmd_entries)
+
+    edit = commands.add_parser('edit', help="change an entry's project or times")
+    edit.add_argument('id', help="entry id, as listed by `entries`")
+    edit.add_argument('--project', help="new project name")
+    edit.add_argument('--start', help="new start time, 'HH:MM' or 'YYYY-MM-DD HH:MM'")
+    edit.add_argument('--end', help="new end time, 'HH:MM' or 'YYYY-MM-DD HH:MM'")
+    edit.set_defaults(handler=cmd_edit)
+
+    delete = commands.add_parser('delete', help="delete an entry")
+    delete.add_argument('id', help="entry id, as listed by `entries`")
+    delete.set_defaults(handler=cmd_delete)
+
+    report = commands.add_parser('report', help="show hours by project, week and day")
+    report.add_argument('--from', dest='start_date', type=parse_date, help="first date, YYYY-MM-DD")
+    report.add_argument('--to', dest='end_date', type=parse_date, help="last date, YYYY-MM-DD")
+    report.add_argument('--days', type=int, default=14, help="days to list (default: 14)")
+    report.add_argument('--weeks', type=int, default=8, help="weeks to list (default: 8)")
+    report.add_argument('--workers', type=int,
+                        help="processes to build the report with, 0 for one per CPU "
+                             "(default: $TIMETRACKER_REPORT_WORKERS or 1)")
+    report.set_defaults(handler=cmd_report)
+
+    export = commands.add_parser('export', help="write entries as a Google Calendar CSV")
+    export.add_argument('-o', '--output', default='-', help="output file (default: stdout)")
+    export.add_argument('--from', dest='start_date', type=parse_date, help="first date, YYYY-MM-DD")
+    export.add_argument('--to', dest='end_date', type=parse_date, help="last date, YYYY-MM-DD")
+    export.add_argument('--new', action='store_true',
+                        help="only entries added since the last --new export (or the window's delta file)")
+    export.add_argument('--reset', action='store_true', help="start --new exports from the beginning again")
+    export.add_argument('--format', choices=['csv', 'ics'],
+                        help="csv for Google Calendar's CSV import, ics for iCalendar (default: from the file name, else csv)")
+    export.set_defaults(handler=cmd_export)
+
+    import_ = commands.add_parser('import', help="add the events of an iCalendar (.ics) file as entries")
+    import_.add_argument('file', help="iCalendar file to read")
+    import_.add_argument('--on-overlap', choices=['reject', 'trim', 'merge', 'allow'], default='reject',
+                         help="what to do with events that overlap logged entries (default: reject)")
+    import_.set_defaults(handler=cmd_import)
+
+    sync = commands.add_parser('sync', help="sync entries with another tracker's folder or a sync folder")
+    sync.add_argument('path', help="folder holding another tracker's entries CSV, or a sync folder")
+    sync.add_argument('--dry-run', action='store_true', help="only show which days would change")
+    sync.set_defaults(handler=cmd_sync)
+
+    overlaps = commands.add_parser('overlaps', help="find overlapping and duplicate entries")
+    overlaps.add_argument('--from', dest='start_date', type=parse_date, help="first date, YYYY-MM-DD")
+    overlaps.add_argument('--to', dest='end_date', type=parse_date, help="last date, YYYY-MM-DD")
+    overlaps.set_defaults(handler=cmd_overlaps)
+
+    projects = commands.add_parser('projects', help="list or edit predefined projects")
+    projects.add_argument('action', nargs='?', choices=['list', 'search', 'add', 'remove'], default='list')
+    projects.add_argument('name', nargs='?', help="project name for add/remove, or text to search for")
+    projects.set_defaults(handler=cmd_projects)
+
+    migrate = commands.add_parser('migrate', help="copy the CSV history into a SQLite database")
+    migrate.add_argument('--csv', default=CSV_FILE, help=f"CSV to read (default: {CSV_FILE})")
+    migrate.add_argument('--projects', default=PROJECTS_FILE, help=f"projects file (default: {PROJECTS_FILE})")
+    migrate.add_argument('--database', default='timetracking.db', help="database to create (default: timetracking.db)")
+    migrate.set_defaults(handler=cmd_migrate)
+
+    archive = commands.add_parser('archive', help="list the compressed monthly partitions of older entries")
+    archive.add_argument('--rotate', action='store_true',
+                         help="move entries from before this month into the archive now")
+    archive.set_defaults(handler=cmd_archive)
+
+    serve = commands.add_parser('serve', help="collect entries from other trackers over HTTP or a Unix socket")
+    serve.add_argument('--host', default='127.0.0.1', help="address to listen on (default: 127.0.0.1)")
+    serve.add_argument('--port', type=int, default=8765, help="port to listen on (default: 8765)")
+    serve.add_argument('--unix', metavar='PATH', help="listen on a Unix socket instead")
+    serve.add_argument('--max-pending', type=int, default=10_000,
+                       help="rows that may wait to be written before clients are held back (default: 10000)")
+    serve.add_argument('--token', default=os.environ.get('TIMETRACKER_SERVER_TOKEN'),
+                       help="require this bearer token (default: $TIMETRACKER_SERVER_TOKEN)")
+    serve.set_defaults(handler=cmd_serve)
+
+    summary = commands.add_parser('summary', help="hours today, this week and this month by project")
+    summary.add_argument('--verify', action='store_true',
+                         help="check the totals against the entries (this month unless --from/--to)")
+    summary.add_argument('--from', dest='start_date', type=parse_date, help="first date to verify, YYYY-MM-DD")
+    summary.add_argument('--to', dest='end_date', type=parse_date, help="last date to verify, YYYY-MM-DD")
+    summary.add_argument('--rebuild', action='store_true', help="recompute the totals from every entry")
+    summary.set_defaults(handler=cmd_summary)
+
+    gui = commands.add_parser('gui', help="open the time tracking window")
+    gui.set_defaults(handler=cmd_gui)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    handler = getattr(args, 'handler', cmd_gui)
+    return handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""Shared, Qt-free helpers for the time tracking entries and projects files."""
+import datetime
+import json
+import os
+
+# File to store time tracking entries and projects
+CSV_FILE = 'timetracking_entries.csv'
+CSV_HEADERS = ['Subject', 'Start Date', 'Start Time', 'End Date', 'End Time', 'Description']
+PROJECTS_FILE = 'timetracking_projects.json'
+
+# Entries are also handled as whole minutes since the Unix epoch (local time)
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+def load_projects():
+    """Load projects from the projects file."""
+    if os.path.exists(PROJECTS_FILE):
+        try:
+            with open(PROJECTS_FILE, 'r') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError):
+            pass
+
+def save_projects(projects):
+    """Save projects to the projects file."""
+    with open(PROJECTS_FILE, 'w') as f:
+        json.dump(projects, f)
+
+def build_csv_row(project_name, start_time, end_time):
+    """Build a CSV row for an entry - using MM/DD/YYYY format for dates."""
+    return {
+        'Subject': f"Timetracking: {project_name}",
+        'Start Date': start_time.strftime("%m/%d/%Y"),
+        'Start Time': start_time.strftime("%H:%M"),
+        'End Date': end_time.strftime("%m/%d/%Y"),
+        'End Time': end_time.strftime("%H:%M"),
+        'Description': f"Time tracking for {project_name}"
+    }
+
+def to_epoch_minutes(dt):
+    """Convert a datetime to whole minutes since the Unix epoch."""
+    return (dt.toordinal() - EPOCH_ORDINAL) * 1440 + dt.hour * 60 + dt.minute
+
+def from_epoch_minutes(minutes):
+    """Convert minutes since the Unix epoch back to a datetime."""
+    days, minutes = divmod(minutes, 1440)
+    date = datetime.date.fromordinal(days + EPOCH_ORDINAL)
+    return datetime.datetime(date.year, date.month, date.day, minutes // 60, minutes % 60)
+
+def csv_epoch_minutes(date_value, time_value):
+    """Convert CSV 'MM/DD/YYYY' and 'HH:MM' strings to minutes since the Unix epoch."""
+    month, day, year = date_value.split('/')
+    hours, minutes = time_value.split(':')
+    ordinal = datetime.date(int(year), int(month), int(day)).toordinal()
+    return (ordinal - EPOCH_ORDINAL) * 1440 + int(hours) * 60 + int(minutes)
@@ -1,61 +1,101 @@
-import csv
 import datetime
 import os
 import time
 import sys
-import json
 from enum import Enum
 import threading
 from functools import partial
-from PySide6.QtCore import Qt, QTimer, Slot, Signal, QMetaObject, Q_ARG
+from PySide6.QtCore import Qt, QObject, QDate, QStringListModel, QTime, QTimer, Slot, Signal
 from PySide6.QtGui import QIcon, QFont, QFontMetrics, QAction
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
     QLabel, QPushButton, QComboBox, QLineEdit, QTimeEdit, QDialog,
     QMessageBox, QFormLayout, QFrame, QStyleFactory, QListWidget, 
-    QListWidgetItem, QInputDialog, QMenu, QMenuBar, QDialogButtonBox
+    QListWidgetItem, QInputDialog, QMenu, QMenuBar, QDialogButtonBox, QPlainTextEdit,
+    QCheckBox, QGridLayout, QScrollArea, QDateEdit
 )
-import schedule
+from timetracking_core import PROJECTS_FILE, build_csv_row
+from timetracking_writer import get_entry_writer
+from timetracking_catalog import TYPE_AHEAD_MIN_PROJECTS, ProjectIndex, get_project_catalog
+from timetracking_overlaps import OverlapError, OverlapPolicy, describe_entry, get_overlap_index
+from timetracking_reports import format_report, project_from_subject
+from timetracking_storage import DELTA_FILE, StorageError, get_storage
+from timetracking_bulk import BulkEntryError, validate_entries
+from timetracking_calendar import get_work_calendar
+from timetracking_scheduler import PromptScheduler, unlogged_slots
+from timetracking_metrics import JITTER_BUCKETS, count, observe, span, timed
+from timetracking_rollups import format_summary, get_rollups
 
-# File to store time tracking entries and projects
-CSV_FILE = 'timetracking_entries.csv'
-CSV_HEADERS = ['Subject', 'Start Date', 'Start Time', 'End Date', 'End Time', 'Description']
-PROJECTS_FILE = 'timetracking_projects.json'
+class EntryWriterSignals(QObject):
+    """Report results from the background entry writer back to the UI thread."""
+    entries_written = Signal(list)
+    write_failed = Signal(str)
 
-def initialize_csv_file():
-    """Initialize the CSV file with headers if it doesn't exist."""
-    if not os.path.exists(CSV_FILE):
-        with open(CSV_FILE, 'w', newline='') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=CSV_HEADERS)
-            writer.writeheader()
-        return True
-    return False
+    def watch(self, future):
+        """Emit a signal once the writer has finished with a submitted write."""
+        future.add_done_callback(self._on_done)
 
-def round_time_to_half_hour(dt):
-    """Round down to the nearest half-hour."""
-    dt_rounded = dt.replace(minute=0, second=0, microsecond=0)
-    if dt.minute >= 30:
-        dt_rounded = dt_rounded.replace(minute=30)
-    return dt_rounded
-
-def is_business_day():
-    """Check if today is a business day (Monday through Friday)."""
-    weekday = datetime.datetime.now().weekday()
-    return weekday < 5  # 0-4 are Monday to Friday
+    def _on_done(self, future):
+        # Runs on the writer thread; the signals are delivered on the UI thread
+        error = future.exception()
+        if error is None:
+            self.entries_written.emit(future.result())
+        else:
+            self.write_failed.emit(str(error))
 
-def load_projects():
-    """Load projects from the projects file."""
-    if os.path.exists(PROJECTS_FILE):
+class SummaryWidget(QWidget):
+    """Today's and this week's hours by project, read from the rollup tables."""
+    # Emitted by the worker thread once the tables are loaded and checked
+    tables_ready = Signal()
+    
+    # How often today and this week are checked against storage
+    VERIFY_INTERVAL_MS = 60 * 60 * 1000
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rollups = get_rollups()
+        self.ready = False
+        
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.today_label = QLabel("Today: loading totals...")
+        self.week_label = QLabel("This week:")
+        layout.addWidget(self.today_label)
+        layout.addWidget(self.week_label)
+        
+        self.tables_ready.connect(self.on_tables_ready)
+        self.verify_timer = QTimer(self)
+        self.verify_timer.timeout.connect(self.start_verify)
+        self.verify_timer.start(self.VERIFY_INTERVAL_MS)
+        self.start_verify()
+    
+    def start_verify(self):
+        """Check the tables on a worker thread; the first check also loads them."""
+        threading.Thread(target=self.verify, daemon=True).start()
+    
+    def verify(self):
+        """Check this week's totals against storage. Runs on the worker thread."""
+        today = datetime.date.today()
         try:
-            with open(PROJECTS_FILE, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            pass
-
-def save_projects(projects):
-    """Save projects to the projects file."""
-    with open(PROJECTS_FILE, 'w') as f:
-        json.dump(projects, f)
+            drifted = self.rollups.verify(today - datetime.timedelta(days=today.weekday()), today)
+            if drifted:
+                print(f"Corrected the totals for {len(drifted)} day(s) that didn't match the entries")
+        except (IOError, OSError) as e:
+            print(f"Could not check the totals: {e}")
+        self.tables_ready.emit()
+    
+    @Slot()
+    def on_tables_ready(self):
+        self.ready = True
+        self.refresh()
+    
+    def refresh(self):
+        """Show the current totals; only reads the in-memory tables."""
+        if not self.ready:
+            return
+        today = datetime.date.today()
+        self.today_label.setText(f"Today: {format_summary(self.rollups.day(today))}")
+        self.week_label.setText(f"This week: {format_summary(self.rollups.week(today))}")
 
 class ProjectsDialog(QDialog):
     def __init__(self, projects, parent=None):
@@ -77,6 +117,8 @@ class ProjectsDialog(QDialog):
         
         # Projects list
         self.projects_list = QListWidget()
+        # Every row is one line of text, which keeps long catalogs fast to lay out
+        self.projects_list.setUniformItemSizes(True)
         self.populate_projects_list()
         layout.addWidget(self.projects_list)
         
@@ -114,7 +156,8 @@ class ProjectsDialog(QDialog):
         project_name, ok = QInputDialog.getText(self, "Add Project", "Project name:")
         if ok and project_name.strip():
             self.projects.append(project_name.strip())
-            self.populate_projects_list()
+            self.projects_list.addItem(project_name.strip())
+            self.projects_list.setCurrentRow(self.projects_list.count() - 1)
     
     def edit_project(self):
         """Edit the selected project."""
@@ -124,15 +167,15 @@ class ProjectsDialog(QDialog):
             return
         
         current_text = current_item.text()
-        index = self.projects.index(current_text)
+        row = self.projects_list.row(current_item)
         
         new_name, ok = QInputDialog.getText(
             self, "Edit Project", "Project name:", text=current_text
         )
         
         if ok and new_name.strip():
-            self.projects[index] = new_name.strip()
-            self.populate_projects_list()
+            self.projects[row] = new_name.strip()
+            current_item.setText(new_name.strip())
     
     def remove_project(self):
         """Remove the selected project."""
@@ -149,8 +192,9 @@ class ProjectsDialog(QDialog):
         )
         
         if reply == QMessageBox.Yes:
-            self.projects.remove(current_text)
-            self.populate_projects_list()
+            row = self.projects_list.row(current_item)
+            del self.projects[row]
+            self.projects_list.takeItem(row)
     
     def accept(self):
         """Handle dialog acceptance."""
@@ -164,6 +208,7 @@ class ProjectsDialog(QDialog):
         super().accept()
 
 class TimeEntryDialog(QDialog):
+    @timed('entry_dialog_construct')
     def __init__(self, projects, use_scheduler=False, parent=None):
         super().__init__(parent)
         self.use_scheduler = use_scheduler
@@ -171,12 +216,17 @@ class TimeEntryDialog(QDialog):
         self.project_name = ""
         self.start_time = None
         self.end_time = None
+        self.entries = []
+        self.project_index = None
+        # Called once after the next paint, to time how quickly a prompt appears
+        self.painted_callback = None
         
         # Get current date and time
         self.now = datetime.datetime.now()
         
-        # Always round time down to nearest half hour
-        self.now = round_time_to_half_hour(self.now)
+        # Always round time down to the start of the calendar's interval
+        self.calendar = get_work_calendar()
+        self.now = self.calendar.round_down(self.now)
             
         self.today_date = self.now.strftime("%Y-%m-%d")
         self.default_time = self.now.strftime("%H:%M")
@@ -202,8 +252,8 @@ class TimeEntryDialog(QDialog):
         main_layout.addWidget(header_label)
         
         # Date display
-        date_label = QLabel(f"Date: {self.today_date}")
-        main_layout.addWidget(date_label)
+        self.date_label = QLabel(f"Date: {self.today_date}")
+        main_layout.addWidget(self.date_label)
         
         # Add a separator line
         separator = QFrame()
@@ -214,6 +264,14 @@ class TimeEntryDialog(QDialog):
         # Form layout for input fields
         form_layout = QFormLayout()
         
+        # Type-ahead filter, only worth showing for long project lists
+        self.project_filter_label = QLabel("Find:")
+        self.project_filter_edit = QLineEdit()
+        self.project_filter_edit.setPlaceholderText("Type to filter projects")
+        self.project_filter_edit.textChanged.connect(self.filter_projects)
+        form_layout.addRow(self.project_filter_label, self.project_filter_edit)
+        self.show_project_filter()
+        
         # Project selection
         self.project_combo = QComboBox()
         self.project_combo.addItems(self.projects + ['Other'])
@@ -233,27 +291,7 @@ class TimeEntryDialog(QDialog):
         
         self.end_time_edit = QTimeEdit()
         self.end_time_edit.setDisplayFormat("HH:mm")
-        
-        if self.use_scheduler:
-            # In scheduler mode, set current time as end time and calculate start time
-            current_time = self.now
-            start_time = current_time - datetime.timedelta(minutes=30)
-            self.start_time_edit.setTime(
-                datetime.datetime.strptime(start_time.strftime("%H:%M"), "%H:%M").time()
-            )
-            self.end_time_edit.setTime(
-                datetime.datetime.strptime(current_time.strftime("%H:%M"), "%H:%M").time()
-            )
-        else:
-            # In single entry mode, set current time as start time and calculate end time
-            current_time = self.now
-            end_time = current_time + datetime.timedelta(minutes=30)
-            self.start_time_edit.setTime(
-                datetime.datetime.strptime(current_time.strftime("%H:%M"), "%H:%M").time()
-            )
-            self.end_time_edit.setTime(
-                datetime.datetime.strptime(end_time.strftime("%H:%M"), "%H:%M").time()
-            )
+        self.set_default_times()
         
         form_layout.addRow("Start time:", self.start_time_edit)
         form_layout.addRow("End time:", self.end_time_edit)
@@ -271,6 +309,76 @@ class TimeEntryDialog(QDialog):
         button_layout.addWidget(self.create_button)
         main_layout.addLayout(button_layout)
     
+    def set_default_times(self):
+        """Fill in the default start and end times around self.now."""
+        if self.use_scheduler:
+            # In scheduler mode, set current time as end time and calculate start time
+            start_time = self.now - self.calendar.interval
+            end_time = self.now
+        else:
+            # In single entry mode, set current time as start time and calculate end time
+            start_time = self.now
+            end_time = self.now + self.calendar.interval
+        self.start_time_edit.setTime(QTime(start_time.hour, start_time.minute))
+        self.end_time_edit.setTime(QTime(end_time.hour, end_time.minute))
+    
+    def show_project_filter(self):
+        """Offer the filter box only when there are enough projects to need it."""
+        visible = len(self.projects) >= TYPE_AHEAD_MIN_PROJECTS
+        self.project_filter_label.setVisible(visible)
+        self.project_filter_edit.setVisible(visible)
+    
+    def prepare(self, projects):
+        """Reset the dialog for another entry, refreshing only what has changed."""
+        now = self.calendar.round_down(datetime.datetime.now())
+        if now != self.now:
+            self.now = now
+            today_date = now.strftime("%Y-%m-%d")
+            if today_date != self.today_date:
+                self.today_date = today_date
+                self.date_label.setText(f"Date: {today_date}")
+        self.set_default_times()
+        
+        self.project_name = ""
+        self.start_time = None
+        self.end_time = None
+        self.entries = []
+        self.custom_project_edit.clear()
+        self.project_filter_edit.clear()
+        if projects != self.projects:
+            self.projects = list(projects)
+            self.project_index = None
+            self.project_combo.blockSignals(True)
+            self.project_combo.clear()
+            self.project_combo.addItems(self.projects + ['Other'])
+            self.project_combo.blockSignals(False)
+            self.show_project_filter()
+        self.project_combo.setCurrentIndex(0)
+        self.on_project_changed(self.project_combo.currentText())
+        self.create_button.setFocus()
+    
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.painted_callback is not None:
+            callback, self.painted_callback = self.painted_callback, None
+            callback()
+    
+    @Slot(str)
+    def filter_projects(self, text):
+        """Show only the projects matching the filter text in the combo box."""
+        if self.project_index is None:
+            index = get_project_catalog().index()
+            self.project_index = index if index.names == self.projects else ProjectIndex(self.projects)
+        current = self.project_combo.currentText()
+        matches = self.project_index.search(text) if text.strip() else self.projects
+        self.project_combo.blockSignals(True)
+        self.project_combo.clear()
+        self.project_combo.addItems(matches + ['Other'])
+        self.project_combo.blockSignals(False)
+        if current in matches:
+            self.project_combo.setCurrentText(current)
+        self.on_project_changed(self.project_combo.currentText())
+    
     @Slot(str)
     def on_project_changed(self, project_name):
         """Handle project selection change."""
@@ -313,10 +421,396 @@ class TimeEntryDialog(QDialog):
             minute=end_time_value.minute()
         )
         
+        entries = self.resolve_overlaps(self.project_name, self.start_time, self.end_time)
+        if entries is None:
+            return
+        if not entries:
+            QMessageBox.information(self, "Already Logged", "That time is already logged, so nothing was added.")
+        self.entries = entries
         super().accept()
+    
+    def resolve_overlaps(self, project_name, start_time, end_time):
+        """Check the entry against stored ones; return the entries to write, or None to keep editing."""
+        index = get_overlap_index()
+        try:
+            return index.resolve(project_name, start_time, end_time)
+        except OverlapError as e:
+            overlaps = e.overlaps
+        except (IOError, OSError) as e:
+            # Better to save an entry we couldn't check than to lose it
+            print(f"Could not check for overlapping entries: {e}")
+            return [(project_name, start_time, end_time)]
+        
+        msg_box = QMessageBox(self)
+        msg_box.setWindowTitle("Overlapping Entry")
+        msg_box.setText(
+            "This entry overlaps:\n"
+            + "\n".join(f"  {describe_entry(entry)}" for entry in overlaps)
+            + "\n\nWhat would you like to do?"
+        )
+        policies = {}
+        if any(entry.project == project_name for entry in overlaps):
+            policies[msg_box.addButton(f"Merge with {project_name}", QMessageBox.AcceptRole)] = OverlapPolicy.MERGE
+        policies[msg_box.addButton("Trim to Free Time", QMessageBox.AcceptRole)] = OverlapPolicy.TRIM
+        policies[msg_box.addButton("Keep Both", QMessageBox.AcceptRole)] = OverlapPolicy.ALLOW
+        msg_box.addButton(QMessageBox.Cancel)
+        msg_box.exec()
+        
+        policy = policies.get(msg_box.clickedButton())
+        if policy is None:
+            return None
+        return index.resolve(project_name, start_time, end_time, policy)
+
+class BackfillDialog(TimeEntryDialog):
+    """Log several missed scheduler slots at once, one project per slot."""
+    
+    def __init__(self, projects, slots, parent=None):
+        self.slots = sorted(slots)
+        self.entries = []
+        super().__init__(projects, use_scheduler=True, parent=parent)
+    
+    def setup_ui(self):
+        """Set up the user interface for the backfill dialog."""
+        self.setWindowTitle("Catch Up Missed Prompts")
+        self.setMinimumWidth(450)
+        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
+        
+        main_layout = QVBoxLayout(self)
+        
+        # Header
+        header_label = QLabel("Catch Up Missed Prompts")
+        header_font = QFont()
+        header_font.setPointSize(14)
+        header_font.setBold(True)
+        header_label.setFont(header_font)
+        main_layout.addWidget(header_label)
+        
+        info_label = QLabel("These prompts were missed (e.g. while the computer was asleep).\n"
+                            "Pick a project for each slot you want to log.")
+        main_layout.addWidget(info_label)
+        
+        # Project applied to every slot at once
+        self.slot_rows = []
+        form_layout = QFormLayout()
+        self.project_combo = QComboBox()
+        self.project_combo.addItems(self.projects + ['Other'])
+        self.project_combo.currentTextChanged.connect(self.on_project_changed)
+        form_layout.addRow("Project for all:", self.project_combo)
+        main_layout.addLayout(form_layout)
+        
+        separator = QFrame()
+        separator.setFrameShape(QFrame.HLine)
+        separator.setFrameShadow(QFrame.Sunken)
+        main_layout.addWidget(separator)
+        
+        # One row per slot: checkbox, project and a custom name for 'Other'
+        slots_widget = QWidget()
+        grid = QGridLayout(slots_widget)
+        for row, slot in enumerate(self.slots):
+            start = slot - get_work_calendar().interval
+            check = QCheckBox(f"{start.strftime('%a %m/%d  %H:%M')} - {slot.strftime('%H:%M')}")
+            check.setChecked(True)
+            combo = QComboBox()
+            combo.addItems(self.projects + ['Other'])
+            custom_edit = QLineEdit()
+            custom_edit.setPlaceholderText("Custom project name")
+            custom_edit.setHidden(True)
+            combo.currentTextChanged.connect(
+                lambda name, edit=custom_edit: edit.setHidden(name != 'Other')
+            )
+            grid.addWidget(check, row, 0)
+            grid.addWidget(combo, row, 1)
+            grid.addWidget(custom_edit, row, 2)
+            self.slot_rows.append((slot, check, combo, custom_edit))
+        
+        scroll_area = QScrollArea()
+        scroll_area.setWidgetResizable(True)
+        scroll_area.setWidget(slots_widget)
+        main_layout.addWidget(scroll_area)
+        
+        # Buttons
+        button_layout = QHBoxLayout()
+        self.create_button = QPushButton("Log Selected")
+        self.create_button.clicked.connect(self.accept)
+        skip_button = QPushButton("Skip")
+        skip_button.clicked.connect(self.reject)
+        button_layout.addStretch()
+        button_layout.addWidget(skip_button)
+        button_layout.addWidget(self.create_button)
+        main_layout.addLayout(button_layout)
+    
+    @Slot(str)
+    def on_project_changed(self, project_name):
+        """Apply the chosen project to every slot."""
+        for _, _, combo, _ in self.slot_rows:
+            combo.setCurrentText(project_name)
+    
+    def accept(self):
+        """Collect an entry for each checked slot."""
+        entries = []
+        for slot, check, combo, custom_edit in self.slot_rows:
+            if not check.isChecked():
+                continue
+            project_name = combo.currentText()
+            if project_name == 'Other':
+                project_name = custom_edit.text().strip()
+                if not project_name:
+                    QMessageBox.critical(
+                        self, "Error", f"Please enter a custom project name for {slot.strftime('%H:%M')}"
+                    )
+                    return
+            entries.append((project_name, slot - get_work_calendar().interval, slot))
+        
+        self.entries = entries
+        QDialog.accept(self)
+
+class BulkEntryDialog(QDialog):
+    """A grid of the calendar's slots over a range of days, one project per slot, saved in one go."""
+    
+    def __init__(self, projects, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Bulk Entry")
+        self.setMinimumSize(600, 500)
+        self.entries = []
+        self.cells = []
+        # One model behind every cell, so a week of slots doesn't copy the project list each time
+        self.project_model = QStringListModel([''] + list(projects), self)
+        
+        layout = QVBoxLayout(self)
+        
+        range_layout = QHBoxLayout()
+        today = QDate.currentDate()
+        self.from_edit = QDateEdit(today.addDays(1 - today.dayOfWeek()))
+        self.from_edit.setCalendarPopup(True)
+        self.to_edit = QDateEdit(today)
+        self.to_edit.setCalendarPopup(True)
+        show_button = QPushButton("Show Slots")
+        show_button.clicked.connect(self.load_slots)
+        range_layout.addWidget(QLabel("From:"))
+        range_layout.addWidget(self.from_edit)
+        range_layout.addWidget(QLabel("To:"))
+        range_layout.addWidget(self.to_edit)
+        range_layout.addWidget(show_button)
+        layout.addLayout(range_layout)
+        
+        fill_layout = QHBoxLayout()
+        self.fill_combo = QComboBox()
+        self.fill_combo.setModel(self.project_model)
+        fill_button = QPushButton("Fill Empty Slots")
+        fill_button.clicked.connect(self.fill_empty)
+        fill_layout.addWidget(QLabel("Project:"))
+        fill_layout.addWidget(self.fill_combo, 1)
+        fill_layout.addWidget(fill_button)
+        layout.addLayout(fill_layout)
+        
+        self.scroll_area = QScrollArea()
+        self.scroll_area.setWidgetResizable(True)
+        layout.addWidget(self.scroll_area)
+        
+        self.button_box = QDialogButtonBox(QDialogButtonBox.Save | QDialogButtonBox.Cancel)
+        self.button_box.accepted.connect(self.accept)
+        self.button_box.rejected.connect(self.reject)
+        layout.addWidget(self.button_box)
+        
+        self.load_slots()
+    
+    def load_slots(self):
+        """Lay out a column per working day and a row per slot; logged slots can't be picked."""
+        calendar = get_work_calendar()
+        first = self.from_edit.date().toPython()
+        last = self.to_edit.date().toPython()
+        slots = calendar.slots_between(datetime.datetime.combine(first, datetime.time()),
+                                       datetime.datetime.combine(last + datetime.timedelta(days=1), datetime.time()))
+        try:
+            open_slots = set(unlogged_slots(slots))
+        except (IOError, OSError) as e:
+            print(f"Could not check which slots are logged: {e}")
+            open_slots = set(slots)
+        days = sorted({slot.date() for slot in slots})
+        times = sorted({(slot - calendar.interval).time() for slot in slots})
+        
+        grid_widget = QWidget()
+        grid = QGridLayout(grid_widget)
+        for column, day in enumerate(days, 1):
+            grid.addWidget(QLabel(day.strftime('%a %m/%d')), 0, column, alignment=Qt.AlignCenter)
+        for row, start in enumerate(times, 1):
+            grid.addWidget(QLabel(start.strftime('%H:%M')), row, 0)
+        self.cells = []
+        for slot in slots:
+            start = slot - calendar.interval
+            cell = QComboBox()
+            # Editable, so a project that isn't in the list can be typed in
+            cell.setEditable(True)
+            cell.setInsertPolicy(QComboBox.NoInsert)
+            cell.setModel(self.project_model)
+            cell.setCurrentIndex(0)
+            if slot not in open_slots:
+                cell.setEnabled(False)
+                cell.setEditText("logged")
+            grid.addWidget(cell, times.index(start.time()) + 1, days.index(slot.date()) + 1)
+            self.cells.append((start, slot, cell))
+        if not slots:
+            grid.addWidget(QLabel("No working slots on these days"), 0, 0)
+        self.scroll_area.setWidget(grid_widget)
+    
+    def fill_empty(self):
+        """Put the chosen project in every open slot that has none yet."""
+        project = self.fill_combo.currentText()
+        for _, _, cell in self.cells:
+            if cell.isEnabled() and not cell.currentText().strip():
+                cell.setEditText(project)
+    
+    def accept(self):
+        """Check every filled slot and close only if all of them can be saved."""
+        entries = [(cell.currentText().strip(), start, end) for start, end, cell in self.cells
+                   if cell.isEnabled() and cell.currentText().strip()]
+        if not entries:
+            QMessageBox.warning(self, "Nothing to Save", "Pick a project for at least one slot.")
+            return
+        try:
+            self.entries = validate_entries(entries)
+        except BulkEntryError as e:
+            problems = e.problems[:15] + ([f"...and {len(e.problems) - 15} more"] if len(e.problems) > 15 else [])
+            QMessageBox.critical(self, "Nothing Saved", "Please fix these slots:\n\n" + "\n".join(problems))
+            return
+        except (IOError, OSError) as e:
+            # As for single entries, better to save slots we couldn't check than to lose them
+            print(f"Could not check for overlapping entries: {e}")
+            self.entries = entries
+        super().accept()
+
+class ReportDialog(QDialog):
+    # Signals to hand the finished report from the worker thread to the dialog
+    report_ready = Signal(str)
+    report_failed = Signal(str)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Project Totals")
+        self.setMinimumSize(500, 500)
+        
+        layout = QVBoxLayout(self)
+        
+        self.report_text = QPlainTextEdit()
+        self.report_text.setReadOnly(True)
+        font = QFont("Courier")
+        font.setStyleHint(QFont.Monospace)
+        self.report_text.setFont(font)
+        self.report_text.setPlainText("Building report...")
+        layout.addWidget(self.report_text)
+        
+        button_box = QDialogButtonBox(QDialogButtonBox.Close)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+        
+        self.report_ready.connect(self.report_text.setPlainText)
+        self.report_failed.connect(self.report_text.setPlainText)
+        
+        # Stream the CSV on a worker thread so large histories don't freeze the UI
+        self.report_thread = threading.Thread(target=self.build_report, daemon=True)
+        self.report_thread.start()
+    
+    def build_report(self):
+        """Build the report text. Runs on the worker thread."""
+        try:
+            self.report_ready.emit(format_report(get_storage().build_report()))
+        except (IOError, OSError) as e:
+            self.report_failed.emit(f"Could not read entries from {get_storage().describe()}:\n{e}")
+
+class EntriesDialog(QDialog):
+    """Lists one day's entries and lets the user change their project or delete them."""
+
+    def __init__(self, projects, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Edit Entries")
+        self.setMinimumSize(450, 350)
+        self.projects = projects
+        
+        layout = QVBoxLayout(self)
+        
+        self.date_edit = QDateEdit(QDate.currentDate())
+        self.date_edit.setCalendarPopup(True)
+        self.date_edit.dateChanged.connect(self.load_entries)
+        layout.addWidget(self.date_edit)
+        
+        self.entries_list = QListWidget()
+        self.entries_list.setUniformItemSizes(True)
+        layout.addWidget(self.entries_list)
+        
+        btn_layout = QHBoxLayout()
+        change_button = QPushButton("Change Project...")
+        change_button.clicked.connect(self.change_project)
+        btn_layout.addWidget(change_button)
+        delete_button = QPushButton("Delete")
+        delete_button.clicked.connect(self.delete_entry)
+        btn_layout.addWidget(delete_button)
+        layout.addLayout(btn_layout)
+        
+        button_box = QDialogButtonBox(QDialogButtonBox.Close)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+        
+        self.load_entries()
+    
+    def load_entries(self):
+        """List the entries on the selected day."""
+        self.entries_list.clear()
+        day = self.date_edit.date().toPython()
+        try:
+            entries = get_storage().find_entries(day, day)
+        except (StorageError, IOError, OSError) as e:
+            self.entries_list.addItem(str(e))
+            return
+        for entry_id, row in entries:
+            item = QListWidgetItem(f"{row[2]}-{row[4]}  {project_from_subject(row[0])}")
+            item.setData(Qt.UserRole, (entry_id, row))
+            self.entries_list.addItem(item)
+    
+    def selected_entry(self):
+        item = self.entries_list.currentItem()
+        entry = item.data(Qt.UserRole) if item else None
+        if entry is None:
+            QMessageBox.warning(self, "No Selection", "Please select an entry.")
+        return entry
+    
+    def change_project(self):
+        """Move the selected entry to another project."""
+        entry = self.selected_entry()
+        if entry is None:
+            return
+        entry_id, row = entry
+        current = project_from_subject(row[0])
+        index = self.projects.index(current) if current in self.projects else 0
+        project, ok = QInputDialog.getItem(self, "Change Project", "Project:", self.projects, index, False)
+        if not ok or project == current:
+            return
+        start = datetime.datetime.strptime(f"{row[1]} {row[2]}", "%m/%d/%Y %H:%M")
+        end = datetime.datetime.strptime(f"{row[3]} {row[4]}", "%m/%d/%Y %H:%M")
+        self.save_edit(lambda storage: storage.update_entry(entry_id, build_csv_row(project, start, end)))
+    
+    def delete_entry(self):
+        """Delete the selected entry after asking."""
+        entry = self.selected_entry()
+        if entry is None:
+            return
+        entry_id, row = entry
+        reply = QMessageBox.question(
+            self, "Confirm Deletion",
+            f"Delete {project_from_subject(row[0])} from {row[2]} to {row[4]}?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+        )
+        if reply == QMessageBox.Yes:
+            self.save_edit(lambda storage: storage.delete_entry(entry_id))
+    
+    def save_edit(self, edit):
+        try:
+            edit(get_storage())
+        except (StorageError, IOError, OSError) as e:
+            QMessageBox.critical(self, "Error", f"Could not save the change:\n{e}")
+        self.load_entries()
 
 class SchedulerWindow(QMainWindow):
-    # Define a signal to communicate from scheduler thread to main thread
+    # Signal used to show the entry dialog from the scheduler timer or the test button
     show_entry_signal = Signal()
     
     def __init__(self, projects):
@@ -328,13 +822,25 @@ class SchedulerWindow(QMainWindow):
         # Connect the signal to the slot
         self.show_entry_signal.connect(self.show_entry_dialog)
         
+        # Hear back from the background entry writer
+        self.writer_signals = EntryWriterSignals(self)
+        self.writer_signals.entries_written.connect(self.on_entries_written)
+        self.writer_signals.write_failed.connect(self.on_write_failed)
+        
+        # Build the prompt dialog once the window is up, ready for the first prompt
+        self.entry_dialog = None
+        self.prompt_requested_at = time.perf_counter()
+        self.prompt_latencies = []
+        QTimer.singleShot(0, self.prewarm_entry_dialog)
+        
         # Start scheduler after signal connections are set up
         self.setup_scheduler()
         
         # Timer to update current time
-        self.timer = QTimer()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
         self.timer.timeout.connect(self.update_time)
-        self.timer.start(1000)  # Update every second
+        self.update_time()
     
     def setup_ui(self):
         """Set up the user interface for the scheduler window."""
@@ -357,36 +863,48 @@ class SchedulerWindow(QMainWindow):
         layout.addWidget(title_label)
         
         # Info
-        info_label = QLabel("The scheduler is running for business days (Monday-Friday)")
+        info_label = QLabel("The scheduler is running on the working days in your calendar")
         layout.addWidget(info_label)
         
-        schedule_label = QLabel("Prompts will appear at 30-minute intervals from 9:30 AM to 5:30 PM")
+        schedule_label = QLabel(get_work_calendar().describe())
+        schedule_label.setWordWrap(True)
         layout.addWidget(schedule_label)
         
-        # CSV file location
-        file_path = os.path.abspath(CSV_FILE)
-        file_label = QLabel(f"CSV file location: {file_path}")
+        # Entries file location
+        file_label = QLabel(get_storage().describe())
         font = file_label.font()
         font.setPointSize(8)
         file_label.setFont(font)
         layout.addWidget(file_label)
         
         # Current time
-        self.status_label = QLabel("Current time: 00:00:00")
+        self.status_label = QLabel("Current time: 00:00")
         layout.addWidget(self.status_label)
         
         # Current next scheduled time
         self.next_job_label = QLabel("Next prompt: Not scheduled")
         layout.addWidget(self.next_job_label)
         
+        # How long the last prompt took to appear
+        self.latency_label = QLabel("")
+        layout.addWidget(self.latency_label)
+        
+        # Hours logged today and this week
+        self.summary = SummaryWidget(self)
+        layout.addWidget(self.summary)
+        
         # Buttons layout
         button_layout = QHBoxLayout()
         
         # Test button (aligned left)
         self.test_button = QPushButton("Test Dialog")
-        self.test_button.clicked.connect(lambda: self.show_entry_signal.emit())
+        self.test_button.clicked.connect(self.test_prompt)
         button_layout.addWidget(self.test_button)
         
+        self.bulk_button = QPushButton("Bulk Entry")
+        self.bulk_button.clicked.connect(self.bulk_entry)
+        button_layout.addWidget(self.bulk_button)
+        
         button_layout.addStretch()  # Pushes rest to the right
         
                 # Stop button (aligned right)
@@ -402,83 +920,149 @@ class SchedulerWindow(QMainWindow):
     
     def setup_scheduler(self):
         """Set up the scheduler to run at specific times."""
-        times = [
-            "09:30", "10:00", "10:30", "11:00", "11:30", "12:00", "12:30",
-            "13:00", "13:30", "14:00", "14:30", "15:00", "15:30", 
-            "16:00", "16:30", "17:00", "17:30"
-        ]
+        self.prompt_scheduler = PromptScheduler()
+        
+        # A single timer armed for the next slot, rather than a thread polling every second
+        self.scheduler_timer = QTimer(self)
+        self.scheduler_timer.setSingleShot(True)
+        self.scheduler_timer.setTimerType(Qt.PreciseTimer)
+        self.scheduler_timer.timeout.connect(self.run_scheduler)
+        self.run_scheduler()
+    
+    @Slot()
+    def run_scheduler(self):
+        """Check for a due prompt, update the next prompt label and re-arm the timer."""
+        self.prompt_requested_at = time.perf_counter()
+        fired = time.time()
+        aimed_at = self.prompt_scheduler.planned
+        count('scheduler_wakeups')
+        with span('run_scheduler'):
+            due, delay = self.prompt_scheduler.poll(fired)
+            
+            # Re-arm first: the entry dialog below runs its own event loop
+            self.scheduler_timer.start(int(delay * 1000))
+            
+            planned = self.prompt_scheduler.planned
+            if planned is None:
+                next_text = "No working hours in the calendar"
+            elif planned.date() == datetime.date.today():
+                next_text = f"Next prompt: {planned.strftime('%H:%M')}"
+            elif planned.date() - datetime.date.today() < datetime.timedelta(days=7):
+                next_text = f"Next prompt: {planned.strftime('%A %H:%M')}"
+            else:
+                # Past a holiday or PTO, the weekday alone would be ambiguous
+                next_text = f"Next prompt: {planned.strftime('%A %m/%d %H:%M')}"
+            if next_text != self.next_job_label.text():
+                self.next_job_label.setText(next_text)
+        
+        # Wakeups capped by max_sleep fire long before their slot and aren't jitter
+        if aimed_at is not None and fired - aimed_at.timestamp() > -1.0:
+            observe('scheduler_jitter', fired - aimed_at.timestamp(), JITTER_BUCKETS)
+        
+        if self.prompt_scheduler.missed:
+            self.catch_up_missed_slots(due)
+        elif due is not None:
+            self.create_entry_if_business_day()
+    
+    def catch_up_missed_slots(self, due):
+        """Offer one dialog for every slot missed since the last check, plus the due one."""
+        missed, self.prompt_scheduler.missed = self.prompt_scheduler.missed, []
         
-        for time_str in times:
-            schedule.every().day.at(time_str).do(self.create_entry_if_business_day)
+        # Slots already logged some other way don't need catching up
+        slots = unlogged_slots(missed + ([due] if due is not None else []))
+        if not slots:
+            return
         
-        # Start the scheduler in a separate thread
-        self.scheduler_thread = threading.Thread(target=self.run_scheduler, daemon=True)
-        self.scheduler_thread.start()
+        dialog = BackfillDialog(self.projects, slots, parent=self)
+        if dialog.exec() == QDialog.Accepted and dialog.entries:
+            self.create_csv_entries(dialog.entries)
     
-    def run_scheduler(self):
-        """Run the scheduler in a loop."""
-        while True:
-            schedule.run_pending()
-            # Update the next job info
-            next_job = schedule.next_run()
-            if next_job:
-                next_time = next_job.strftime("%H:%M:%S")
-                # Need to use a signal-safe method to update UI from thread
-                QMetaObject.invokeMethod(
-                    self.next_job_label, 
-                    "setText", 
-                    Qt.QueuedConnection,  # Safe for cross-thread calls
-                    Q_ARG(str, f"Next prompt: {next_time}")
-                )
-            time.sleep(1)
+    def bulk_entry(self):
+        """Log many slots over one or more days at once."""
+        projects = get_project_catalog().projects() or self.projects
+        dialog = BulkEntryDialog(projects, parent=self)
+        if dialog.exec() == QDialog.Accepted and dialog.entries:
+            self.create_csv_entries(dialog.entries)
     
     def create_entry_if_business_day(self):
         """Create a time entry if today is a business day."""
-        if is_business_day():
+        reason = get_work_calendar().day_off_reason(datetime.date.today())
+        if reason is None:
             # Emit the signal to show dialog from the main thread
             self.show_entry_signal.emit()
         else:
-            day_name = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"][datetime.datetime.now().weekday()]
-            print(f"Today is {day_name}. No timetracking entries on weekends.")
+            print(f"Today is {reason}. No timetracking entries.")
+    
+    def test_prompt(self):
+        """Show a prompt now, timed like a scheduled one."""
+        self.prompt_requested_at = time.perf_counter()
+        self.show_entry_signal.emit()
+    
+    def prewarm_entry_dialog(self):
+        """Build the prompt dialog ahead of time so a prompt only has to reset and show it."""
+        if self.entry_dialog is None:
+            self.entry_dialog = TimeEntryDialog(self.projects, use_scheduler=True, parent=self)
+            self.entry_dialog.ensurePolished()
+            self.entry_dialog.adjustSize()
     
     @Slot()  # Mark as a slot that can be connected to signals
     def show_entry_dialog(self):
         """Show the time entry dialog. This is called on the main thread via the signal."""
-        dialog = TimeEntryDialog(self.projects, use_scheduler=True, parent=self)
-        if dialog.exec() == QDialog.Accepted:
-            self.create_csv_entry(dialog.project_name, dialog.start_time, dialog.end_time)
-    
-    def create_csv_entry(self, project_name, start_time, end_time):
-        """Create an entry in the CSV file."""
-        # Format data for CSV - using MM/DD/YYYY format
-        start_date = start_time.strftime("%m/%d/%Y")
-        start_time_str = start_time.strftime("%H:%M")
-        end_date = end_time.strftime("%m/%d/%Y")
-        end_time_str = end_time.strftime("%H:%M")
-        subject = f"Timetracking: {project_name}"
-        
-        # Create entry in CSV file - always append to end of file
-        with open(CSV_FILE, 'a', newline='') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=CSV_HEADERS)
-            writer.writerow({
-                'Subject': subject,
-                'Start Date': start_date,
-                'Start Time': start_time_str,
-                'End Date': end_date,
-                'End Time': end_time_str,
-                'Description': f"Time tracking for {project_name}"
-            })
-        
-        QMessageBox.information(self, "Success", f"Entry added: {subject} on {start_date} at {start_time_str}")
+        # Timed up to the dialog appearing; the user's answer isn't part of the span
+        with span('show_entry_dialog'):
+            projects = get_project_catalog().projects() or self.projects
+            dialog = self.entry_dialog
+            if dialog is None or dialog.isVisible():
+                # Still answering the last prompt: leave it alone and use a fresh dialog
+                dialog = TimeEntryDialog(projects, use_scheduler=True, parent=self)
+            else:
+                dialog.prepare(projects)
+        dialog.painted_callback = self.report_prompt_latency
+        if dialog.exec() == QDialog.Accepted and dialog.entries:
+            self.create_csv_entries(dialog.entries)
+    
+    def report_prompt_latency(self):
+        """Report how long the prompt took from the timer firing to being painted."""
+        latency_ms = (time.perf_counter() - self.prompt_requested_at) * 1000
+        self.prompt_latencies.append(latency_ms)
+        observe('prompt_latency', latency_ms / 1000)
+        self.latency_label.setText(f"Last prompt appeared in {latency_ms:.0f} ms")
+    
+    def create_csv_entries(self, entries):
+        """Queue several (project, start, end) entries to be written together."""
+        rows = [build_csv_row(*entry) for entry in entries]
+        self.writer_signals.watch(get_entry_writer().submit(rows))
+    
+    @Slot(list)
+    def on_entries_written(self, rows):
+        """Confirm entries once the writer has saved them."""
+        self.summary.refresh()
+        if len(rows) == 1:
+            row = rows[0]
+            QMessageBox.information(
+                self, "Success",
+                f"Entry added: {row['Subject']} on {row['Start Date']} at {row['Start Time']}"
+            )
+        else:
+            QMessageBox.information(self, "Success", f"{len(rows)} entries added")
+    
+    @Slot(str)
+    def on_write_failed(self, error):
+        """Tell the user when the writer couldn't save an entry."""
+        QMessageBox.critical(self, "Error", f"Could not save entry:\n{error}")
     
     def update_time(self):
         """Update the current time display."""
-        current_time = datetime.datetime.now().strftime("%H:%M:%S")
-        self.status_label.setText(f"Current time: {current_time}")
+        now = datetime.datetime.now()
+        self.status_label.setText(f"Current time: {now.strftime('%H:%M')}")
+        # Wake again at the next minute boundary rather than every second
+        self.timer.start((60 - now.second) * 1000 - now.microsecond // 1000)
     
     def closeEvent(self, event):
         """Handle window close event."""
-        # No need to explicitly stop the scheduler thread as it's a daemon thread
+        # Closing the window stops the prompts
+        self.scheduler_timer.stop()
+        self.timer.stop()
         event.accept()
 
 class MainWindow(QMainWindow):
@@ -486,7 +1070,13 @@ class MainWindow(QMainWindow):
         super().__init__()
         
         # Load projects
-        self.projects = load_projects()
+        self.project_catalog = get_project_catalog()
+        self.projects = self.project_catalog.projects()
+        
+        # Hear back from the background entry writer
+        self.writer_signals = EntryWriterSignals(self)
+        self.writer_signals.entries_written.connect(self.on_entries_written)
+        self.writer_signals.write_failed.connect(self.on_write_failed)
         
         # Check if projects need to be set up
         if not self.projects:
@@ -511,12 +1101,23 @@ class MainWindow(QMainWindow):
         edit_projects_action.triggered.connect(self.edit_projects)
         file_menu.addAction(edit_projects_action)
         
+        edit_entries_action = QAction("Edit Entries", self)
+        edit_entries_action.triggered.connect(self.edit_entries)
+        file_menu.addAction(edit_entries_action)
+        
         file_menu.addSeparator()
         
         exit_action = QAction("Exit", self)
         exit_action.triggered.connect(self.close)
         file_menu.addAction(exit_action)
         
+        # Reports menu
+        reports_menu = menubar.addMenu("Reports")
+        
+        reports_action = QAction("Project Totals", self)
+        reports_action.triggered.connect(self.show_reports)
+        reports_menu.addAction(reports_action)
+        
         # Help menu
         help_menu = menubar.addMenu("Help")
         
@@ -554,6 +1155,12 @@ class MainWindow(QMainWindow):
         create_button.clicked.connect(self.create_single_entry)
         layout.addWidget(create_button, alignment=Qt.AlignCenter)
         
+        # Bulk entry button
+        bulk_button = QPushButton("Bulk Entry")
+        bulk_button.setMinimumWidth(button_width)
+        bulk_button.clicked.connect(self.bulk_entry)
+        layout.addWidget(bulk_button, alignment=Qt.AlignCenter)
+        
         # Scheduler button
         scheduler_button = QPushButton("Start Scheduler")
         scheduler_button.setMinimumWidth(button_width)
@@ -581,9 +1188,12 @@ class MainWindow(QMainWindow):
         # Add spacing
         layout.addSpacing(20)
         
-        # CSV file info
-        file_path = os.path.abspath(CSV_FILE)
-        file_label = QLabel(f"CSV file: {file_path}")
+        # Hours logged today and this week
+        self.summary = SummaryWidget(self)
+        layout.addWidget(self.summary, alignment=Qt.AlignCenter)
+        
+        # Entries file info
+        file_label = QLabel(get_storage().describe())
         font = file_label.font()
         font.setPointSize(8)
         file_label.setFont(font)
@@ -604,7 +1214,7 @@ class MainWindow(QMainWindow):
         dialog = ProjectsDialog([], self)
         if dialog.exec() == QDialog.Accepted and dialog.projects:
             self.projects = dialog.projects
-            save_projects(self.projects)
+            self.project_catalog.save(self.projects)
         else:
             # If user cancels or doesn't configure any projects, exit the program
             QMessageBox.warning(
@@ -623,46 +1233,63 @@ class MainWindow(QMainWindow):
         dialog = ProjectsDialog(self.projects, self)
         if dialog.exec() == QDialog.Accepted:
             self.projects = dialog.projects
-            save_projects(self.projects)
+            self.project_catalog.save(self.projects)
+    
+    def bulk_entry(self):
+        """Log many slots over one or more days at once."""
+        dialog = BulkEntryDialog(self.projects, self)
+        if dialog.exec() == QDialog.Accepted and dialog.entries:
+            self.create_csv_entries(dialog.entries)
+    
+    def edit_entries(self):
+        """Change or delete entries already written."""
+        EntriesDialog(self.projects, self).exec()
+        self.summary.refresh()
     
     def create_single_entry(self):
         """Show dialog to create a single time tracking entry."""
-        # Check if today is a business day
-        today = datetime.datetime.now().weekday()
-        if today >= 5:  # Saturday or Sunday
+        # Check if today is a working day in the calendar
+        today = datetime.date.today()
+        reason = get_work_calendar().day_off_reason(today)
+        if reason is not None:
             QMessageBox.information(
                 self, 
-                "Weekend", 
-                f"Today is {'Saturday' if today == 5 else 'Sunday'}. Skipping timetracking."
+                "Day Off", 
+                f"{today.strftime('%A')} is {reason}. Skipping timetracking."
             )
             return
         
         dialog = TimeEntryDialog(self.projects, use_scheduler=False, parent=self)
-        if dialog.exec() == QDialog.Accepted:
-            self.create_csv_entry(dialog.project_name, dialog.start_time, dialog.end_time)
-    
-    def create_csv_entry(self, project_name, start_time, end_time):
-        """Create an entry in the CSV file."""
-        # Format data for CSV - using MM/DD/YYYY format
-        start_date = start_time.strftime("%m/%d/%Y")
-        start_time_str = start_time.strftime("%H:%M")
-        end_date = end_time.strftime("%m/%d/%Y")
-        end_time_str = end_time.strftime("%H:%M")
-        subject = f"Timetracking: {project_name}"
-        
-        # Create entry in CSV file - always append to end of file
-        with open(CSV_FILE, 'a', newline='') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=CSV_HEADERS)
-            writer.writerow({
-                'Subject': subject,
-                'Start Date': start_date,
-                'Start Time': start_time_str,
-                'End Date': end_date,
-                'End Time': end_time_str,
-                'Description': f"Time tracking for {project_name}"
-            })
-        
-        QMessageBox.information(self, "Success", f"Entry added: {subject} on {start_date} at {start_time_str}")
+        if dialog.exec() == QDialog.Accepted and dialog.entries:
+            self.create_csv_entries(dialog.entries)
+    
+    def create_csv_entries(self, entries):
+        """Queue several (project, start, end) entries to be written together."""
+        rows = [build_csv_row(*entry) for entry in entries]
+        self.writer_signals.watch(get_entry_writer().submit(rows))
+    
+    @Slot(list)
+    def on_entries_written(self, rows):
+        """Confirm entries once the writer has saved them."""
+        self.summary.refresh()
+        if len(rows) == 1:
+            row = rows[0]
+            QMessageBox.information(
+                self, "Success",
+                f"Entry added: {row['Subject']} on {row['Start Date']} at {row['Start Time']}"
+            )
+        else:
+            QMessageBox.information(self, "Success", f"{len(rows)} entries added")
+    
+    @Slot(str)
+    def on_write_failed(self, error):
+        """Tell the user when the writer couldn't save an entry."""
+        QMessageBox.critical(self, "Error", f"Could not save entry:\n{error}")
+    
+    def show_reports(self):
+        """Show per-project, per-week and per-day hour totals."""
+        dialog = ReportDialog(self)
+        dialog.exec()
     
     def start_scheduler(self):
         """Start the scheduler window."""
@@ -679,19 +1306,48 @@ class MainWindow(QMainWindow):
         msg += "5. Click 'Select file from your computer' and select your CSV file\n"
         msg += "6. Choose the calendar to import events to\n"
         msg += "7. Click 'Import'\n\n"
-        msg += f"Your CSV file is located at:\n{os.path.abspath(CSV_FILE)}"
+        # Only export what's new since last time, so nothing is imported twice
+        storage = get_storage()
+        try:
+            count = storage.pending_export_count()
+            if count:
+                msg += (f"{count} entries have been added since the last export. Click 'Export New Entries'\n"
+                        f"to write them to {os.path.abspath(DELTA_FILE)}")
+            else:
+                msg += "No entries have been added since the last export."
+        except (IOError, OSError) as e:
+            count = 0
+            msg += f"Could not check for new entries:\n{e}"
         
         # Create message box with scrollable text area
         msg_box = QMessageBox(self)
         msg_box.setWindowTitle("Import Instructions")
         msg_box.setText(msg)
         msg_box.setStandardButtons(QMessageBox.Ok)
+        export_button = msg_box.addButton("Export New Entries", QMessageBox.ActionRole)
+        export_button.setEnabled(count > 0)
+        reset_button = msg_box.addButton("Export Everything Again", QMessageBox.ResetRole)
         
         # Adjust the size of the message box
         text_width = QFontMetrics(msg_box.font()).horizontalAdvance('x') * 60  # 60 chars wide
         msg_box.setMinimumWidth(text_width)
         
         msg_box.exec()
+        if msg_box.clickedButton() is export_button:
+            self.export_new_entries()
+        elif msg_box.clickedButton() is reset_button:
+            storage.reset_export_watermark()
+            self.show_instructions()
+
+    def export_new_entries(self):
+        """Write the entries added since the last export to the delta file and move the watermark."""
+        try:
+            count = get_storage().export_delta()
+        except (IOError, OSError) as e:
+            QMessageBox.critical(self, "Export Failed", f"Could not export the new entries:\n{e}")
+            return
+        QMessageBox.information(self, "Export Complete",
+                                f"{count} new entries are in:\n{os.path.abspath(DELTA_FILE)}")
 
 
 def show_splash_message(message, duration=2000):
@@ -745,9 +1401,13 @@ def main():
     app.setStyle(QStyleFactory.create("Fusion"))  # Use Fusion style for consistent cross-platform look
     
     # Initialize CSV file
-    is_new = initialize_csv_file()
+    storage = get_storage()
+    is_new = storage.initialize()
     if is_new:
-        show_splash_message("Created new timetracking CSV file")
+        show_splash_message(f"Created new timetracking {storage.name} file")
+    
+    # Write any queued entries out before the application exits
+    app.aboutToQuit.connect(get_entry_writer().close)
     
     # Show main window
     window = MainWindow()
@@ -0,0 +1,201 @@
+"""Edit and delete log for the append-only entries CSV.
+
+Changing an entry appends an update or tombstone record to a log next to
+the CSV (timetracking_entries.csv.edits) instead of rewriting the file.
+Readers resolve each row against the log's latest record for its id, and
+CsvStorage.fold_edits() later rewrites the CSV (and any archived months
+involved) with the edits applied and empties the log.
+
+An entry's id is its start day plus a hash of the row as first stored, so
+ids survive compaction and archiving and point straight at the day to
+read. Exact duplicate rows share an id; an edit applies to one of them.
+Folding stores edited rows afresh, so they get new ids.
+"""
+import contextlib
+import datetime
+import hashlib
+import json
+import os
+
+from timetracking_index import START_DATE_COLUMN, parse_csv_date
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks on Windows; a single instance is still safe there
+    fcntl = None
+
+# Fold the log into the CSV once this share of stored rows is superseded
+FOLD_RATIO = 0.05
+
+def entry_id(row):
+    """Return the id of a stored row (a list in CSV_HEADERS order), or None if it has no start date."""
+    date = parse_csv_date(row[START_DATE_COLUMN]) if len(row) > START_DATE_COLUMN else None
+    if date is None:
+        return None
+    digest = hashlib.sha1('\x1f'.join(row).encode('utf-8')).hexdigest()[:12]
+    return f"{date:%Y%m%d}-{digest}"
+
+def id_date(value):
+    """Return the start day encoded in an entry id, or raise ValueError."""
+    return datetime.datetime.strptime(value.split('-')[0], "%Y%m%d").date()
+
+class EditLog:
+    """Update and tombstone records for one entries CSV, as JSON lines.
+
+    Each record carries the row as it is stored in the CSV ("before") and,
+    for updates, its new version ("after"). A "fold" record marks the point
+    where a fold committed: records before it are already in the CSV once
+    the folded CSV has been moved into place. Once the fold's files are all
+    in place the log is rewritten to start with a "generation" record
+    counting the folds so far, which readers compare to tell whether a fold
+    replaced the files while they read them.
+    """
+
+    def __init__(self, csv_path):
+        self.path = csv_path + '.edits'
+        self.fold_path = csv_path + '.fold'
+        self._state = None
+        self._signature = None
+        self._generation = 0
+        self._committing = False
+
+    @contextlib.contextmanager
+    def locked(self):
+        """Open the log and hold an exclusive lock on it."""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, 'r+b') as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            yield f
+
+    def _scan(self, f):
+        """Return (records, end of the last intact line)."""
+        f.seek(0)
+        records = []
+        end = 0
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+            end += len(line)
+        return records, end
+
+    def records(self, f):
+        """Return the intact records of a locked log, cutting off a torn last line."""
+        records, end = self._scan(f)
+        f.seek(0, os.SEEK_END)
+        if f.tell() != end:
+            f.truncate(end)
+        return records
+
+    def append(self, f, records):
+        """Append records to a locked log and sync them to disk."""
+        self.records(f)
+        f.seek(0, os.SEEK_END)
+        f.write(b''.join(json.dumps(record).encode('utf-8') + b'\n' for record in records))
+        f.flush()
+        os.fsync(f.fileno())
+
+    def state(self):
+        """Return (live, dates, record count), re-read only when the log changes.
+
+        live maps each edited id to [row as stored, latest version or None if
+        deleted]; dates holds the Start Date strings of both, so readers only
+        hash rows on days that have edits.
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self._generation, self._committing = 0, False
+            return {}, frozenset(), 0
+        folding = os.path.exists(self.fold_path)
+        signature = (stat.st_size, stat.st_mtime_ns, folding)
+        if signature != self._signature:
+            with open(self.path, 'rb') as f:
+                records, _ = self._scan(f)
+            live = {}
+            generation, committing = 0, False
+            for record in records:
+                if record['op'] == 'generation':
+                    generation = record['generation']
+                    continue
+                if record['op'] == 'fold':
+                    committing = True
+                    if not folding:
+                        # The folded CSV is in place, so everything before is in it
+                        live = {}
+                    continue
+                live[record['id']] = [record['before'], record.get('after')]
+            dates = frozenset(row[START_DATE_COLUMN] for versions in live.values()
+                              for row in versions if row is not None)
+            self._state = (live, dates, sum(1 for record in records if record['op'] in ('update', 'delete')))
+            self._generation, self._committing = generation, committing
+            self._signature = signature
+        return self._state
+
+    def snapshot(self):
+        """Return (live, dates, generation), waiting for a fold that is moving its files into place."""
+        live, dates, _ = self.state()
+        if self._committing:
+            # Folds hold the lock until the log is rewritten after the move
+            try:
+                f = open(self.path, 'rb')
+            except FileNotFoundError:
+                return self.state()[:2] + (self._generation,)
+            with f:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_SH)
+                live, dates, _ = self.state()
+        return live, dates, self._generation
+
+    def next_generation(self, records):
+        """Return the generation a fold committing on top of records starts."""
+        return 1 + max((record['generation'] for record in records if record['op'] == 'generation'), default=0)
+
+def resolve_rows(rows, live, dates, start_date=None, end_date=None, with_ids=False):
+    """Yield rows with edits applied: edited rows are dropped and their latest versions added at the end.
+
+    With a date range, only latest versions starting in it are added. With
+    with_ids, (id, row) pairs are yielded instead, latest versions under the
+    id of the row they replace.
+    """
+    remaining = set(live)
+    for row in rows:
+        row_id = None
+        if len(row) > START_DATE_COLUMN and row[START_DATE_COLUMN] in dates:
+            row_id = entry_id(row)
+            if row_id in remaining:
+                remaining.discard(row_id)
+                continue
+        if not with_ids:
+            yield row
+        else:
+            row_id = row_id or entry_id(row)
+            if row_id is not None:
+                yield row_id, row
+    low = start_date or datetime.date.min
+    high = end_date or datetime.date.max
+    for row_id, (_, after) in live.items():
+        if after is not None and low <= parse_csv_date(after[START_DATE_COLUMN]) <= high:
+            yield (row_id, after) if with_ids else after
+
+def apply_in_place(rows, live, dates, remaining):
+    """Yield rows with each edited row replaced by its latest version, or left out if deleted.
+
+    Ids are taken out of remaining as their rows turn up, so each edit
+    applies to one row even across several calls.
+    """
+    for row in rows:
+        if len(row) > START_DATE_COLUMN and row[START_DATE_COLUMN] in dates:
+            row_id = entry_id(row)
+            if row_id in remaining:
+                remaining.discard(row_id)
+                after = live[row_id][1]
+                if after is not None:
+                    yield after
+                continue
+        yield row
@@ -0,0 +1,264 @@
+"""Streaming iCalendar (.ics) export and import of time tracking entries.
+
+Exported events get a UID made from the project and start time, so
+importing the file again (into Google Calendar or back into the tracker)
+updates events instead of duplicating them. Both directions handle one
+event at a time, so multi-year calendars need no more memory than a short
+one; the importer only keeps a set of 8-byte hashes of the UIDs it has
+seen.
+"""
+import datetime
+import hashlib
+import re
+
+from timetracking_core import CSV_HEADERS, build_csv_row
+from timetracking_reports import project_from_subject
+
+PRODID = "-//Timetracker//Time tracking entries//EN"
+UID_DOMAIN = "timetracker"
+# Imported entries are handed to the writer this many at a time
+IMPORT_BATCH = 1000
+# Lines longer than this many octets are folded (RFC 5545, 3.1)
+_LINE_OCTETS = 75
+
+_SUBJECT, _START_DATE, _START_TIME, _END_DATE, _END_TIME, _DESCRIPTION = (
+    CSV_HEADERS.index(name)
+    for name in ('Subject', 'Start Date', 'Start Time', 'End Date', 'End Time', 'Description')
+)
+
+_DURATION = re.compile(r'([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+
+def event_uid(project, start):
+    """Return the UID for an entry: the same project and start always give the same UID."""
+    key = f"{project}\x1f{start:%Y%m%dT%H%M}".encode('utf-8')
+    return f"{hashlib.sha1(key).hexdigest()[:24]}@{UID_DOMAIN}"
+
+def _uid_key(uid):
+    return int.from_bytes(hashlib.sha1(uid.encode('utf-8')).digest()[:8], 'big')
+
+def _escape(text):
+    return (text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+def _unescape(text):
+    return re.sub(r'\\(.)', lambda m: '\n' if m.group(1) in 'nN' else m.group(1), text)
+
+def _fold(line):
+    """Split a content line into CRLF-terminated pieces of at most 75 octets."""
+    if len(line.encode('utf-8')) <= _LINE_OCTETS:
+        return line + '\r\n'
+    pieces = []
+    piece, size, limit = '', 0, _LINE_OCTETS
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > limit:
+            pieces.append(piece)
+            # Continuation lines start with a space, which counts towards their length
+            piece, size, limit = '', 0, _LINE_OCTETS - 1
+        piece += char
+        size += width
+    pieces.append(piece)
+    return '\r\n '.join(pieces) + '\r\n'
+
+def _parse_row_time(date_value, time_value):
+    return datetime.datetime.strptime(f"{date_value} {time_value}", "%m/%d/%Y %H:%M")
+
+def write_ics(rows, out, stamp=None):
+    """Write entry rows (lists in CSV_HEADERS order) to out as an iCalendar; return how many.
+
+    Times are written as floating local times, as the entries are stored.
+    """
+    stamp = (stamp or datetime.datetime.now(datetime.timezone.utc)).strftime("%Y%m%dT%H%M%SZ")
+    out.write(f"BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:{PRODID}\r\nCALSCALE:GREGORIAN\r\n")
+    count = 0
+    for row in rows:
+        try:
+            start = _parse_row_time(row[_START_DATE], row[_START_TIME])
+            end = _parse_row_time(row[_END_DATE], row[_END_TIME])
+        except (IndexError, ValueError):
+            continue
+        out.write("BEGIN:VEVENT\r\n")
+        out.write(_fold(f"UID:{event_uid(project_from_subject(row[_SUBJECT]), start)}"))
+        out.write(f"DTSTAMP:{stamp}\r\nDTSTART:{start:%Y%m%dT%H%M%S}\r\nDTEND:{end:%Y%m%dT%H%M%S}\r\n")
+        out.write(_fold(f"SUMMARY:{_escape(row[_SUBJECT])}"))
+        if len(row) > _DESCRIPTION and row[_DESCRIPTION]:
+            out.write(_fold(f"DESCRIPTION:{_escape(row[_DESCRIPTION])}"))
+        out.write("END:VEVENT\r\n")
+        count += 1
+    out.write("END:VCALENDAR\r\n")
+    return count
+
+def _content_lines(lines):
+    """Yield unfolded content lines from an iterable of raw lines."""
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t'):
+            if current is not None:
+                current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current:
+        yield current
+
+def _split_property(line):
+    """Return (name, {param: value}, value) for a content line."""
+    quoted = False
+    for i, char in enumerate(line):
+        if char == '"':
+            quoted = not quoted
+        elif char == ':' and not quoted:
+            head, value = line[:i], line[i + 1:]
+            break
+    else:
+        return None, {}, ''
+    name, *params = head.split(';')
+    parameters = {}
+    for param in params:
+        key, _, param_value = param.partition('=')
+        parameters[key.upper()] = param_value.strip('"')
+    return name.upper(), parameters, value
+
+def iter_events(lines):
+    """Yield each VEVENT of an iCalendar as {property name: (parameters, value)}.
+
+    Only the first of repeated properties is kept, and properties of nested
+    components such as VALARM are ignored.
+    """
+    components = []
+    event = None
+    for line in _content_lines(lines):
+        name, parameters, value = _split_property(line)
+        if name == 'BEGIN':
+            components.append(value.upper())
+            if components == ['VCALENDAR', 'VEVENT'] or components == ['VEVENT']:
+                event = {}
+        elif name == 'END':
+            if components and components[-1] == 'VEVENT' and event is not None:
+                yield event
+                event = None
+            if components:
+                components.pop()
+        elif event is not None and components and components[-1] == 'VEVENT' and name:
+            event.setdefault(name, (parameters, value))
+
+def _parse_datetime(parameters, value):
+    """Return a naive local datetime, or None for dates (all-day events) and bad values."""
+    if parameters.get('VALUE', '').upper() == 'DATE' or 'T' not in value:
+        return None
+    try:
+        moment = datetime.datetime.strptime(value.rstrip('Zz')[:15], "%Y%m%dT%H%M%S")
+    except ValueError:
+        return None
+    if value.upper().endswith('Z'):
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    elif 'TZID' in parameters:
+        try:
+            from zoneinfo import ZoneInfo
+            moment = moment.replace(tzinfo=ZoneInfo(parameters['TZID']))
+        except (ImportError, ValueError, KeyError, OSError):
+            pass  # An unknown zone is read as local time
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment.replace(second=0)
+
+def _parse_duration(value):
+    match = _DURATION.match(value.strip().upper())
+    if not match or not any(match.groups()[1:]):
+        return None
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    duration = datetime.timedelta(weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0),
+                                  minutes=int(minutes or 0), seconds=int(seconds or 0))
+    return -duration if sign == '-' else duration
+
+def event_entry(event):
+    """Return (project, start, end) for a VEVENT, or None if it can't be an entry.
+
+    All-day and cancelled events are left out, and recurring events count
+    once, at their first occurrence.
+    """
+    if event.get('STATUS', ({}, ''))[1].upper() == 'CANCELLED':
+        return None
+    project = project_from_subject(_unescape(event.get('SUMMARY', ({}, ''))[1])).strip()
+    if not project or 'DTSTART' not in event:
+        return None
+    start = _parse_datetime(*event['DTSTART'])
+    if start is None:
+        return None
+    if 'DTEND' in event:
+        end = _parse_datetime(*event['DTEND'])
+    elif 'DURATION' in event:
+        duration = _parse_duration(event['DURATION'][1])
+        end = start + duration if duration is not None else None
+    else:
+        end = None
+    if end is None or end <= start:
+        return None
+    return project, start, end
+
+def seen_uids(rows):
+    """Return the UID hashes of stored entry rows, for import_ics to skip."""
+    seen = set()
+    for row in rows:
+        try:
+            start = _parse_row_time(row[_START_DATE], row[_START_TIME])
+        except (IndexError, ValueError):
+            continue
+        seen.add(_uid_key(event_uid(project_from_subject(row[_SUBJECT]), start)))
+    return seen
+
+def import_ics(lines, submit, seen, index=None, policy=None, batch_size=IMPORT_BATCH):
+    """Add the events in an iCalendar that aren't entries yet; return (added, duplicates, skipped, rejected).
+
+    lines is any iterable of the file's lines and seen the set from
+    seen_uids(), which is updated as events are added. An event is a
+    duplicate when an entry with the same project and start time exists,
+    which is the case for anything this module exported. With an
+    OverlapIndex, every other event goes through index.resolve() under
+    policy, as a single entry would, and rejected holds the Entries of
+    events left out because they overlap; the index also learns of each
+    event imported, so events in the file are checked against each other.
+    New entries keep the event's DESCRIPTION and are passed to submit() as
+    lists of CSV row dicts of up to batch_size.
+    """
+    from timetracking_overlaps import OverlapError, OverlapPolicy
+    from timetracking_reports import Entry
+    policy = policy or OverlapPolicy.REJECT
+    added = duplicates = skipped = 0
+    rejected = []
+    batch = []
+    for event in iter_events(lines):
+        entry = event_entry(event)
+        if entry is None:
+            skipped += 1
+            continue
+        key = _uid_key(event_uid(entry[0], entry[1]))
+        if key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+        pieces = [Entry(*entry)]
+        if index is not None:
+            try:
+                pieces = index.resolve(*entry, policy)
+            except OverlapError:
+                rejected.append(pieces[0])
+                continue
+        description = _unescape(event['DESCRIPTION'][1]) if 'DESCRIPTION' in event else ''
+        for piece in pieces:
+            if index is not None:
+                index.add(piece)
+            row = build_csv_row(*piece)
+            if description:
+                row['Description'] = description
+            batch.append(row)
+        if len(batch) >= batch_size:
+            submit(batch)
+            added += len(batch)
+            batch = []
+    if batch:
+        submit(batch)
+        added += len(batch)
+    return added, duplicates, skipped, rejected
@@ -0,0 +1,294 @@
+"""Sidecar index mapping each entry's Start Date to its byte offset in the CSV."""
+import bisect
+import csv
+import datetime
+import mmap
+import os
+import struct
+import threading
+
+from timetracking_core import CSV_FILE, CSV_HEADERS
+
+# Index file layout: a fixed header recording the CSV size and mtime the index
+# matches, followed by one (date ordinal, byte offset) record per CSV row.
+_MAGIC = b'TTIX'
+_VERSION = 1
+_HEADER = struct.Struct('<4sIQq')
+_RECORD = struct.Struct('<IQ')
+
+START_DATE_COLUMN = CSV_HEADERS.index('Start Date')
+
+def parse_csv_date(value):
+    """Parse a MM/DD/YYYY date from the CSV, or return None if it isn't one."""
+    try:
+        month, day, year = value.split('/')
+        return datetime.date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+class _LineSource:
+    """Feed decoded lines to csv.reader while tracking the byte position."""
+
+    def __init__(self, f):
+        self.f = f
+        self.pos = f.tell()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.f.readline()
+        if not line:
+            raise StopIteration
+        self.pos += len(line)
+        return line.decode('utf-8')
+
+def iter_csv_records(f):
+    """Yield (byte offset, row list) for each record in a binary CSV file handle.
+
+    csv.reader only pulls the lines it needs for one record, so the position
+    before each next() call is the start of the record it returns, even when a
+    quoted field spans several lines.
+    """
+    source = _LineSource(f)
+    reader = csv.reader(source)
+    while True:
+        offset = source.pos
+        row = next(reader, None)
+        if row is None:
+            return
+        if row:
+            yield offset, row
+
+class DateIndex:
+    """Byte-offset index of the entries CSV keyed by Start Date.
+
+    The index lives in a sidecar file next to the CSV. It is checked against the
+    CSV's size and mtime when loaded and rebuilt from scratch if they differ, so
+    a CSV edited by hand (or by another program) never returns the wrong rows.
+    """
+
+    def __init__(self, csv_path=CSV_FILE, index_path=None):
+        self.csv_path = csv_path
+        self.index_path = index_path or csv_path + '.idx'
+        self._offsets = {}      # date ordinal -> list of row offsets
+        self._ordinals = []     # sorted date ordinals present in the index
+        self._signature = None  # CSV (size, mtime_ns) the index was stamped with
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    def load(self):
+        """Load the sidecar index, rebuilding it if it no longer matches the CSV."""
+        with self._lock:
+            if not self._read_index_file():
+                self.rebuild()
+            self._loaded = True
+        return self
+
+    def _ensure_current(self):
+        """Load the index, or reload it if the CSV changed since it was stamped."""
+        if not self._loaded or self._csv_signature() != self._signature:
+            self.load()
+
+    def _csv_signature(self):
+        """Return the (size, mtime_ns) the index must match, or None if no CSV."""
+        try:
+            stat = os.stat(self.csv_path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _read_index_file(self):
+        """Read the sidecar file; return False if it is missing, torn or stale."""
+        signature = self._csv_signature()
+        if signature is None:
+            return False
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return False
+
+        if len(data) < _HEADER.size or (len(data) - _HEADER.size) % _RECORD.size:
+            return False
+        magic, version, size, mtime_ns = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION or (size, mtime_ns) != signature:
+            return False
+
+        self._offsets = {}
+        for ordinal, offset in _RECORD.iter_unpack(memoryview(data)[_HEADER.size:]):
+            self._offsets.setdefault(ordinal, []).append(offset)
+        self._ordinals = sorted(self._offsets)
+        self._signature = signature
+        return True
+
+    def rebuild(self):
+        """Scan the whole CSV and rewrite the sidecar index from it."""
+        with self._lock:
+            self._offsets = {}
+            records = []
+            if os.path.exists(self.csv_path):
+                with open(self.csv_path, 'rb') as f:
+                    for offset, row in iter_csv_records(f):
+                        if row == CSV_HEADERS or len(row) <= START_DATE_COLUMN:
+                            continue
+                        date = parse_csv_date(row[START_DATE_COLUMN])
+                        if date is None:
+                            continue
+                        ordinal = date.toordinal()
+                        self._offsets.setdefault(ordinal, []).append(offset)
+                        records.append(_RECORD.pack(ordinal, offset))
+            self._ordinals = sorted(self._offsets)
+            self._loaded = True
+
+            signature = self._csv_signature() or (0, 0)
+            with open(self.index_path, 'wb') as f:
+                f.write(_HEADER.pack(_MAGIC, _VERSION, *signature))
+                f.write(b''.join(records))
+            self._signature = signature
+
+    def add(self, dates_and_offsets):
+        """Record freshly appended rows and re-stamp the index with the CSV's state.
+
+        Rows without a parseable date are passed as (None, offset) so the offsets
+        can still be checked against the end of the CSV the index last matched.
+        """
+        with self._lock:
+            if not self._loaded:
+                # Loading rebuilds from the CSV, which already holds the new rows
+                self.load()
+                return
+            if dates_and_offsets and dates_and_offsets[0][1] != self._signature[0]:
+                # Something else appended in between: don't guess, rescan
+                self.rebuild()
+                return
+
+            records = []
+            for date, offset in dates_and_offsets:
+                if date is None:
+                    continue
+                ordinal = date.toordinal()
+                if ordinal not in self._offsets:
+                    self._offsets[ordinal] = []
+                    bisect.insort(self._ordinals, ordinal)
+                self._offsets[ordinal].append(offset)
+                records.append(_RECORD.pack(ordinal, offset))
+
+            signature = self._csv_signature() or (0, 0)
+            with open(self.index_path, 'r+b') as f:
+                f.seek(0, os.SEEK_END)
+                f.write(b''.join(records))
+                # Stamp the header last so a crash mid-update leaves a stale index
+                f.seek(0)
+                f.write(_HEADER.pack(_MAGIC, _VERSION, *signature))
+            self._signature = signature
+
+    def on_rows_written(self, rows, offsets):
+        """EntryWriter listener: index rows as soon as they've been flushed."""
+        entries = [(parse_csv_date(row['Start Date']), offset)
+                   for row, offset in zip(rows, offsets)]
+        try:
+            self.add(entries)
+        except (IOError, OSError):
+            # The header no longer matches the CSV, so the next load rebuilds
+            with self._lock:
+                self._loaded = False
+
+    def __len__(self):
+        """Return how many rows the index holds."""
+        with self._lock:
+            self._ensure_current()
+            return sum(len(offsets) for offsets in self._offsets.values())
+
+    def offsets_between(self, start_date, end_date):
+        """Return the sorted byte offsets of rows starting between two dates (inclusive)."""
+        with self._lock:
+            self._ensure_current()
+            lo = bisect.bisect_left(self._ordinals, start_date.toordinal())
+            hi = bisect.bisect_right(self._ordinals, end_date.toordinal())
+            offsets = []
+            for ordinal in self._ordinals[lo:hi]:
+                offsets.extend(self._offsets[ordinal])
+        offsets.sort()
+        return offsets
+
+    def split_points(self, parts, end_offset=None):
+        """Return up to parts - 1 row offsets that cut the CSV into byte ranges of similar size.
+
+        Records in the sidecar are in file order, so each cut is a binary
+        search over the mapped index file rather than a pass over the rows.
+        """
+        with self._lock:
+            self._ensure_current()
+            size = self._signature[0] if self._signature else 0
+            if end_offset is not None:
+                size = min(size, end_offset)
+            try:
+                f = open(self.index_path, 'rb')
+            except OSError:
+                return []
+            with f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                count = (len(data) - _HEADER.size) // _RECORD.size
+
+                def offset_at(i):
+                    return _RECORD.unpack_from(data, _HEADER.size + i * _RECORD.size)[1]
+
+                points = []
+                for part in range(1, parts):
+                    target = size * part // parts
+                    lo, hi = 0, count
+                    while lo < hi:
+                        mid = (lo + hi) // 2
+                        if offset_at(mid) < target:
+                            lo = mid + 1
+                        else:
+                            hi = mid
+                    if lo < count:
+                        offset = offset_at(lo)
+                        if 0 < offset < size and (not points or offset > points[-1]):
+                            points.append(offset)
+        return points
+
+    def _offsets_before(self, start_date, end_date, end_offset):
+        offsets = self.offsets_between(start_date, end_date)
+        if end_offset is not None:
+            offsets = offsets[:bisect.bisect_left(offsets, end_offset)]
+        return offsets
+
+    def read_rows(self, start_date, end_date, end_offset=None):
+        """Yield CSV rows (as dicts) starting between two dates, in file order.
+
+        With end_offset, rows at or past that byte offset are left out. Rows
+        are read as they're yielded; if the offsets turn out to point at the
+        wrong rows (the CSV changed under us), the index is rebuilt and the
+        read starts over, unless rows have already been yielded.
+        """
+        for attempt in range(2):
+            offsets = self._offsets_before(start_date, end_date, end_offset)
+            if not offsets:
+                return
+            yielded = False
+            with open(self.csv_path, 'rb') as f:
+                for offset in offsets:
+                    if f.tell() != offset:
+                        f.seek(offset)
+                    row = next(iter_csv_records(f), (None, None))[1]
+                    date = parse_csv_date(row[START_DATE_COLUMN]) if row else None
+                    if date is None or not start_date <= date <= end_date:
+                        break
+                    yield dict(zip(CSV_HEADERS, row))
+                    yielded = True
+                else:
+                    return
+            if yielded or attempt:
+                raise IOError(f"{self.csv_path} changed while it was being read")
+            self.rebuild()
+
+_default_index = None
+
+def get_date_index():
+    """Return the shared date index for CSV_FILE."""
+    global _default_index
+    if _default_index is None:
+        _default_index = DateIndex()
+    return _default_index
@@ -0,0 +1,249 @@
+"""Append-only entry journal that several processes can write to safely.
+
+Writers append checksummed records to the journal under an exclusive lock
+instead of writing to the CSV directly. compact() later moves the records
+into the CSV in one locked step, so rows from different processes never
+interleave and a crash mid-write never leaves a torn row in the CSV.
+"""
+import contextlib
+import csv
+import io
+import os
+import struct
+import zlib
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks on Windows; a single instance is still safe there
+    fcntl = None
+
+from timetracking_core import CSV_FILE, CSV_HEADERS
+from timetracking_index import iter_csv_records
+
+# Journal layout: a header, then (length, crc32) + payload records. Each payload
+# is one batch of rows already formatted as CSV text. While a compaction is in
+# progress the header records the CSV size before (base) and after (target)
+# the copy, so recovery can tell whether it finished.
+_MAGIC = b'TTJL'
+_VERSION = 1
+_HEADER = struct.Struct('<4sIQQ')
+_RECORD = struct.Struct('<II')
+
+class EntryJournal:
+    """Locked, checksummed append journal in front of the entries CSV."""
+
+    def __init__(self, csv_path=CSV_FILE, path=None):
+        self.csv_path = csv_path
+        self.path = path or csv_path + '.journal'
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive=True):
+        """Open the journal and hold an advisory lock on it.
+
+        flock() locks belong to the open file, so every caller opens its own
+        handle; that excludes other threads of this process as well as other
+        processes.
+        """
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, 'r+b') as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield f
+
+    def _scan(self, f):
+        """Return (base, target, payloads, end of the last intact record)."""
+        f.seek(0)
+        data = f.read()
+        if len(data) < _HEADER.size:
+            return 0, 0, [], 0
+        magic, version, base, target = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise IOError(f"{self.path} is not an entries journal")
+
+        payloads = []
+        pos = _HEADER.size
+        while pos + _RECORD.size <= len(data):
+            length, checksum = _RECORD.unpack_from(data, pos)
+            payload = data[pos + _RECORD.size:pos + _RECORD.size + length]
+            if len(payload) != length or zlib.crc32(payload) != checksum:
+                break
+            payloads.append(payload)
+            pos += _RECORD.size + length
+        return base, target, payloads, pos
+
+    def _write_header(self, f, base=0, target=0):
+        f.seek(0)
+        f.write(_HEADER.pack(_MAGIC, _VERSION, base, target))
+
+    def _recover(self, f):
+        """Finish an interrupted compaction and cut off a torn tail; return the intact records."""
+        base, target, payloads, end = self._scan(f)
+        if end == 0:
+            self._write_header(f)
+            end = _HEADER.size
+        if target:
+            # A compaction stopped part-way: redo it unless the CSV already has the rows
+            try:
+                csv_size = os.path.getsize(self.csv_path)
+            except OSError:
+                csv_size = 0
+            if csv_size < target:
+                self._copy_to_csv(f, payloads, min(base, csv_size), fsync=True)
+            self._clear(f)
+            return []
+        f.seek(0, os.SEEK_END)
+        if f.tell() != end:
+            # A writer died mid-record; drop the partial record
+            f.truncate(end)
+        return payloads
+
+    def _csv_end(self):
+        """Return where the next row goes in the CSV: its end."""
+        try:
+            return os.path.getsize(self.csv_path)
+        except OSError:
+            return 0
+
+    def _ends_mid_line(self, size):
+        """Return True if the CSV's first size bytes don't end with a newline.
+
+        A hand-edited CSV often lacks one after its last row; rows copied in
+        then start on a line of their own instead of joining that row.
+        """
+        if size == 0:
+            return False
+        try:
+            with open(self.csv_path, 'rb') as csvfile:
+                csvfile.seek(size - 1)
+                return csvfile.read(1) not in (b'\n', b'')
+        except OSError:
+            return False
+
+    def _copy_to_csv(self, f, payloads, base, fsync):
+        """Write payloads to the CSV at byte base; return the offset of the first row.
+
+        The header records the copy before the CSV is touched, so it can be
+        redone from the start if it's interrupted. Only bytes past base, which
+        an unfinished copy wrote, are ever cut off.
+        """
+        if base == 0:
+            header = _format_header()
+        else:
+            header = b'\n' if self._ends_mid_line(base) else b''
+        data = header + b''.join(payloads)
+        self._write_header(f, base, base + len(data))
+        f.flush()
+        os.fsync(f.fileno())
+
+        fd = os.open(self.csv_path, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, 'r+b') as csvfile:
+            csvfile.truncate(base)
+            csvfile.seek(base)
+            csvfile.write(data)
+            csvfile.flush()
+            if fsync:
+                os.fsync(csvfile.fileno())
+        return base + len(header)
+
+    def _clear(self, f):
+        """Empty the journal once its records are safely in the CSV."""
+        f.truncate(_HEADER.size)
+        self._write_header(f)
+        f.flush()
+        os.fsync(f.fileno())
+
+    @contextlib.contextmanager
+    def locked_csv(self):
+        """Hold the journal lock with every record already in the CSV, so the CSV can be replaced.
+
+        Records moved here are not reported to anyone; callers replacing the
+        CSV change every offset anyway.
+        """
+        with self._locked() as f:
+            payloads = self._recover(f)
+            if payloads:
+                self._copy_to_csv(f, payloads, self._csv_end(), fsync=True)
+                self._clear(f)
+            yield
+
+    def append(self, payload, fsync=False):
+        """Append one batch of CSV-formatted rows as a single record."""
+        with self._locked() as f:
+            self._recover(f)
+            f.seek(0, os.SEEK_END)
+            f.write(_RECORD.pack(len(payload), zlib.crc32(payload)) + payload)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+
+    def sync(self):
+        """fsync the journal so every appended record survives a power cut."""
+        with self._locked(exclusive=False) as f:
+            os.fsync(f.fileno())
+
+    def size(self):
+        """Return the journal's size in bytes (0 if it doesn't exist)."""
+        try:
+            return max(0, os.path.getsize(self.path) - _HEADER.size)
+        except OSError:
+            return 0
+
+    def _view(self):
+        """Return (pending payloads, CSV size they follow) under a shared lock."""
+        with self._locked(exclusive=False) as f:
+            base, target, payloads, _ = self._scan(f)
+            if target:
+                csv_size = base
+            else:
+                try:
+                    csv_size = os.path.getsize(self.csv_path)
+                except OSError:
+                    csv_size = 0
+        return payloads, csv_size
+
+    def snapshot(self):
+        """Return (rows not yet compacted, CSV size they follow) as one consistent view.
+
+        Readers should read the CSV only up to the returned size and then the
+        pending rows; rows compacted in between are then neither missed nor
+        read twice.
+        """
+        payloads, csv_size = self._view()
+        return [row for payload in payloads for row in _parse_rows(payload)], csv_size
+
+    def logical_size(self):
+        """Return the size the CSV will have once every journaled row is in it.
+
+        Unlike the file sizes, this doesn't change when a compaction runs.
+        """
+        payloads, csv_size = self._view()
+        if not payloads:
+            return csv_size
+        separator = 1 if self._ends_mid_line(csv_size) else 0
+        return csv_size + separator + sum(len(payload) for payload in payloads)
+
+    def compact(self, fsync=True):
+        """Move every journaled row into the CSV; return (row dicts, their CSV offsets)."""
+        with self._locked() as f:
+            payloads = self._recover(f)
+            if not payloads:
+                return [], []
+            offset = self._copy_to_csv(f, payloads, self._csv_end(), fsync)
+            self._clear(f)
+
+        rows, offsets = [], []
+        for payload in payloads:
+            for row_offset, row in iter_csv_records(io.BytesIO(payload)):
+                rows.append(dict(zip(CSV_HEADERS, row)))
+                offsets.append(offset + row_offset)
+            offset += len(payload)
+        return rows, offsets
+
+def _format_header():
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(CSV_HEADERS)
+    return buffer.getvalue().encode('utf-8')
+
+def _parse_rows(payload):
+    return [row for row in csv.reader(io.StringIO(payload.decode('utf-8'), newline='')) if row]
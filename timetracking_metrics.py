@@ -0,0 +1,196 @@
+"""Opt-in timing spans, counters and scheduler jitter, exported to local files.
+
+Set TIMETRACKER_METRICS=1 to turn them on. Every span and observation is
+then appended to a rotating log, and all of them are summarised as
+histograms and counters in a Prometheus text-format file (e.g. for
+node_exporter's textfile collector). When metrics are off, timed() returns
+the function undecorated and span() a shared do-nothing context, so the
+instrumented code pays one call and one flag check.
+"""
+import atexit
+import os
+import threading
+import time
+
+METRICS_ENABLED = os.environ.get('TIMETRACKER_METRICS', '') not in ('', '0')
+METRICS_LOG_FILE = 'timetracking_metrics.log'
+PROMETHEUS_FILE = 'timetracking_metrics.prom'
+# Rewrite the Prometheus file at most this often (and always at exit)
+EXPORT_INTERVAL = 15.0
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Actual fire time minus the planned slot: slightly early, on time, or late after a suspend
+JITTER_BUCKETS = (-1.0, -0.1, -0.01, 0.0, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 300.0)
+
+class Histogram:
+    """Cumulative-bucket histogram in the shape Prometheus expects."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def lines(self, metric, labels=""):
+        """Return the _bucket, _sum and _count sample lines."""
+        prefix = labels + "," if labels else ""
+        lines = [f'{metric}_bucket{{{prefix}le="{bound}"}} {count}'
+                 for bound, count in zip(self.buckets, self.counts)]
+        lines.append(f'{metric}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{metric}_sum{suffix} {self.sum:.6f}")
+        lines.append(f"{metric}_count{suffix} {self.count}")
+        return lines
+
+class Metrics:
+    """Collects spans, observations and counters and writes them out."""
+
+    def __init__(self, log_path=METRICS_LOG_FILE, prometheus_path=PROMETHEUS_FILE,
+                 export_interval=EXPORT_INTERVAL):
+        self.log_path = log_path
+        self.prometheus_path = prometheus_path
+        self.export_interval = export_interval
+        self.spans = {}
+        self.observations = {}
+        self.counters = {}
+        self._logger = None
+        self._last_export = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _log(self, message):
+        if self._logger is None:
+            # Only pay for logging's import when metrics are actually recorded
+            import logging
+            from logging.handlers import RotatingFileHandler
+            logger = logging.getLogger('timetracking.metrics')
+            logger.propagate = False
+            handler = RotatingFileHandler(self.log_path, maxBytes=1024 * 1024, backupCount=3)
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            self._logger = logger
+        self._logger.info(message)
+
+    def record_span(self, name, seconds):
+        with self._lock:
+            histogram = self.spans.get(name)
+            if histogram is None:
+                histogram = self.spans[name] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+            self._log(f"span {name} {seconds * 1000:.3f}ms")
+        self._export_if_due()
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS):
+        with self._lock:
+            histogram = self.observations.get(name)
+            if histogram is None:
+                histogram = self.observations[name] = Histogram(buckets)
+            histogram.observe(value)
+            self._log(f"observe {name} {value:.6f}")
+        self._export_if_due()
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def _export_if_due(self):
+        if time.monotonic() - self._last_export >= self.export_interval:
+            self.export()
+
+    def prometheus_text(self):
+        """Render every metric in the Prometheus text exposition format."""
+        with self._lock:
+            lines = []
+            if self.spans:
+                lines += ["# HELP timetracker_span_seconds Time spent in instrumented code paths.",
+                          "# TYPE timetracker_span_seconds histogram"]
+                for name, histogram in sorted(self.spans.items()):
+                    lines += histogram.lines("timetracker_span_seconds", f'span="{name}"')
+            for name, histogram in sorted(self.observations.items()):
+                metric = f"timetracker_{name}_seconds"
+                lines += [f"# TYPE {metric} histogram"] + histogram.lines(metric)
+            for name, value in sorted(self.counters.items()):
+                metric = f"timetracker_{name}_total"
+                lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        """Write the Prometheus file, replacing it atomically so scrapers never see half of it."""
+        self._last_export = time.monotonic()
+        tmp_path = self.prometheus_path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp_path, self.prometheus_path)
+        except OSError as e:
+            print(f"Could not write metrics to {self.prometheus_path}: {e}")
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        get_metrics().record_span(self.name, time.perf_counter() - self.started)
+        return False
+
+_default_metrics = None
+
+def get_metrics():
+    """Return the shared Metrics, written out at exit."""
+    global _default_metrics
+    if _default_metrics is None:
+        _default_metrics = Metrics()
+        atexit.register(_default_metrics.export)
+    return _default_metrics
+
+def span(name):
+    """Context manager timing the block as span name (a no-op when metrics are off)."""
+    if not METRICS_ENABLED:
+        return _NULL_SPAN
+    return _Span(name)
+
+def timed(name):
+    """Decorator timing every call as span name; leaves the function alone when metrics are off."""
+    def decorate(fn):
+        if not METRICS_ENABLED:
+            return fn
+
+        def wrapper(*args, **kwargs):
+            with _Span(name):
+                return fn(*args, **kwargs)
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        return wrapper
+    return decorate
+
+def observe(name, value, buckets=LATENCY_BUCKETS):
+    """Record a measured value (in seconds) in the histogram name."""
+    if METRICS_ENABLED:
+        get_metrics().observe(name, value, buckets)
+
+def count(name, amount=1):
+    """Add to the counter name."""
+    if METRICS_ENABLED:
+        get_metrics().count(name, amount)
@@ -0,0 +1,234 @@
+"""Overlap and duplicate detection for new entries and across the whole history."""
+import datetime
+import heapq
+import random
+import threading
+from enum import Enum
+
+from timetracking_core import CSV_HEADERS
+from timetracking_reports import Entry, entries_from_rows
+
+class OverlapPolicy(Enum):
+    REJECT = "reject"  # Don't write an entry that overlaps another
+    TRIM = "trim"      # Write only the parts no other entry covers
+    MERGE = "merge"    # Fold it into overlapping entries of the same project
+    ALLOW = "allow"    # Write it as entered (exact duplicates are still dropped)
+
+class OverlapError(ValueError):
+    """Raised when a new entry overlaps stored ones and the policy is REJECT."""
+
+    def __init__(self, overlaps):
+        self.overlaps = overlaps
+        super().__init__("Overlaps " + ", ".join(describe_entry(entry) for entry in overlaps))
+
+def describe_entry(entry):
+    """Format an entry as 'Project (Mon 03/04 09:30-10:00)'."""
+    return f"{entry.project} ({entry.start.strftime('%a %m/%d %H:%M')}-{entry.end.strftime('%H:%M')})"
+
+class _Node:
+    __slots__ = ('entry', 'priority', 'max_end', 'left', 'right')
+
+    def __init__(self, entry):
+        self.entry = entry
+        self.priority = random.random()
+        self.max_end = entry.end
+        self.left = None
+        self.right = None
+
+def _update(node):
+    """Recompute the latest end in node's subtree from its children."""
+    node.max_end = node.entry.end
+    if node.left is not None and node.left.max_end > node.max_end:
+        node.max_end = node.left.max_end
+    if node.right is not None and node.right.max_end > node.max_end:
+        node.max_end = node.right.max_end
+
+def _rotate_right(node):
+    left = node.left
+    node.left, left.right = left.right, node
+    _update(node)
+    _update(left)
+    return left
+
+def _rotate_left(node):
+    right = node.right
+    node.right, right.left = right.left, node
+    _update(node)
+    _update(right)
+    return right
+
+class IntervalTree:
+    """Entries in a treap ordered by start time, each node knowing the latest end below it.
+
+    Inserts take O(log n) and overlapping() takes O(log n + matches), whatever
+    the order entries arrive in.
+    """
+
+    def __init__(self, entries=()):
+        self._root = None
+        self._size = 0
+        for entry in entries:
+            self.insert(entry)
+
+    def __len__(self):
+        return self._size
+
+    def insert(self, entry):
+        self._root = self._insert(self._root, _Node(entry))
+        self._size += 1
+
+    def _insert(self, node, new):
+        if node is None:
+            return new
+        if (new.entry.start, new.entry.end) < (node.entry.start, node.entry.end):
+            node.left = self._insert(node.left, new)
+            if node.left.priority > node.priority:
+                return _rotate_right(node)
+        else:
+            node.right = self._insert(node.right, new)
+            if node.right.priority > node.priority:
+                return _rotate_left(node)
+        _update(node)
+        return node
+
+    def overlapping(self, start, end):
+        """Return the entries that overlap [start, end), ordered by start."""
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            # Nothing in a subtree that ends by start can overlap
+            if node is None or node.max_end <= start:
+                continue
+            stack.append(node.left)
+            if node.entry.start < end:
+                if node.entry.end > start:
+                    found.append(node.entry)
+                stack.append(node.right)
+        found.sort(key=lambda entry: (entry.start, entry.end))
+        return found
+
+def _subtract(start, end, entries):
+    """Return the (start, end) pieces of [start, end) that none of entries cover."""
+    pieces = []
+    for entry in sorted(entries, key=lambda entry: entry.start):
+        if entry.start > start:
+            pieces.append((start, min(entry.start, end)))
+        start = max(start, entry.end)
+        if start >= end:
+            break
+    if start < end:
+        pieces.append((start, end))
+    return pieces
+
+class OverlapIndex:
+    """Interval tree over the stored entries of every day looked at so far.
+
+    Days are loaded from storage the first time a check touches them, and
+    entries written through the shared entry writer are added as they land,
+    so each check costs O(log n) rather than a read of the history.
+    """
+
+    def __init__(self, storage=None):
+        self.storage = storage
+        self._tree = IntervalTree()
+        self._entries = set()
+        self._days = set()
+        self._lock = threading.Lock()
+
+    def _load_days(self, start, end):
+        # Entries can run past midnight, so the day before is loaded as well
+        first = start.date() - datetime.timedelta(days=1)
+        days = [first + datetime.timedelta(days=i) for i in range((end.date() - first).days + 1)]
+        missing = {day for day in days if day not in self._days}
+        if not missing:
+            return
+        if self.storage is None:
+            from timetracking_storage import get_storage
+            self.storage = get_storage()
+        rows = self.storage.iter_rows(min(missing), max(missing))
+        for entry in entries_from_rows(rows):
+            if entry.start.date() in missing:
+                self._insert(entry)
+        self._days |= missing
+
+    def _insert(self, entry):
+        if entry not in self._entries and entry.end > entry.start:
+            self._entries.add(entry)
+            self._tree.insert(entry)
+
+    def overlapping(self, start, end):
+        """Return stored entries that overlap [start, end)."""
+        with self._lock:
+            self._load_days(start, end)
+            return self._tree.overlapping(start, end)
+
+    def add(self, entry):
+        """Record an entry that has just been written."""
+        with self._lock:
+            if entry.start.date() in self._days:
+                self._insert(entry)
+
+    def on_rows_written(self, rows, offsets):
+        """EntryWriter listener: add rows as soon as they've been written."""
+        for entry in entries_from_rows([row[name] for name in CSV_HEADERS] for row in rows):
+            self.add(entry)
+
+    def on_entries_edited(self, removed, added):
+        """Storage edit listener: the tree can't drop entries, so start over and reload lazily."""
+        with self._lock:
+            self._tree = IntervalTree()
+            self._entries = set()
+            self._days = set()
+
+    def resolve(self, project, start, end, policy=OverlapPolicy.REJECT):
+        """Return the Entry pieces to write for a new entry under policy.
+
+        An exact duplicate of a stored entry resolves to nothing. REJECT raises
+        OverlapError if anything overlaps; TRIM leaves out time any entry
+        covers; MERGE leaves out time the same project already covers, so the
+        project's logged time becomes the union of both.
+        """
+        entry = Entry(project, start, end)
+        overlaps = self.overlapping(start, end)
+        if entry in overlaps:
+            return []
+        if not overlaps or policy is OverlapPolicy.ALLOW:
+            return [entry]
+        if policy is OverlapPolicy.REJECT:
+            raise OverlapError(overlaps)
+        if policy is OverlapPolicy.MERGE:
+            overlaps = [other for other in overlaps if other.project == project]
+        return [Entry(project, piece_start, piece_end)
+                for piece_start, piece_end in _subtract(start, end, overlaps)]
+
+def find_overlaps(entries):
+    """Yield (earlier, later) for every pair of overlapping entries.
+
+    A sweep over the entries in start order keeps only the ones still running
+    in a heap, so this is O(n log n + pairs) rather than comparing every pair.
+    """
+    running = []
+    for i, entry in enumerate(sorted(entries, key=lambda entry: (entry.start, entry.end))):
+        if entry.end <= entry.start:
+            continue
+        while running and running[0][0] <= entry.start:
+            heapq.heappop(running)
+        for _, _, other in running:
+            yield other, entry
+        heapq.heappush(running, (entry.end, i, entry))
+
+_default_index = None
+
+def get_overlap_index():
+    """Return the shared overlap index, kept current by the shared entry writer."""
+    global _default_index
+    if _default_index is None:
+        from timetracking_writer import get_entry_writer
+        from timetracking_storage import CsvStorage, get_storage
+        _default_index = OverlapIndex()
+        get_entry_writer().add_listener(_default_index.on_rows_written)
+        storage = get_storage()
+        if isinstance(storage, CsvStorage):
+            storage.add_edit_listener(_default_index.on_entries_edited)
+    return _default_index
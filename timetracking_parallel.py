@@ -0,0 +1,156 @@
+"""Build reports for the CSV backend on several processes at once.
+
+The work is split into tasks: one per archived month partition, plus byte
+ranges of the entries CSV cut at row boundaries taken from the date index.
+Each worker returns exact integer minutes and entry counts per (day,
+project), and the parent adds them up in sorted key order, so the result is
+the same as the single-process report whatever the worker count or chunking.
+Workers leave out stored rows that have edits and count them by id; the
+parent then adds the edited versions, as resolve_rows() does for a
+single-process read.
+"""
+import datetime
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from timetracking_core import CSV_FILE
+from timetracking_reports import ReportTotals, _lines_before, iter_spans
+
+# Below this many bytes of CSV and partitions the tasks run in this process
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+# Tasks per worker, so one slow chunk doesn't leave the others idle
+TASKS_PER_WORKER = 2
+
+def _aggregate(rows, start_date=None, end_date=None, edited=None):
+    """Return ({(date, project): minutes}, {(date, project): entries}, {id: rows left out}) for rows.
+
+    edited is (ids, Start Dates) from the edit log; stored rows with those ids
+    are left out and counted by id instead.
+    """
+    minutes_by, counts, left_out = {}, {}, {}
+    if edited:
+        rows = _leave_out_edited(rows, edited, left_out)
+    spans = iter_spans(rows)
+    if start_date is not None or end_date is not None:
+        low = start_date or datetime.date.min
+        high = end_date or datetime.date.max
+        spans = (span for span in spans if low <= span[1] <= high)
+    for project, date, minutes in spans:
+        key = (date, project)
+        minutes_by[key] = minutes_by.get(key, 0) + minutes
+        counts[key] = counts.get(key, 0) + 1
+    return minutes_by, counts, left_out
+
+def _leave_out_edited(rows, edited, left_out):
+    from timetracking_edits import entry_id
+    from timetracking_index import START_DATE_COLUMN
+    ids, dates = edited
+    for row in rows:
+        if len(row) > START_DATE_COLUMN and row[START_DATE_COLUMN] in dates:
+            row_id = entry_id(row)
+            if row_id in ids:
+                left_out[row_id] = left_out.get(row_id, 0) + 1
+                continue
+        yield row
+
+def csv_chunk_totals(path, start, end, start_date=None, end_date=None, edited=None):
+    """Aggregate the CSV rows that start in the byte range [start, end)."""
+    import csv
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return _aggregate(csv.reader(_lines_before(f, end - start)), start_date, end_date, edited)
+
+def partition_totals(path, start_date=None, end_date=None, whole=False, edited=None):
+    """Aggregate one archived month partition."""
+    from timetracking_partitions import iter_partition_rows
+    return _aggregate(iter_partition_rows(path, start_date, end_date, whole), start_date, end_date, edited)
+
+def _run(task):
+    function, args = task
+    return function(*args)
+
+def _csv_ranges(storage, csv_size, start_date, end_date, parts):
+    """Return [(start, end)] byte ranges of the CSV holding the rows to report on."""
+    from timetracking_index import DateIndex, get_date_index
+    index = get_date_index() if storage.path == CSV_FILE else DateIndex(storage.path)
+    if start_date is None and end_date is None:
+        points = [0] + index.split_points(parts, csv_size) + [csv_size]
+    else:
+        offsets = index.offsets_between(start_date or datetime.date.min, end_date or datetime.date.max)
+        offsets = [offset for offset in offsets if offset < csv_size]
+        if not offsets:
+            return []
+        # Workers drop rows outside the dates, so ranges can span the gaps between matches
+        points = sorted({offsets[len(offsets) * part // parts] for part in range(parts)})
+        points.append(offsets[-1] + 1)
+    return [(a, b) for a, b in zip(points, points[1:]) if b > a]
+
+def build_report_parallel(storage, start_date=None, end_date=None, workers=None):
+    """Return ReportTotals for a CsvStorage using a pool of worker processes."""
+    workers = workers or os.cpu_count() or 1
+    for _ in range(3):
+        edits = storage.entries_signature()[2]
+        totals = _build_report(storage, start_date, end_date, workers)
+        # An edit or fold while the workers read may be counted twice or not at all: count again
+        if storage.entries_signature()[2] == edits:
+            break
+    return totals
+
+def _build_report(storage, start_date, end_date, workers):
+    parts = workers * TASKS_PER_WORKER
+    tasks = []
+    work_bytes = 0
+    live, edited = {}, None
+    if storage._has_edits():
+        live, dates, _ = storage.edits().snapshot()
+        edited = (frozenset(live), dates) if live else None
+
+    if storage._has_archive():
+        archive = storage.archive()
+        for _, info, whole in archive.prune(start_date, end_date):
+            path = os.path.join(archive.directory, info['file'])
+            tasks.append((partition_totals, (path, start_date, end_date, whole, edited)))
+            work_bytes += os.path.getsize(path) * 8  # Compressed bytes cost more to read
+
+    pending, csv_size = storage.journal.snapshot()
+    if csv_size and os.path.exists(storage.path):
+        for start, end in _csv_ranges(storage, csv_size, start_date, end_date, parts):
+            tasks.append((csv_chunk_totals, (storage.path, start, end, start_date, end_date, edited)))
+            work_bytes += end - start
+
+    if workers > 1 and len(tasks) > 1 and work_bytes >= PARALLEL_MIN_BYTES:
+        # spawn: the GUI has threads running, which fork doesn't mix with
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=get_context('spawn')) as pool:
+            partials = list(pool.map(_run, tasks))
+    else:
+        partials = [_run(task) for task in tasks]
+    # Rows still in the journal are few; count them here
+    partials.append(_aggregate(pending, start_date, end_date, edited))
+
+    minutes_by, counts, left_out = {}, {}, {}
+    for partial_minutes, partial_counts, partial_left_out in partials:
+        for key, minutes in partial_minutes.items():
+            minutes_by[key] = minutes_by.get(key, 0) + minutes
+        for key, count in partial_counts.items():
+            counts[key] = counts.get(key, 0) + count
+        for row_id, count in partial_left_out.items():
+            left_out[row_id] = left_out.get(row_id, 0) + count
+    if live:
+        # An edit replaces one stored copy of its row, whether or not that copy is still there
+        rows = []
+        for row_id, (before, after) in live.items():
+            rows.extend([before] * (left_out.get(row_id, 0) - 1))
+            if after is not None:
+                rows.append(after)
+        partial_minutes, partial_counts, _ = _aggregate(rows, start_date, end_date)
+        for key, minutes in partial_minutes.items():
+            minutes_by[key] = minutes_by.get(key, 0) + minutes
+        for key, count in partial_counts.items():
+            counts[key] = counts.get(key, 0) + count
+
+    totals = ReportTotals()
+    for key in sorted(minutes_by):
+        date, project = key
+        totals.add(project, date, minutes_by[key], counts[key])
+    return totals
@@ -0,0 +1,293 @@
+"""Monthly archive partitions for the entries CSV, with a manifest used to prune reads.
+
+Rows from before the current month are moved out of the entries CSV into
+one gzip-compressed CSV per month in a folder next to it
+(timetracking_entries_archive/ for timetracking_entries.csv). manifest.json
+there records each partition's first and last date, row count and minutes
+per project, so a date-range read only opens the months it overlaps and
+whole-partition summaries need no decompression at all.
+"""
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import shutil
+
+from timetracking_core import CSV_HEADERS
+from timetracking_index import START_DATE_COLUMN, iter_csv_records, parse_csv_date
+from timetracking_reports import iter_spans
+
+MANIFEST_FILE = 'manifest.json'
+_MANIFEST_VERSION = 1
+# How many month partitions a rotation keeps open for writing at once
+MAX_OPEN_PARTITIONS = 32
+
+def archive_dir_for(csv_path):
+    """Return the archive folder that belongs to an entries CSV."""
+    return os.path.splitext(csv_path)[0] + '_archive'
+
+def month_key(date):
+    return f"{date.year:04d}-{date.month:02d}"
+
+def _format_row(row):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(row)
+    return buffer.getvalue().encode('utf-8')
+
+def iter_partition_rows(path, start_date=None, end_date=None, whole=False):
+    """Yield the rows of one partition file starting between two dates (all of them if whole)."""
+    low = start_date or datetime.date.min
+    high = end_date or datetime.date.max
+    with gzip.open(path, 'rt', newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if not row or row == CSV_HEADERS:
+                continue
+            if whole:
+                yield row
+                continue
+            date = parse_csv_date(row[START_DATE_COLUMN]) if len(row) > START_DATE_COLUMN else None
+            if date is not None and low <= date <= high:
+                yield row
+
+class _PartitionWriter:
+    """Appends rows to one month's new partition file and keeps its manifest stats."""
+
+    def __init__(self, path, info):
+        self.path = path
+        self.info = info
+        self.file = None
+
+    def open(self):
+        # Reopening appends another gzip member, which readers see as one stream
+        self.file = gzip.open(self.path, 'at', newline='', encoding='utf-8', compresslevel=6)
+        self.writer = csv.writer(self.file)
+
+    def write(self, row, date):
+        self.writer.writerow(row)
+        info = self.info
+        day = date.isoformat()
+        info['first'] = min(info['first'] or day, day)
+        info['last'] = max(info['last'] or day, day)
+        info['rows'] += 1
+        for project, _, minutes in iter_spans((row,)):
+            info['minutes'][project] = info['minutes'].get(project, 0) + minutes
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+class PartitionArchive:
+    """The month partitions of one entries CSV and their manifest.
+
+    A rotation writes each touched month to a new, versioned partition file
+    (copying what was archived for that month before), writes the slimmed
+    CSV next to the real one, and then commits by replacing the manifest.
+    The committed manifest is marked as rotating until the CSV is swapped in,
+    so recover() can finish a rotation that was interrupted after the commit;
+    anything written before it is simply discarded. Callers must hold the
+    entries journal lock while rotating or recovering.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+        self._manifest = None
+        self._signature = None
+
+    def exists(self):
+        return os.path.exists(self.manifest_path)
+
+    def _read(self):
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {'version': _MANIFEST_VERSION, 'generation': 0, 'partitions': {}}
+        except ValueError as e:
+            raise IOError(f"{self.manifest_path} is damaged: {e}")
+        if manifest.get('version') != _MANIFEST_VERSION:
+            raise IOError(f"{self.manifest_path} has an unknown version")
+        return manifest
+
+    def _write(self, manifest):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def partitions(self):
+        """Return {month: info} from the manifest, re-read only when it changes."""
+        try:
+            stat = os.stat(self.manifest_path)
+        except OSError:
+            return {}
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if signature != self._signature:
+            self._manifest = self._read()['partitions']
+            self._signature = signature
+        return self._manifest
+
+    def prune(self, start_date=None, end_date=None):
+        """Return [(month, info, whole)] for partitions overlapping the range, oldest first.
+
+        whole is True when every row of the partition is inside the range.
+        """
+        found = []
+        for month, info in sorted(self.partitions().items()):
+            first = datetime.date.fromisoformat(info['first'])
+            last = datetime.date.fromisoformat(info['last'])
+            if (end_date is not None and first > end_date) or (start_date is not None and last < start_date):
+                continue
+            whole = ((start_date is None or first >= start_date)
+                     and (end_date is None or last <= end_date))
+            found.append((month, info, whole))
+        return found
+
+    def iter_rows(self, start_date=None, end_date=None):
+        """Yield archived rows (lists) starting between two dates, oldest partition first."""
+        for _, info, whole in self.prune(start_date, end_date):
+            yield from iter_partition_rows(os.path.join(self.directory, info['file']),
+                                           start_date, end_date, whole)
+
+    def recover(self, csv_path):
+        """Finish or discard an interrupted rotation and delete unreferenced files."""
+        if not os.path.isdir(self.directory):
+            return
+        manifest = self._read()
+        rotated_csv = csv_path + '.rotate'
+        if manifest.pop('rotating', False):
+            if os.path.exists(rotated_csv):
+                os.replace(rotated_csv, csv_path)
+            self._write(manifest)
+        elif os.path.exists(rotated_csv):
+            os.remove(rotated_csv)
+        self._delete_unreferenced(manifest)
+
+    def _delete_unreferenced(self, manifest):
+        referenced = {info['file'] for info in manifest['partitions'].values()}
+        for name in os.listdir(self.directory):
+            if name.endswith('.csv.gz') and name not in referenced:
+                os.remove(os.path.join(self.directory, name))
+
+    def rotate(self, csv_path, before, watermark=None):
+        """Move CSV rows starting before the date `before` into month partitions.
+
+        Rows at or past byte offset watermark (not yet delta-exported) stay in
+        the CSV whatever their date. Returns (rows moved, where watermark now
+        points in the rewritten CSV).
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self.recover(csv_path)
+        manifest = self._read()
+        generation = manifest['generation'] + 1
+        partitions = manifest['partitions']
+        writers = {}
+        tmp_csv = csv_path + '.rotate'
+        moved = 0
+        new_watermark = None
+        try:
+            with open(csv_path, 'rb') as src, open(tmp_csv, 'wb') as dst:
+                for offset, row in iter_csv_records(src):
+                    if watermark is not None and new_watermark is None and offset >= watermark:
+                        new_watermark = dst.tell()
+                    date = None
+                    if row != CSV_HEADERS and len(row) > START_DATE_COLUMN:
+                        date = parse_csv_date(row[START_DATE_COLUMN])
+                    if (date is None or date >= before
+                            or (watermark is not None and offset >= watermark)):
+                        dst.write(_format_row(row))
+                        continue
+                    self._writer(writers, partitions, month_key(date), generation).write(row, date)
+                    moved += 1
+                if watermark is not None and new_watermark is None:
+                    new_watermark = dst.tell()
+                dst.flush()
+                os.fsync(dst.fileno())
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        if not moved:
+            for writer in writers.values():
+                os.remove(writer.path)
+            os.remove(tmp_csv)
+            return 0, watermark
+
+        for month, writer in writers.items():
+            with open(writer.path, 'rb') as f:
+                os.fsync(f.fileno())
+            partitions[month] = dict(writer.info, file=os.path.basename(writer.path))
+        manifest['generation'] = generation
+        manifest['rotating'] = True
+        self._write(manifest)
+        # Committed: swap in the slimmed CSV and drop the superseded partition files
+        self.recover(csv_path)
+        return moved, watermark if watermark is None else new_watermark
+
+    def rewrite(self, months, transform):
+        """Write new versions of some month partitions with transform(rows) applied.
+
+        Returns the manifest that makes them current. Nothing changes for
+        readers until it is passed to commit(); the new files are just
+        unreferenced until then, and recover() deletes them if that never
+        happens. Callers must hold the entries journal lock.
+        """
+        manifest = self._read()
+        generation = manifest['generation'] + 1
+        partitions = manifest['partitions']
+        for month in sorted(months):
+            old = partitions.get(month)
+            if old is None:
+                continue
+            path = os.path.join(self.directory, f"{month}.{generation}.csv.gz")
+            with gzip.open(path, 'wt', newline='', encoding='utf-8', compresslevel=6) as f:
+                csv.writer(f).writerow(CSV_HEADERS)
+            writer = _PartitionWriter(path, {'first': None, 'last': None, 'rows': 0, 'minutes': {}})
+            writer.open()
+            try:
+                rows = iter_partition_rows(os.path.join(self.directory, old['file']), whole=True)
+                for row in transform(rows):
+                    writer.write(row, parse_csv_date(row[START_DATE_COLUMN]))
+            finally:
+                writer.close()
+            if writer.info['rows']:
+                with open(path, 'rb') as f:
+                    os.fsync(f.fileno())
+                partitions[month] = dict(writer.info, file=os.path.basename(path))
+            else:
+                os.remove(path)
+                del partitions[month]
+        manifest['generation'] = generation
+        return manifest
+
+    def commit(self, manifest):
+        """Make a manifest from rewrite() current and drop the partition files it replaced."""
+        self._write(manifest)
+        self._delete_unreferenced(manifest)
+
+    def _writer(self, writers, partitions, month, generation):
+        writer = writers.get(month)
+        if writer is None:
+            old = partitions.get(month)
+            info = {'first': None, 'last': None, 'rows': 0, 'minutes': {}}
+            path = os.path.join(self.directory, f"{month}.{generation}.csv.gz")
+            if old is not None:
+                # Keep what's archived already: its compressed bytes are copied as is
+                shutil.copyfile(os.path.join(self.directory, old['file']), path)
+                info = {'first': old['first'], 'last': old['last'], 'rows': old['rows'],
+                        'minutes': dict(old['minutes'])}
+            else:
+                with gzip.open(path, 'wt', newline='', encoding='utf-8', compresslevel=6) as f:
+                    csv.writer(f).writerow(CSV_HEADERS)
+            writer = writers[month] = _PartitionWriter(path, info)
+        if writer.file is None:
+            open_writers = [w for w in writers.values() if w.file is not None]
+            if len(open_writers) >= MAX_OPEN_PARTITIONS:
+                open_writers[0].close()
+            writer.open()
+        return writer
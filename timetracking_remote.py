@@ -0,0 +1,260 @@
+"""Send entries to an ingestion server instead of local storage, spooling them while it's down.
+
+Set TIMETRACKER_SERVER to the server's address ("http://host:8765" or
+"unix:/path/to.sock"), and TIMETRACKER_SERVER_TOKEN if it was started with
+a token, and get_entry_writer() returns a RemoteEntryWriter.
+"""
+import http.client
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+
+SPOOL_FILE = 'timetracking_spool.jsonl'
+
+# Marker put on the queue to stop the sender thread
+_STOP = object()
+
+class RemoteRejected(ValueError):
+    """The server refused the rows as invalid; spooling them would not help."""
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+class RemoteEntryWriter:
+    """Drop-in for EntryWriter that posts rows to the ingestion server.
+
+    Like EntryWriter, submissions are queued and a single thread sends
+    everything queued at once as one request, over one persistent keep-alive
+    connection that is reopened only when it breaks. If the server can't be
+    reached (or stays busy after max_retries), the rows are appended to a
+    local spool file and the Future still resolves: they are sent, oldest
+    first, before anything else once the server answers again.
+    """
+
+    def __init__(self, url, spool_path=SPOOL_FILE, token=None, timeout=10.0,
+                 max_batch=1000, max_retries=3, retry_interval=30.0):
+        self.url = url
+        self.spool_path = spool_path
+        self.token = token
+        self.timeout = timeout
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.retry_interval = retry_interval
+        self._connection = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Call callback(rows, offsets) on the sender thread once the server has stored rows."""
+        self._listeners.append(callback)
+
+    def start(self):
+        """Start the sender thread if it isn't already running."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="RemoteEntryWriter", daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, rows):
+        """Queue one row or a list of rows and return a Future for the send."""
+        if isinstance(rows, dict):
+            rows = [rows]
+        future = Future()
+        self.start()
+        self._queue.put((list(rows), future))
+        return future
+
+    def close(self, timeout=None):
+        """Send everything still queued, close the connection and stop the thread."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self.retry_interval)
+            except queue.Empty:
+                try:
+                    self._send_spool()
+                except Exception as e:
+                    print(f"Could not send spooled entries: {e}")
+                continue
+
+            batch = []
+            queued_rows = 0
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                queued_rows += len(item[0])
+                if queued_rows >= self.max_batch:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self._send_batch(batch)
+                except Exception as e:
+                    # Anything unexpected fails this batch instead of stopping the sender
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+        self._close_connection()
+
+    def _send_batch(self, batch):
+        rows = [row for submitted, _ in batch for row in submitted]
+        try:
+            # Older spooled rows go first so the server sees entries in order
+            if not self._send_spool():
+                raise ConnectionError("spooled entries could not be sent")
+            self._post(rows)
+        except RemoteRejected as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        except (OSError, http.client.HTTPException) as e:
+            try:
+                self._spool(rows)
+            except OSError as spool_error:
+                for _, future in batch:
+                    future.set_exception(spool_error)
+                return
+            print(f"Entry server unavailable ({e}); spooled {len(rows)} entries to {self.spool_path}")
+        else:
+            self._notify_listeners(rows)
+        for submitted, future in batch:
+            future.set_result(submitted)
+
+    def _connect(self):
+        if self._connection is None:
+            parts = urlsplit(self.url)
+            if parts.scheme == 'unix':
+                self._connection = _UnixHTTPConnection(parts.path, self.timeout)
+            else:
+                self._connection = http.client.HTTPConnection(
+                    parts.hostname, parts.port or 80, timeout=self.timeout)
+        return self._connection
+
+    def _close_connection(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _request(self, body):
+        """POST body once, reopening a keep-alive connection the server has dropped."""
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        for attempt in range(2):
+            connection = self._connect()
+            try:
+                connection.request('POST', '/entries', body, headers)
+                response = connection.getresponse()
+                data = response.read()
+                if response.will_close:
+                    self._close_connection()
+                return response, data
+            except (OSError, http.client.HTTPException):
+                self._close_connection()
+                if attempt:
+                    raise
+
+    def _post(self, rows):
+        """Send rows, waiting out the server's backpressure up to max_retries times."""
+        body = json.dumps(rows).encode()
+        for attempt in range(self.max_retries + 1):
+            response, data = self._request(body)
+            if response.status == 200:
+                return
+            if response.status == 400:
+                raise RemoteRejected(json.loads(data).get('error', "rows rejected"))
+            if response.status != 503 or attempt == self.max_retries:
+                raise http.client.HTTPException(f"server answered {response.status} {response.reason}")
+            time.sleep(float(response.getheader('Retry-After') or 1))
+
+    def _spool(self, rows):
+        with open(self.spool_path, 'a') as f:
+            f.write(json.dumps(rows) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _send_spool(self):
+        """Send spooled rows, oldest first; True once the spool is empty."""
+        try:
+            batches = self._read_spool()
+        except FileNotFoundError:
+            return True
+        sent = 0
+        try:
+            for rows in batches:
+                try:
+                    self._post(rows)
+                    self._notify_listeners(rows)
+                except RemoteRejected as e:
+                    # Drop it: a batch the server refuses mustn't block the rest forever
+                    print(f"Entry server rejected {len(rows)} spooled entries: {e}")
+                sent += 1
+        except (OSError, http.client.HTTPException):
+            pass
+        finally:
+            if sent:
+                self._rewrite_spool(batches[sent:])
+        return sent == len(batches)
+
+    def _read_spool(self):
+        """Return the spooled batches, cutting off a torn last line left by a crash."""
+        batches = []
+        end = 0
+        with open(self.spool_path, 'rb+') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                if line.strip():
+                    try:
+                        batches.append(json.loads(line))
+                    except ValueError:
+                        break
+                end += len(line)
+            if f.seek(0, os.SEEK_END) != end:
+                print(f"Dropped a torn last line from {self.spool_path}")
+                f.truncate(end)
+        return batches
+
+    def _rewrite_spool(self, batches):
+        if not batches:
+            os.remove(self.spool_path)
+            return
+        tmp_path = self.spool_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.writelines(json.dumps(rows) + "\n" for rows in batches)
+        os.replace(tmp_path, self.spool_path)
+
+    def _notify_listeners(self, rows):
+        for callback in self._listeners:
+            try:
+                callback(rows, [None] * len(rows))
+            except Exception as e:
+                print(f"Entry writer listener failed: {e}")
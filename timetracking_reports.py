@@ -0,0 +1,190 @@
+"""Streaming per-project, per-day and per-week hour totals from the entries CSV."""
+import csv
+import datetime
+from collections import defaultdict, namedtuple
+
+from timetracking_core import CSV_FILE, CSV_HEADERS
+
+SUBJECT_PREFIX = "Timetracking: "
+
+Entry = namedtuple('Entry', ['project', 'start', 'end'])
+
+_SUBJECT, _START_DATE, _START_TIME, _END_DATE, _END_TIME = (
+    CSV_HEADERS.index(name)
+    for name in ('Subject', 'Start Date', 'Start Time', 'End Date', 'End Time')
+)
+
+def project_from_subject(subject):
+    """Return the project name from a "Timetracking: <project>" subject."""
+    if subject.startswith(SUBJECT_PREFIX):
+        return subject[len(SUBJECT_PREFIX):]
+    return subject
+
+def _minutes(value):
+    """Parse an HH:MM time into minutes after midnight."""
+    hours, minutes = value.split(':')
+    return int(hours) * 60 + int(minutes)
+
+class _DateCache:
+    """Remember the last few parsed dates; rows for one day sit next to each other."""
+
+    def __init__(self):
+        self._last = {}
+
+    def __call__(self, value):
+        date = self._last.get(value)
+        if date is None:
+            month, day, year = value.split('/')
+            date = datetime.date(int(year), int(month), int(day))
+            if len(self._last) > 64:
+                self._last.clear()
+            self._last[value] = date
+        return date
+
+def iter_csv_rows(path=CSV_FILE, start_date=None, end_date=None, end_offset=None):
+    """Yield raw CSV rows (lists), skipping the header.
+
+    With a date range the sidecar date index is used to seek straight to the
+    matching rows; otherwise the file is streamed from the start. With
+    end_offset, only rows before that byte offset are read.
+    """
+    if start_date is not None or end_date is not None:
+        from timetracking_index import DateIndex, get_date_index
+        index = get_date_index() if path == CSV_FILE else DateIndex(path)
+        start_date = start_date or datetime.date.min
+        end_date = end_date or datetime.date.max
+        for row in index.read_rows(start_date, end_date, end_offset):
+            yield [row[name] for name in CSV_HEADERS]
+        return
+
+    if end_offset is not None:
+        with open(path, 'rb') as csvfile:
+            for row in csv.reader(_lines_before(csvfile, end_offset)):
+                if row and row != CSV_HEADERS:
+                    yield row
+        return
+
+    with open(path, newline='') as csvfile:
+        for row in csv.reader(csvfile):
+            if row and row != CSV_HEADERS:
+                yield row
+
+def _lines_before(f, end_offset):
+    """Yield decoded lines from a binary file until end_offset bytes have been read."""
+    pos = 0
+    for line in f:
+        if pos >= end_offset:
+            return
+        pos += len(line)
+        yield line.decode('utf-8')
+
+def iter_spans(rows):
+    """Turn raw rows into (project, start date, minutes) tuples, skipping bad rows.
+
+    This is the hot path of every report, so it avoids strptime and datetime
+    arithmetic: dates are cached and times are plain minute counts.
+    """
+    parse_date = _DateCache()
+    for row in rows:
+        try:
+            start_date = parse_date(row[_START_DATE])
+            end_date = parse_date(row[_END_DATE])
+            minutes = (
+                (end_date.toordinal() - start_date.toordinal()) * 1440
+                + _minutes(row[_END_TIME]) - _minutes(row[_START_TIME])
+            )
+        except (IndexError, ValueError):
+            continue
+        if minutes > 0:
+            yield project_from_subject(row[_SUBJECT]), start_date, minutes
+
+def iter_entries(path=CSV_FILE, start_date=None, end_date=None):
+    """Yield an Entry(project, start, end) for each row in the CSV."""
+    return entries_from_rows(iter_csv_rows(path, start_date, end_date))
+
+def entries_from_rows(rows):
+    """Yield an Entry(project, start, end) for each raw row, skipping bad rows."""
+    parse_date = _DateCache()
+    for row in rows:
+        try:
+            start = datetime.datetime.combine(parse_date(row[_START_DATE]), datetime.time())
+            end = datetime.datetime.combine(parse_date(row[_END_DATE]), datetime.time())
+            start += datetime.timedelta(minutes=_minutes(row[_START_TIME]))
+            end += datetime.timedelta(minutes=_minutes(row[_END_TIME]))
+        except (IndexError, ValueError):
+            continue
+        yield Entry(project_from_subject(row[_SUBJECT]), start, end)
+
+class ReportTotals:
+    """Minutes per project, per day and per ISO week.
+
+    Memory grows with the number of distinct days and projects, never with the
+    number of rows, so any size of history can be streamed through add().
+    """
+
+    def __init__(self):
+        self.entry_count = 0
+        self.by_project = defaultdict(int)
+        self.by_day = defaultdict(lambda: defaultdict(int))
+        self.by_week = defaultdict(lambda: defaultdict(int))
+        self._weeks = {}
+
+    def add(self, project, date, minutes, count=1):
+        """Add one entry's minutes (or count entries' worth) to the totals."""
+        week = self._weeks.get(date)
+        if week is None:
+            week = self._weeks[date] = date.isocalendar()[:2]
+        self.entry_count += count
+        self.by_project[project] += minutes
+        self.by_day[date][project] += minutes
+        self.by_week[week][project] += minutes
+
+    def project_hours(self):
+        """Return {project: hours}, largest first."""
+        return {
+            project: minutes / 60
+            for project, minutes in sorted(self.by_project.items(), key=lambda kv: (-kv[1], kv[0]))
+        }
+
+    def day_hours(self):
+        """Return {date: {project: hours}} in date order."""
+        return {
+            date: {project: minutes / 60 for project, minutes in sorted(projects.items())}
+            for date, projects in sorted(self.by_day.items())
+        }
+
+    def week_hours(self):
+        """Return {(iso year, iso week): {project: hours}} in week order."""
+        return {
+            week: {project: minutes / 60 for project, minutes in sorted(projects.items())}
+            for week, projects in sorted(self.by_week.items())
+        }
+
+def build_report(path=CSV_FILE, start_date=None, end_date=None):
+    """Stream the CSV once and return its ReportTotals."""
+    totals = ReportTotals()
+    add = totals.add
+    for project, date, minutes in iter_spans(iter_csv_rows(path, start_date, end_date)):
+        add(project, date, minutes)
+    return totals
+
+def format_report(totals, days=14, weeks=8):
+    """Render totals as plain text: overall, then the most recent weeks and days."""
+    lines = [f"Entries: {totals.entry_count}", "", "Hours by project:"]
+    for project, hours in totals.project_hours().items():
+        lines.append(f"  {project:<30} {hours:8.1f}")
+
+    week_hours = totals.week_hours()
+    lines += ["", "Hours by week:"]
+    for (year, week), projects in list(week_hours.items())[-weeks:]:
+        lines.append(f"  {year}-W{week:02d}")
+        for project, hours in projects.items():
+            lines.append(f"    {project:<28} {hours:8.1f}")
+
+    day_hours = totals.day_hours()
+    lines += ["", "Hours by day:"]
+    for date, projects in list(day_hours.items())[-days:]:
+        lines.append(f"  {date.isoformat()}")
+        for project, hours in projects.items():
+            lines.append(f"    {project:<28} {hours:8.1f}")
+    return "\n".join(lines)
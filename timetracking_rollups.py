@@ -0,0 +1,294 @@
+"""Day, ISO week and month totals per project, kept up to date as entries are written.
+
+The tables are saved in a JSON file next to the entries
+(timetracking_entries_rollups.json for timetracking_entries.csv), stamped
+with the storage's entries_signature() as of the entries they count. Rows
+written through the shared entry writer are added as they land, a few
+dictionary updates each, so the summary in the app never has to read the
+history (rows sent to an ingestion server are stored there, not here, and
+are not counted). The stamp moves along with those rows only; entries
+edited, or written by anything else (by hand, the CLI, a sync or an import),
+leave it behind, and a stamp that no longer matches on load makes the tables be
+rebuilt from storage.
+"""
+import atexit
+import datetime
+import json
+import os
+import threading
+import time
+
+from timetracking_core import CSV_HEADERS
+from timetracking_partitions import month_key
+from timetracking_reports import iter_spans
+
+_VERSION = 1
+# Saving rewrites the whole file, so bursts of entries are saved at most this often
+SAVE_INTERVAL = 30.0
+
+def rollups_path_for(path):
+    """Return the rollups file that belongs to an entries file."""
+    return os.path.splitext(path)[0] + '_rollups.json'
+
+def week_key(date):
+    year, week, _ = date.isocalendar()
+    return f"{year:04d}-W{week:02d}"
+
+def _normalize(signature):
+    # Signatures are compared after a trip through JSON, where tuples become lists
+    return json.loads(json.dumps(signature))
+
+def _add_minutes(table, key, project, minutes):
+    projects = table.get(key)
+    if projects is None:
+        projects = table[key] = {}
+    total = projects.get(project, 0) + minutes
+    if total:
+        projects[project] = total
+    else:
+        del projects[project]
+        if not projects:
+            del table[key]
+
+class RollupTables:
+    """Minutes per project for every day, ISO week and month with entries.
+
+    Entries count towards the day they start on, as in the reports.
+    """
+
+    def __init__(self, storage=None, path=None):
+        self.storage = storage
+        self.path = path
+        self.days = {}    # 'YYYY-MM-DD' -> {project: minutes}
+        self.weeks = {}   # 'YYYY-Www' -> {project: minutes}
+        self.months = {}  # 'YYYY-MM' -> {project: minutes}
+        self.signature = None
+        self._loaded = False
+        self._dirty = False
+        self._last_save = 0.0
+        self._rebuilding = False
+        self._written_during_rebuild = set()
+        self._added = 0  # Batches added so far, so verify() can tell if rows arrived mid-read
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+
+    def _storage(self):
+        if self.storage is None:
+            from timetracking_storage import get_storage
+            self.storage = get_storage()
+        if self.path is None:
+            self.path = rollups_path_for(self.storage.path)
+        return self.storage
+
+    def _add(self, date, project, minutes):
+        _add_minutes(self.days, date.isoformat(), project, minutes)
+        _add_minutes(self.weeks, week_key(date), project, minutes)
+        _add_minutes(self.months, month_key(date), project, minutes)
+
+    def load(self):
+        """Load the saved tables, rebuilding them if they don't match storage."""
+        with self._lock:
+            storage = self._storage()
+            try:
+                with open(self.path) as f:
+                    saved = json.load(f)
+            except (OSError, ValueError):
+                saved = None
+            signature = _normalize(storage.entries_signature())
+            if (saved is not None and saved.get('version') == _VERSION
+                    and signature is not None and saved.get('signature') == signature):
+                self.days = saved['days']
+                self.weeks = saved['weeks']
+                self.months = saved['months']
+                self.signature = signature
+                self._loaded = True
+                return self
+        self.rebuild()
+        return self
+
+    def _ensure_loaded(self):
+        # Separate from _lock so written rows aren't held up while a rebuild reads storage
+        with self._load_lock:
+            if not self._loaded:
+                self.load()
+
+    def rebuild(self):
+        """Recompute every table from storage and save them."""
+        with self._lock:
+            storage = self._storage()
+            # Stamped with the state before reading, so rows added meanwhile make it stale
+            self.signature = _normalize(storage.entries_signature())
+            self._rebuilding = True
+            self._written_during_rebuild = set()
+        totals = None
+        try:
+            totals = storage.build_report()
+        finally:
+            with self._lock:
+                self._rebuilding = False
+                if totals is None:
+                    self.signature = None
+        with self._lock:
+            self.days, self.weeks, self.months = {}, {}, {}
+            for date, projects in totals.by_day.items():
+                for project, minutes in projects.items():
+                    self._add(date, project, minutes)
+            self._loaded = True
+            self._dirty = True
+            written, self._written_during_rebuild = self._written_during_rebuild, set()
+        if written:
+            # The report may or may not have seen rows written while it ran; recount their days
+            self._recount(min(written), max(written))
+        self.save()
+
+    def add_rows(self, rows, removed=()):
+        """Add freshly written rows (lists in CSV_HEADERS order), taking away removed ones."""
+        spans = [(project, date, minutes) for project, date, minutes in iter_spans(rows)]
+        spans += [(project, date, -minutes) for project, date, minutes in iter_spans(removed)]
+        with self._lock:
+            if self._rebuilding:
+                self._written_during_rebuild.update(date for _, date, _ in spans)
+                return
+            if not self._loaded:
+                # Loading reads storage, which already holds the new rows
+                return
+            for project, date, minutes in spans:
+                self._add(date, project, minutes)
+            self._added += 1
+            self._dirty = True
+        if time.monotonic() - self._last_save >= SAVE_INTERVAL:
+            self.save()
+
+    def on_rows_written(self, rows, offsets):
+        """EntryWriter listener: add rows as soon as they've been written."""
+        try:
+            with self._lock:
+                if self.signature is not None:
+                    self.signature = _normalize(self._storage().signature_after_append(self.signature, rows))
+                self.add_rows([row[name] for name in CSV_HEADERS] for row in rows)
+        except (IOError, OSError) as e:
+            print(f"Could not update the rollups: {e}")
+
+    def on_entries_edited(self, removed, added):
+        """Storage edit listener: swap an entry's old version for its new one."""
+        try:
+            with self._lock:
+                # How an edit changes the signature can't be told in advance
+                self.signature = None
+                self.add_rows(added, removed)
+        except (IOError, OSError) as e:
+            print(f"Could not update the rollups: {e}")
+
+    def save(self):
+        """Write the tables out if they changed, replacing the file atomically."""
+        with self._lock:
+            if not self._dirty:
+                return
+            signature = self.signature
+            if signature is not None and _normalize(self._storage().entries_signature()) != signature:
+                # Entries reached storage without passing through here, so the next load rebuilds
+                signature = None
+            data = json.dumps({'version': _VERSION, 'signature': signature, 'days': self.days,
+                               'weeks': self.weeks, 'months': self.months}, sort_keys=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+            self.signature = signature
+            self._dirty = False
+            self._last_save = time.monotonic()
+
+    def _recount(self, start_date, end_date):
+        """Recount the days between two dates from storage; return the dates that changed."""
+        for _ in range(3):
+            added = self._added
+            counted = {}
+            for project, date, minutes in iter_spans(self._storage().iter_rows(start_date, end_date)):
+                projects = counted.setdefault(date, {})
+                projects[project] = projects.get(project, 0) + minutes
+            # Rows added while reading may or may not have been read: count again
+            if self._added == added:
+                break
+        changed = []
+        with self._lock:
+            date = start_date
+            while date <= end_date:
+                expected = counted.get(date, {})
+                stored = self.days.get(date.isoformat(), {})
+                if expected != stored:
+                    for project in set(expected) | set(stored):
+                        difference = expected.get(project, 0) - stored.get(project, 0)
+                        if difference:
+                            self._add(date, project, difference)
+                    changed.append(date)
+                    self._dirty = True
+                date += datetime.timedelta(days=1)
+        return changed
+
+    def verify(self, start_date, end_date):
+        """Check the days between two dates against storage and fix any that drifted.
+
+        Returns the dates that were wrong. Drift means entries reached storage
+        without passing through these tables, so the stamp is dropped and the
+        next load rebuilds everything.
+        """
+        self._ensure_loaded()
+        drifted = self._recount(start_date, end_date)
+        if drifted:
+            with self._lock:
+                self.signature = None
+            self.save()
+        return drifted
+
+    def totals(self, table, key):
+        """Return {project: minutes} for one key of the 'days', 'weeks' or 'months' table."""
+        # Loaded first: a rebuild takes _lock while holding _load_lock
+        self._ensure_loaded()
+        with self._lock:
+            return dict(getattr(self, table).get(key, {}))
+
+    def day(self, date):
+        return self.totals('days', date.isoformat())
+
+    def week(self, date):
+        """Return {project: minutes} for the ISO week containing date."""
+        return self.totals('weeks', week_key(date))
+
+    def month(self, date):
+        return self.totals('months', month_key(date))
+
+def format_summary(minutes_by_project, limit=3):
+    """Render {project: minutes} as '5.5 h: Alpha 3.0, Beta 2.5', biggest projects first."""
+    if not minutes_by_project:
+        return "nothing logged"
+    total = sum(minutes_by_project.values())
+    ranked = sorted(minutes_by_project.items(), key=lambda kv: (-kv[1], kv[0]))
+    parts = [f"{project} {minutes / 60:.1f}" for project, minutes in ranked[:limit]]
+    if len(ranked) > limit:
+        parts.append(f"+{len(ranked) - limit} more")
+    return f"{total / 60:.1f} h: " + ", ".join(parts)
+
+_default_rollups = None
+
+def _save_at_exit():
+    from timetracking_writer import get_entry_writer
+    # Rows the writer still holds reach the tables before they're saved
+    get_entry_writer().close()
+    _default_rollups.save()
+
+def get_rollups():
+    """Return the shared rollup tables, kept current by the shared entry writer."""
+    global _default_rollups
+    if _default_rollups is None:
+        from timetracking_writer import EntryWriter, get_entry_writer
+        from timetracking_storage import CsvStorage
+        _default_rollups = RollupTables()
+        writer = get_entry_writer()
+        if isinstance(writer, EntryWriter):
+            # Rows sent to an ingestion server never reach local storage, so must not move the stamp
+            writer.add_listener(_default_rollups.on_rows_written)
+        storage = _default_rollups._storage()
+        if isinstance(storage, CsvStorage):
+            storage.add_edit_listener(_default_rollups.on_entries_edited)
+        atexit.register(_save_at_exit)
+    return _default_rollups
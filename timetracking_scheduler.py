@@ -0,0 +1,79 @@
+"""Prompt timetable and the next-fire-time logic behind the scheduler window."""
+import datetime
+import time
+
+from timetracking_calendar import get_work_calendar
+from timetracking_reports import entries_from_rows
+from timetracking_storage import get_storage
+
+class PromptScheduler:
+    """Work out when the next prompt is due instead of polling for it.
+
+    The caller arms a single timer for the delay returned by poll() and calls
+    poll() again when it fires. Slots come from the working calendar as local
+    wall-clock times and are converted to timestamps only when comparing, so
+    DST changes move the next slot with the clock. Delays are capped at
+    max_sleep because timers run on a monotonic clock that stops during
+    suspend and ignores wall-clock changes; the cap bounds how late a prompt
+    can be after either.
+    """
+
+    def __init__(self, calendar=None, max_sleep=300, late_tolerance=15 * 60):
+        self.calendar = calendar or get_work_calendar()
+        self.interval = self.calendar.interval
+        self.max_sleep = max_sleep
+        self.late_tolerance = late_tolerance
+        self.planned = None
+        self.missed = []
+
+    def next_slot(self, now):
+        """Return the first working slot strictly after the local datetime now, or None."""
+        return self.calendar.next_slot(now)
+
+    def poll(self, now=None):
+        """Check the clock; return (slot that is due or None, seconds until the next poll).
+
+        A slot is only reported due if we wake up within late_tolerance of it;
+        slots slept through for longer (e.g. a suspended laptop) are added to
+        missed instead of prompting for stale time.
+        """
+        if now is None:
+            now = time.time()
+        now_local = datetime.datetime.fromtimestamp(now)
+
+        # Walk every slot we've passed since the last poll: normally just one,
+        # several after a suspend or a jump forward in the clock
+        passed = []
+        slot = self.planned
+        while slot is not None and slot.timestamp() <= now:
+            passed.append(slot)
+            slot = self.next_slot(slot)
+
+        due = None
+        if passed and now - passed[-1].timestamp() <= self.late_tolerance:
+            due = passed.pop()
+        self.missed.extend(passed)
+        # Always re-plan from the current time, which also copes with the clock
+        # having been set backwards or forwards since the last poll
+        self.planned = self.next_slot(now_local)
+
+        if self.planned is None:
+            return due, self.max_sleep
+        delay = self.planned.timestamp() - now
+        return due, max(0.0, min(delay, self.max_sleep))
+
+def unlogged_slots(slots, storage=None, interval=None):
+    """Return the slots whose interval has no overlapping entry stored yet.
+
+    Each slot covers the interval leading up to it, the calendar's by default.
+    """
+    if not slots:
+        return []
+    interval = interval or get_work_calendar().interval
+    storage = storage or get_storage()
+    first = min(slots) - interval
+    entries = list(entries_from_rows(storage.iter_rows(first.date(), max(slots).date())))
+    return [
+        slot for slot in slots
+        if not any(entry.start < slot and entry.end > slot - interval for entry in entries)
+    ]
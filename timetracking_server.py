@@ -0,0 +1,202 @@
+"""Optional ingestion server that collects entries from several trackers into one store.
+
+Start it with `python3 timetracking_cli.py serve` (HTTP on 127.0.0.1:8765 by
+default, or --unix PATH for a Unix socket). Trackers started with
+TIMETRACKER_SERVER pointing at it send their entries here instead of
+writing locally (see timetracking_remote.py).
+
+    POST /entries   JSON row, list of rows or {"rows": [...]} in the CSV schema
+                    -> 200 {"written": n} once the rows are stored, 400 if
+                    they're malformed or the storage refuses them, 500 if
+                    they couldn't be stored
+    GET  /health    -> 200 {"pending": rows waiting, "written": rows stored}
+
+Rows from all connections go through one EntryWriter, so concurrent
+requests are coalesced into batched appends. At most max_pending rows may
+be waiting to be written; a request that doesn't fit waits (and stops
+reading from its connection) for up to queue_timeout seconds and is then
+turned away with 503 and Retry-After.
+"""
+import asyncio
+import json
+
+from timetracking_core import CSV_HEADERS, csv_epoch_minutes
+from timetracking_storage import get_storage
+from timetracking_writer import EntryWriter
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# Largest request body accepted, in bytes
+MAX_BODY = 16 * 1024 * 1024
+
+_REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+            405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error",
+            503: "Service Unavailable"}
+
+def validate_rows(payload):
+    """Return the rows in payload as CSV-ordered dicts, or raise ValueError."""
+    if isinstance(payload, dict):
+        payload = payload['rows'] if 'rows' in payload else [payload]
+    if not isinstance(payload, list):
+        raise ValueError("expected a row, a list of rows or {\"rows\": [...]}")
+    rows = []
+    for i, row in enumerate(payload):
+        if not isinstance(row, dict):
+            raise ValueError(f"row {i} is not an object")
+        missing = [name for name in CSV_HEADERS if not isinstance(row.get(name), str)]
+        if missing:
+            raise ValueError(f"row {i} is missing {', '.join(missing)}")
+        try:
+            start = csv_epoch_minutes(row['Start Date'], row['Start Time'])
+            end = csv_epoch_minutes(row['End Date'], row['End Time'])
+        except ValueError:
+            raise ValueError(f"row {i} has a malformed date or time") from None
+        if end < start:
+            raise ValueError(f"row {i} ends before it starts")
+        rows.append({name: row[name] for name in CSV_HEADERS})
+    return rows
+
+class IngestServer:
+    """asyncio HTTP server in front of a shared EntryWriter."""
+
+    def __init__(self, storage=None, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None,
+                 max_pending=10_000, queue_timeout=5.0, max_batch=1000, token=None):
+        self.writer = EntryWriter(storage=storage or get_storage(), max_batch=max_batch)
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.token = token
+        self.pending = 0
+        self.written = 0
+        self._space = None
+        self._server = None
+
+    async def start(self):
+        """Start listening; returns once the socket is bound."""
+        self._space = asyncio.Condition()
+        if self.unix_path:
+            self._server = await asyncio.start_unix_server(self._handle, path=self.unix_path)
+        else:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            # With port 0 the OS picks one; remember which
+            self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            self.writer.close()
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        await asyncio.get_running_loop().run_in_executor(None, self.writer.close)
+
+    async def _reserve(self, count):
+        """Wait for room for count more pending rows; False if it doesn't come in time."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.queue_timeout
+        async with self._space:
+            # A request bigger than the whole limit is still let through on its own
+            while self.pending and self.pending + count > self.max_pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return False
+                try:
+                    await asyncio.wait_for(self._space.wait(), remaining)
+                except asyncio.TimeoutError:
+                    return False
+            self.pending += count
+        return True
+
+    async def _release(self, count):
+        async with self._space:
+            self.pending -= count
+            self._space.notify_all()
+
+    async def _write(self, rows):
+        if not await self._reserve(len(rows)):
+            return 503, {'error': "server busy, retry later"}
+        try:
+            await asyncio.wrap_future(self.writer.submit(rows))
+        except (ValueError, TypeError, KeyError) as e:
+            # The storage refused these rows: sending them again won't help
+            return 400, {'error': f"rows rejected: {e}"}
+        except Exception as e:
+            return 500, {'error': f"could not store entries: {e}"}
+        finally:
+            await self._release(len(rows))
+        self.written += len(rows)
+        return 200, {'written': len(rows)}
+
+    async def _respond(self, method, path, headers, body):
+        if self.token and headers.get('authorization') != f"Bearer {self.token}":
+            return 401, {'error': "missing or wrong token"}
+        if path == '/health':
+            return 200, {'pending': self.pending, 'written': self.written}
+        if path != '/entries':
+            return 404, {'error': f"no such path {path}"}
+        if method != 'POST':
+            return 405, {'error': "use POST"}
+        try:
+            rows = validate_rows(json.loads(body))
+        except (ValueError, KeyError) as e:
+            return 400, {'error': str(e)}
+        if not rows:
+            return 200, {'written': 0}
+        return await self._write(rows)
+
+    async def _handle(self, reader, writer):
+        """Serve requests on one keep-alive connection until the client closes it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    break
+                if length > MAX_BODY:
+                    status, result = 413, {'error': "request too large"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    status, result = await self._respond(method, path.split('?')[0], headers, body)
+                    keep_alive = (headers.get('connection', '').lower() != 'close'
+                                  and version == 'HTTP/1.1')
+
+                payload = json.dumps(result).encode()
+                head = [f"HTTP/1.1 {status} {_REASONS[status]}",
+                        "Content-Type: application/json",
+                        f"Content-Length: {len(payload)}"]
+                if status == 503:
+                    head.append("Retry-After: 1")
+                if not keep_alive:
+                    head.append("Connection: close")
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,931 @@
+"""Pluggable storage for entries and projects: the CSV file, SQLite or the binary store."""
+import abc
+import contextlib
+import csv
+import datetime
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from timetracking_core import (
+    CSV_FILE, CSV_HEADERS, EPOCH_ORDINAL, PROJECTS_FILE, csv_epoch_minutes, from_epoch_minutes,
+    load_projects, save_projects
+)
+from timetracking_index import START_DATE_COLUMN, parse_csv_date
+from timetracking_journal import EntryJournal
+from timetracking_reports import ReportTotals, iter_csv_rows, iter_spans, project_from_subject
+from timetracking_store import _RECORD_SIZE, STORE_FILE, EntryStore
+
+# Backend used by the GUI and CLI: 'csv' (default), 'sqlite' or 'binary'
+STORAGE_BACKEND = os.environ.get('TIMETRACKER_STORAGE', 'csv')
+DB_FILE = 'timetracking.db'
+# Where non-CSV backends write the CSV for Google Calendar
+EXPORT_FILE = 'timetracking_export.csv'
+# Entries added since the last import, and how far each store has been exported
+DELTA_FILE = 'timetracking_delta.csv'
+WATERMARK_FILE = 'timetracking_export_watermarks.json'
+# Processes reports may use by default (0 means one per CPU); parsed on first report
+REPORT_WORKERS = os.environ.get('TIMETRACKER_REPORT_WORKERS', '')
+# Move rows from before the current month into compressed monthly partitions
+PARTITION_BY_MONTH = os.environ.get('TIMETRACKER_PARTITIONS', '') not in ('', '0')
+
+class StorageError(IOError):
+    """Raised when a backend can't store or read entries."""
+
+def format_csv_rows(rows, header=False):
+    """Format entry rows as CSV bytes, optionally preceded by the header."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_HEADERS)
+    if header:
+        writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue().encode('utf-8')
+
+_report_workers = None
+
+def _default_report_workers():
+    """Return the worker count TIMETRACKER_REPORT_WORKERS asks for, or 1 if it isn't a number."""
+    global _report_workers
+    if _report_workers is None:
+        try:
+            _report_workers = int(REPORT_WORKERS or 1)
+        except ValueError:
+            print(f"Ignoring TIMETRACKER_REPORT_WORKERS={REPORT_WORKERS!r}, which isn't a number; "
+                  f"reporting on one process")
+            _report_workers = 1
+    return _report_workers
+
+def row_minutes(row):
+    """Return (start minute, end minute) since the epoch for a CSV row dict."""
+    try:
+        return (csv_epoch_minutes(row['Start Date'], row['Start Time']),
+                csv_epoch_minutes(row['End Date'], row['End Time']))
+    except (AttributeError, KeyError, ValueError):
+        raise StorageError(f"Entry has an invalid date or time: {row}")
+
+def _minute_range(start_date, end_date):
+    """Turn an inclusive date range into a half-open range of epoch minutes."""
+    low = (start_date.toordinal() - EPOCH_ORDINAL) * 1440 if start_date else None
+    high = (end_date.toordinal() - EPOCH_ORDINAL + 1) * 1440 if end_date else None
+    return low, high
+
+def _sql_row(subject, start_minute, end_minute, description):
+    """Turn an entries table row back into a CSV_HEADERS row."""
+    start = from_epoch_minutes(start_minute)
+    end = from_epoch_minutes(end_minute)
+    return [subject, start.strftime("%m/%d/%Y"), start.strftime("%H:%M"),
+            end.strftime("%m/%d/%Y"), end.strftime("%H:%M"), description]
+
+class Storage(abc.ABC):
+    """Where entries and projects live.
+
+    append_rows() is only ever called from the entry writer thread; the other
+    methods may be called from any thread.
+    """
+    name = None
+
+    def initialize(self):
+        """Create the backing store if needed; return True if it was created."""
+        return False
+
+    @abc.abstractmethod
+    def append_rows(self, rows):
+        """Store CSV row dicts atomically; return their byte offsets if the backend has any."""
+        raise NotImplementedError
+
+    def flush(self, fsync=False):
+        """Push appended rows to the OS (and to disk if fsync)."""
+
+    def close(self):
+        """Release any handles held by the calling thread."""
+
+    def load_projects(self):
+        return load_projects()
+
+    def save_projects(self, projects):
+        save_projects(projects)
+
+    def projects_signature(self):
+        """Return a value that changes whenever the saved projects may have changed."""
+        try:
+            stat = os.stat(PROJECTS_FILE)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def entries_signature(self):
+        """Return a value that changes whenever entries are added or changed, or None if unknown."""
+        return None
+
+    def signature_after_append(self, signature, rows):
+        """Return the entries_signature() a store at signature has once rows are appended, or None if unknown."""
+        return None
+
+    def find_entries(self, start_date, end_date):
+        """Return [(entry id, row)] for entries starting between two dates, oldest first."""
+        raise StorageError(f"Entries can't be edited in the {self.name} backend")
+
+    def entry(self, entry_id):
+        """Return the current version of an entry as a row list, or None if there's none."""
+        raise StorageError(f"Entries can't be edited in the {self.name} backend")
+
+    def update_entry(self, entry_id, row):
+        """Replace an entry with a CSV row dict."""
+        raise StorageError(f"Entries can't be edited in the {self.name} backend")
+
+    def delete_entry(self, entry_id):
+        raise StorageError(f"Entries can't be edited in the {self.name} backend")
+
+    def delete_entries(self, entry_ids):
+        """Delete several entries in one step."""
+        raise StorageError(f"Entries can't be edited in the {self.name} backend")
+
+    @abc.abstractmethod
+    def iter_rows(self, start_date=None, end_date=None):
+        """Yield rows as lists in the CSV_HEADERS layout, optionally for a date range."""
+        raise NotImplementedError
+
+    def build_report(self, start_date=None, end_date=None, workers=None):
+        """Return ReportTotals for the stored entries.
+
+        workers is how many processes may share the work; only the CSV
+        backend uses more than one.
+        """
+        totals = ReportTotals()
+        for project, date, minutes in iter_spans(self.iter_rows(start_date, end_date)):
+            totals.add(project, date, minutes)
+        return totals
+
+    def export_csv(self, path=EXPORT_FILE, start_date=None, end_date=None):
+        """Write entries as a Google Calendar CSV and return its path."""
+        with open(path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(CSV_HEADERS)
+            writer.writerows(self.iter_rows(start_date, end_date))
+        return path
+
+    def csv_for_import(self):
+        """Return the path of a CSV that's ready to import into Google Calendar."""
+        return self.export_csv()
+
+    @abc.abstractmethod
+    def rows_since(self, watermark):
+        """Return (rows added after watermark, new watermark); watermark 0 is the beginning."""
+        raise NotImplementedError
+
+    def _watermark_key(self):
+        return f"{self.name}:{os.path.abspath(self.path)}"
+
+    def _read_watermarks(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def export_watermark(self, path=WATERMARK_FILE):
+        """Return how far this store has been exported by export_delta()."""
+        return self._read_watermarks(path).get(self._watermark_key(), 0)
+
+    def save_export_watermark(self, watermark, path=WATERMARK_FILE):
+        """Record how far this store has been exported; replaces the file atomically."""
+        watermarks = self._read_watermarks(path)
+        watermarks[self._watermark_key()] = watermark
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(watermarks, f)
+        os.replace(tmp_path, path)
+
+    def reset_export_watermark(self, path=WATERMARK_FILE):
+        """Make the next export_delta() include every entry again."""
+        self.save_export_watermark(0, path)
+
+    def pending_export_count(self, watermark_path=WATERMARK_FILE):
+        """Return how many entries the next export_delta() would write, leaving the watermark alone."""
+        return len(self.rows_since(self.export_watermark(watermark_path))[0])
+
+    def export_delta(self, path=DELTA_FILE, watermark_path=WATERMARK_FILE):
+        """Write only the entries added since the last delta export; return how many.
+
+        The watermark is saved after the delta file is complete, so a failed
+        export is simply repeated next time.
+        """
+        rows, watermark = self.rows_since(self.export_watermark(watermark_path))
+        with open(path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(CSV_HEADERS)
+            writer.writerows(rows)
+        self.save_export_watermark(watermark, watermark_path)
+        return len(rows)
+
+    def describe(self):
+        """Return a short label for where entries are kept."""
+        return f"{self.name} file: {os.path.abspath(self.path)}"
+
+class CsvStorage(Storage):
+    """The original layout: entries in CSV_FILE, projects in PROJECTS_FILE.
+
+    New rows go to a locked append journal next to the CSV and are compacted
+    into it after compact_interval seconds or compact_bytes of journal, and
+    when the storage closes. Any number of processes can write at once.
+    Readers see compacted and journaled rows alike.
+
+    With partition_by_month, rows from earlier months are rotated out of the
+    CSV into compressed monthly partitions (see timetracking_partitions.py)
+    when the storage starts and when a new month begins. Readers always
+    include archived partitions, pruned to the dates they ask for.
+
+    Edits and deletions go to an edit log next to the CSV (see
+    timetracking_edits.py) that readers apply as they go. Once the edits
+    supersede FOLD_RATIO of the stored rows, a background thread folds them
+    into the CSV.
+    """
+    name = "CSV"
+
+    def __init__(self, path=CSV_FILE, compact_interval=60.0, compact_bytes=64 * 1024,
+                 partition_by_month=None):
+        self.path = path
+        self.journal = EntryJournal(path)
+        self.compact_interval = compact_interval
+        self.compact_bytes = compact_bytes
+        self.partition_by_month = PARTITION_BY_MONTH if partition_by_month is None else partition_by_month
+        self._last_compaction = time.monotonic()
+        self._listeners = []
+        self._archive = None
+        self._rotated_month = None
+        self._edits = None
+        self._edit_listeners = []
+        self._folding = False
+        self._fold_thread = None
+        self._fold_holds = 0
+
+    def add_listener(self, callback):
+        """Call callback(rows, offsets) after compaction moves rows into the CSV."""
+        self._listeners.append(callback)
+
+    def add_edit_listener(self, callback):
+        """Call callback(removed rows, added rows) after an entry is edited or deleted."""
+        self._edit_listeners.append(callback)
+
+    def initialize(self):
+        created = False
+        try:
+            with open(self.path, 'xb') as csvfile:
+                csvfile.write(format_csv_rows([], header=True))
+            created = True
+        except FileExistsError:
+            pass
+        # Recover from a crash in this or another process before anything reads the CSV
+        self.compact()
+        if self.partition_by_month:
+            self.rotate()
+        elif self._has_archive() or os.path.isdir(os.path.splitext(self.path)[0] + '_archive'):
+            # Also when a first rotation died before writing the manifest, to clear what it left
+            with self.journal.locked_csv():
+                self.archive().recover(self.path)
+        if self._has_edits() or os.path.exists(self.path + '.fold'):
+            self._recover_edits()
+            self._maybe_fold()
+        return created
+
+    def archive(self):
+        """Return the monthly partition archive that belongs to this CSV."""
+        if self._archive is None:
+            from timetracking_partitions import PartitionArchive, archive_dir_for
+            self._archive = PartitionArchive(archive_dir_for(self.path))
+        return self._archive
+
+    def _has_archive(self):
+        # Checked without importing the partitions module, which most runs never need
+        if self._archive is not None:
+            return self._archive.exists()
+        return os.path.exists(os.path.join(os.path.splitext(self.path)[0] + '_archive', 'manifest.json'))
+
+    def edits(self):
+        """Return the edit log that belongs to this CSV."""
+        if self._edits is None:
+            from timetracking_edits import EditLog
+            self._edits = EditLog(self.path)
+        return self._edits
+
+    def _has_edits(self):
+        try:
+            return os.path.getsize(self.path + '.edits') > 0
+        except OSError:
+            return False
+
+    def entries_signature(self):
+        # Compaction only moves bytes from the journal into the CSV, so it leaves this alone
+        archive = edits = None
+        if self._has_archive():
+            stat = os.stat(self.archive().manifest_path)
+            archive = (stat.st_size, stat.st_mtime_ns)
+        if self._has_edits():
+            stat = os.stat(self.path + '.edits')
+            edits = (stat.st_size, stat.st_mtime_ns)
+        return self.journal.logical_size(), archive, edits
+
+    def signature_after_append(self, signature, rows):
+        logical_size, archive, edits = signature
+        return logical_size + len(format_csv_rows(rows)), archive, edits
+
+    def rotate(self, today=None):
+        """Move rows from before this month into the archive; return how many moved.
+
+        Rows the delta export hasn't picked up yet stay in the CSV until it has,
+        and its watermark is moved to the same place in the rewritten file.
+        """
+        month = (today or datetime.date.today()).replace(day=1)
+        self.compact()
+        with self.journal.locked_csv():
+            if not os.path.exists(self.path):
+                return 0
+            key = self._watermark_key()
+            watermark = self._read_watermarks(WATERMARK_FILE).get(key)
+            moved, new_watermark = self.archive().rotate(self.path, month, watermark)
+            if moved and watermark is not None:
+                self.save_export_watermark(new_watermark, WATERMARK_FILE)
+        self._rotated_month = month
+        return moved
+
+    def append_rows(self, rows):
+        # One journal record per batch, so a batch lands in the CSV whole or not at all
+        self.journal.append(format_csv_rows(rows))
+        return None
+
+    def flush(self, fsync=False):
+        if fsync:
+            self.journal.sync()
+        if (self.journal.size() >= self.compact_bytes
+                or time.monotonic() - self._last_compaction >= self.compact_interval):
+            self.compact()
+        if self.partition_by_month and self._rotated_month != datetime.date.today().replace(day=1):
+            self.rotate()
+
+    def compact(self):
+        """Move journaled rows into the CSV now; return how many were moved."""
+        rows, offsets = self.journal.compact()
+        self._last_compaction = time.monotonic()
+        if not rows:
+            return 0
+        for callback in self._listeners:
+            try:
+                callback(rows, offsets)
+            except Exception as e:
+                print(f"Storage listener failed: {e}")
+        return len(rows)
+
+    def close(self):
+        self.compact()
+
+    def iter_rows(self, start_date=None, end_date=None):
+        if not self._has_edits():
+            return self._iter_stored_rows(start_date, end_date)
+        return self._iter_resolved_rows(start_date, end_date)
+
+    def _iter_resolved_rows(self, start_date=None, end_date=None, with_ids=False):
+        """Yield rows with edits applied (see resolve_rows).
+
+        Rows on days with edits are held back until the read is over. If a
+        fold moved the edits into the files meanwhile, the log's generation
+        has changed and those days are read again with the log as it is now,
+        so no edit is applied twice or lost.
+        """
+        from timetracking_edits import entry_id, resolve_rows
+        edits = self.edits()
+        live, dates, generation = edits.snapshot()
+        held = []
+        for row in self._iter_stored_rows(start_date, end_date):
+            if len(row) > START_DATE_COLUMN and row[START_DATE_COLUMN] in dates:
+                held.append(row)
+            elif not with_ids:
+                yield row
+            else:
+                row_id = entry_id(row)
+                if row_id is not None:
+                    yield row_id, row
+        while dates:
+            current, _, latest = edits.snapshot()
+            if latest == generation:
+                break
+            # Only edits to the held days apply: the others' rows have gone out as they were read
+            live = {row_id: versions for row_id, versions in current.items()
+                    if versions[0][START_DATE_COLUMN] in dates}
+            generation = latest
+            days = sorted(day for day in map(parse_csv_date, dates) if day is not None)
+            low = max(days[0], start_date) if start_date else days[0]
+            high = min(days[-1], end_date) if end_date else days[-1]
+            held = [row for row in self._iter_stored_rows(low, high)
+                    if len(row) > START_DATE_COLUMN and row[START_DATE_COLUMN] in dates]
+        yield from resolve_rows(held, live, dates, start_date, end_date, with_ids)
+
+    def _iter_stored_rows(self, start_date=None, end_date=None):
+        """Yield rows as stored, before edits are applied."""
+        if self._has_archive():
+            yield from self.archive().iter_rows(start_date, end_date)
+        pending, csv_size = self.journal.snapshot()
+        if os.path.exists(self.path):
+            yield from iter_csv_rows(self.path, start_date, end_date, end_offset=csv_size)
+        if start_date is None and end_date is None:
+            yield from pending
+            return
+        start_date = start_date or datetime.date.min
+        end_date = end_date or datetime.date.max
+        for row in pending:
+            date = parse_csv_date(row[START_DATE_COLUMN]) if len(row) > START_DATE_COLUMN else None
+            if date is not None and start_date <= date <= end_date:
+                yield row
+
+    def build_report(self, start_date=None, end_date=None, workers=None):
+        workers = _default_report_workers() if workers is None else workers
+        if workers == 0:
+            workers = os.cpu_count() or 1
+        if workers <= 1:
+            return super().build_report(start_date, end_date)
+        from timetracking_parallel import build_report_parallel
+        return build_report_parallel(self, start_date, end_date, workers)
+
+    def csv_for_import(self):
+        if self._has_archive() or (self._has_edits() and self.edits().state()[2]):
+            # The CSV holds only recent months, or rows that have since been edited
+            return self.export_csv()
+        self.compact()
+        return self.path
+
+    def rows_since(self, watermark):
+        # The watermark is a byte offset; a file smaller than it was replaced, so start over
+        self.compact()
+        with open(self.path, 'rb') as f:
+            if watermark > os.fstat(f.fileno()).st_size:
+                watermark = 0
+            f.seek(watermark)
+            data = f.read()
+        # Leave a half-written last line for next time
+        end = data.rfind(b'\n') + 1
+        reader = csv.reader(io.StringIO(data[:end].decode('utf-8'), newline=''))
+        rows = [row for row in reader if row and row != CSV_HEADERS]
+        if self._has_edits():
+            # Rows edited before they were exported go out as they are now
+            from timetracking_edits import apply_in_place
+            live, dates, _ = self.edits().state()
+            rows = list(apply_in_place(rows, live, dates, set(live)))
+        return rows, watermark + end
+
+    def find_entries(self, start_date, end_date):
+        if self._has_edits():
+            found = list(self._iter_resolved_rows(start_date, end_date, with_ids=True))
+        else:
+            from timetracking_edits import entry_id
+            found = [(entry_id(row), row) for row in self._iter_stored_rows(start_date, end_date)]
+            found = [item for item in found if item[0] is not None]
+        found.sort(key=lambda item: (csv_epoch_minutes(item[1][1], item[1][2]), item[0]))
+        return found
+
+    def entry(self, entry_id):
+        from timetracking_edits import entry_id as row_id, id_date
+        try:
+            day = id_date(entry_id)
+        except ValueError:
+            return None
+        if self._has_edits():
+            live, _, _ = self.edits().state()
+            if entry_id in live:
+                return live[entry_id][1]
+        return next((row for row in self._iter_stored_rows(day, day) if row_id(row) == entry_id), None)
+
+    def update_entry(self, entry_id, row):
+        row_minutes(row)
+        self._edit([(entry_id, [row.get(name) or '' for name in CSV_HEADERS])])
+
+    def delete_entry(self, entry_id):
+        self._edit([(entry_id, None)])
+
+    def delete_entries(self, entry_ids):
+        self._edit([(entry_id, None) for entry_id in entry_ids])
+
+    def _edit(self, changes):
+        """Append an update (or, with after None, a tombstone) for each (entry id, after) to the edit log.
+
+        The records are written together, so either all of them are made or none.
+        """
+        from timetracking_edits import entry_id as row_id, id_date
+        days = set()
+        for entry_id, _ in changes:
+            try:
+                days.add(id_date(entry_id))
+            except ValueError:
+                raise StorageError(f"'{entry_id}' is not an entry id")
+        if not changes:
+            return
+        if os.path.exists(self.path + '.fold'):
+            # Finish an interrupted fold first, so the records are against the right CSV
+            self._recover_edits()
+        edits = self.edits()
+        stored = {}
+        live, _, _ = edits.state()
+        if any(entry_id not in live for entry_id, _ in changes):
+            # Looked up before locking: folds take the journal lock and then this one
+            for day in days:
+                for row in self._iter_stored_rows(day, day):
+                    stored.setdefault(row_id(row), row)
+        with edits.locked() as f:
+            live, _, _ = edits.state()
+            versions = {}
+            records, removed, added = [], [], []
+            for entry_id, after in changes:
+                if entry_id in versions:
+                    before, current = versions[entry_id]
+                elif entry_id in live:
+                    before, current = live[entry_id]
+                else:
+                    before = current = stored.get(entry_id)
+                if current is None:
+                    raise StorageError(f"No entry with id {entry_id}")
+                record = {'op': 'update' if after is not None else 'delete', 'id': entry_id, 'before': before}
+                if after is not None:
+                    record['after'] = after
+                    added.append(after)
+                records.append(record)
+                removed.append(current)
+                versions[entry_id] = [before, after]
+            edits.append(f, records)
+        for callback in self._edit_listeners:
+            try:
+                callback(removed, added)
+            except Exception as e:
+                print(f"Storage listener failed: {e}")
+        self._maybe_fold()
+
+    @contextlib.contextmanager
+    def folds_suspended(self):
+        """Keep the edit log from being folded until the block ends, waiting out a fold already running."""
+        self._fold_holds += 1
+        try:
+            thread = self._fold_thread
+            if thread is not None:
+                thread.join()
+            yield
+        finally:
+            self._fold_holds -= 1
+            if not self._fold_holds:
+                self._maybe_fold()
+
+    def _maybe_fold(self):
+        """Fold the edit log on a background thread once enough stored rows are superseded."""
+        from timetracking_edits import FOLD_RATIO
+        from timetracking_index import DateIndex, get_date_index
+        if self._folding or self._fold_holds:
+            return
+        _, _, records = self.edits().state()
+        if not records:
+            return
+        index = get_date_index() if self.path == CSV_FILE else DateIndex(self.path)
+        stored = len(index)
+        if self._has_archive():
+            stored += sum(info['rows'] for info in self.archive().partitions().values())
+        if records >= FOLD_RATIO * stored:
+            self._folding = True
+            self._fold_thread = threading.Thread(target=self._fold_in_background, name="EditFold", daemon=True)
+            self._fold_thread.start()
+
+    def _fold_in_background(self):
+        try:
+            self.fold_edits()
+        except (IOError, OSError) as e:
+            print(f"Could not fold edits into {self.path}: {e}")
+        finally:
+            self._folding = False
+
+    def fold_edits(self):
+        """Rewrite the CSV and archived months with every edit applied; return how many edits were folded.
+
+        The new files are written next to the old ones and a "fold" record in
+        the log is the commit point, so an interrupted fold is either finished
+        or thrown away by the next _recover_edits().
+        """
+        from timetracking_edits import apply_in_place
+        from timetracking_index import iter_csv_records
+        from timetracking_partitions import month_key
+        self.compact()
+        with self.journal.locked_csv():
+            edits = self.edits()
+            with edits.locked() as f:
+                self._recover_fold(edits, f)
+                live, dates, records = edits.state()
+                if not records:
+                    return 0
+                remaining = set(live)
+                manifest = None
+                if self._has_archive():
+                    # Readers go through the archive first, so edits apply there first too
+                    months = {month_key(parse_csv_date(before[START_DATE_COLUMN]))
+                              for before, _ in live.values()}
+                    manifest = self.archive().rewrite(
+                        months, lambda rows: apply_in_place(rows, live, dates, remaining))
+
+                watermark = self._read_watermarks(WATERMARK_FILE).get(self._watermark_key())
+                new_watermark = None
+                with open(self.path, 'rb') as src, open(edits.fold_path, 'wb') as dst:
+                    for offset, row in iter_csv_records(src):
+                        if watermark is not None and new_watermark is None and offset >= watermark:
+                            new_watermark = dst.tell()
+                        for folded in apply_in_place((row,), live, dates, remaining):
+                            dst.write(format_csv_rows([dict(zip(CSV_HEADERS, folded))]))
+                    if watermark is not None and new_watermark is None:
+                        new_watermark = dst.tell()
+                    # Edits whose stored row has gone (e.g. removed by hand) keep their latest version
+                    leftovers = [live[row_id][1] for row_id in remaining if live[row_id][1] is not None]
+                    dst.write(format_csv_rows([dict(zip(CSV_HEADERS, row)) for row in leftovers]))
+                    dst.flush()
+                    os.fsync(dst.fileno())
+
+                commit = {'op': 'fold', 'manifest': manifest, 'watermark': new_watermark}
+                edits.append(f, [commit])
+                self._finish_fold(edits, f, commit, [])
+        return records
+
+    def _finish_fold(self, edits, f, commit, later_records):
+        """Put a committed fold's files in place and keep only the records made after it."""
+        generation = edits.next_generation(edits.records(f))
+        if os.path.exists(edits.fold_path):
+            os.replace(edits.fold_path, self.path)
+        if commit.get('manifest') is not None:
+            self.archive().commit(commit['manifest'])
+        if commit.get('watermark') is not None:
+            self.save_export_watermark(commit['watermark'], WATERMARK_FILE)
+        # Rewritten in place: other processes may be waiting for the lock on this file
+        later_records = [{'op': 'generation', 'generation': generation}] + later_records
+        f.seek(0)
+        f.truncate()
+        f.write(b''.join(json.dumps(record).encode('utf-8') + b'\n' for record in later_records))
+        f.flush()
+        os.fsync(f.fileno())
+
+    def _recover_fold(self, edits, f):
+        """Finish a fold that committed, or throw away one that didn't; needs both locks."""
+        records = edits.records(f)
+        folds = [i for i, record in enumerate(records) if record['op'] == 'fold']
+        if folds:
+            self._finish_fold(edits, f, records[folds[-1]], records[folds[-1] + 1:])
+        elif os.path.exists(edits.fold_path):
+            os.remove(edits.fold_path)
+            if self._has_archive():
+                # Drops partition files the fold wrote but never committed
+                self.archive().recover(self.path)
+
+    def _recover_edits(self):
+        with self.journal.locked_csv():
+            edits = self.edits()
+            with edits.locked() as f:
+                self._recover_fold(edits, f)
+
+class SqliteStorage(Storage):
+    """Entries and projects in a SQLite database in WAL mode.
+
+    WAL lets the report and export paths read while the scheduler writes, each
+    batch of rows is inserted in one transaction, and indexes on start time and
+    project keep range and aggregate queries from scanning the whole table.
+    """
+    name = "SQLite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            id INTEGER PRIMARY KEY,
+            subject TEXT NOT NULL,
+            project TEXT NOT NULL,
+            start_minute INTEGER NOT NULL,
+            end_minute INTEGER NOT NULL,
+            description TEXT NOT NULL DEFAULT ''
+        );
+        CREATE INDEX IF NOT EXISTS entries_start ON entries (start_minute);
+        CREATE INDEX IF NOT EXISTS entries_project ON entries (project, start_minute);
+        CREATE TABLE IF NOT EXISTS projects (
+            position INTEGER PRIMARY KEY,
+            name TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path=DB_FILE, synchronous='NORMAL'):
+        self.path = path
+        self.synchronous = synchronous
+        # sqlite3 connections belong to the thread that opened them
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            try:
+                conn = sqlite3.connect(self.path)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(f"PRAGMA synchronous={self.synchronous}")
+                conn.executescript(self.SCHEMA)
+            except sqlite3.Error as e:
+                raise StorageError(f"Could not open {self.path}: {e}")
+            self._local.conn = conn
+        return conn
+
+    def initialize(self):
+        created = not os.path.exists(self.path)
+        self._connection()
+        return created
+
+    def append_rows(self, rows):
+        values = []
+        for row in rows:
+            start, end = row_minutes(row)
+            subject = row['Subject']
+            values.append((subject, project_from_subject(subject), start, end, row.get('Description') or ''))
+        try:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT INTO entries (subject, project, start_minute, end_minute, description) "
+                    "VALUES (?, ?, ?, ?, ?)", values
+                )
+        except sqlite3.Error as e:
+            raise StorageError(f"Could not save entries to {self.path}: {e}")
+        return None
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def load_projects(self):
+        rows = self._connection().execute("SELECT name FROM projects ORDER BY position").fetchall()
+        return [name for (name,) in rows] or None
+
+    def projects_signature(self):
+        # data_version moves when another connection commits, total_changes when this one does
+        conn = self._connection()
+        return conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes
+
+    def save_projects(self, projects):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM projects")
+            conn.executemany(
+                "INSERT INTO projects (position, name) VALUES (?, ?)", enumerate(projects)
+            )
+
+    def _where(self, start_date, end_date):
+        low, high = _minute_range(start_date, end_date)
+        clauses, params = [], []
+        if low is not None:
+            clauses.append("start_minute >= ?")
+            params.append(low)
+        if high is not None:
+            clauses.append("start_minute < ?")
+            params.append(high)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def iter_rows(self, start_date=None, end_date=None):
+        where, params = self._where(start_date, end_date)
+        cursor = self._connection().execute(
+            "SELECT subject, start_minute, end_minute, description FROM entries"
+            + where + " ORDER BY start_minute, id", params
+        )
+        for subject, start_minute, end_minute, description in cursor:
+            yield _sql_row(subject, start_minute, end_minute, description)
+
+    def rows_since(self, watermark):
+        # The watermark is the last exported entry id
+        cursor = self._connection().execute(
+            "SELECT id, subject, start_minute, end_minute, description FROM entries "
+            "WHERE id > ? ORDER BY id", (watermark,)
+        )
+        rows = []
+        for entry_id, subject, start_minute, end_minute, description in cursor:
+            rows.append(_sql_row(subject, start_minute, end_minute, description))
+            watermark = entry_id
+        return rows, watermark
+
+    def build_report(self, start_date=None, end_date=None, workers=None):
+        # Let SQLite do the per-day grouping; only weeks are folded in Python
+        where, params = self._where(start_date, end_date)
+        where += (" AND " if where else " WHERE ") + "end_minute > start_minute"
+        cursor = self._connection().execute(
+            "SELECT project, start_minute / 1440 AS day, SUM(end_minute - start_minute), COUNT(*) "
+            "FROM entries" + where + " GROUP BY day, project", params
+        )
+        totals = ReportTotals()
+        for project, day, minutes, count in cursor:
+            totals.add(project, datetime.date.fromordinal(day + EPOCH_ORDINAL), minutes, count)
+        return totals
+
+    def entry_count(self):
+        return self._connection().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def entries_signature(self):
+        return tuple(self._connection().execute("SELECT COUNT(*), MAX(id) FROM entries").fetchone())
+
+    def signature_after_append(self, signature, rows):
+        # New rows get the ids after the largest one
+        count, last_id = signature
+        return count + len(rows), (last_id or 0) + len(rows)
+
+    def migrate_from_csv(self, csv_path=CSV_FILE, projects_path=PROJECTS_FILE):
+        """One-shot import of an existing CSV and projects file; return rows imported.
+
+        Refuses to run twice into a database that already has entries, so a
+        repeated migration can't duplicate history.
+        """
+        if self.entry_count():
+            raise StorageError(f"{self.path} already has entries; not migrating again")
+
+        values = []
+        if not os.path.exists(csv_path):
+            raise StorageError(f"{csv_path} does not exist")
+        # Read through CsvStorage so archived months and journaled rows come along too
+        for row in CsvStorage(csv_path).iter_rows():
+            row = dict(zip(CSV_HEADERS, row))
+            try:
+                start, end = row_minutes(row)
+            except StorageError:
+                continue
+            subject = row['Subject']
+            values.append((subject, project_from_subject(subject), start, end, row.get('Description') or ''))
+
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT INTO entries (subject, project, start_minute, end_minute, description) "
+                "VALUES (?, ?, ?, ?, ?)", values
+            )
+        if os.path.exists(projects_path):
+            with open(projects_path) as f:
+                self.save_projects(json.load(f))
+        return len(values)
+
+class BinaryStorage(Storage):
+    """Entries in the compact binary EntryStore, projects in PROJECTS_FILE."""
+    name = "Binary store"
+
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+        self._store = None
+        self._lock = threading.Lock()
+
+    def _entry_store(self):
+        if self._store is None:
+            self._store = EntryStore(self.path)
+        return self._store
+
+    def initialize(self):
+        created = not os.path.exists(self.path)
+        self._entry_store()
+        return created
+
+    def append_rows(self, rows):
+        entries = []
+        for row in rows:
+            start, end = row_minutes(row)
+            entries.append((project_from_subject(row['Subject']), start, end))
+        with self._lock:
+            self._entry_store().extend_minutes(entries)
+        return None
+
+    def iter_rows(self, start_date=None, end_date=None):
+        low, high = _minute_range(start_date, end_date)
+        with self._lock:
+            store = self._entry_store()
+            rows = [
+                list(row) for row, start in zip(store.iter_csv_rows(), store.starts)
+                if (low is None or start >= low) and (high is None or start < high)
+            ]
+        return iter(rows)
+
+    def entries_signature(self):
+        # Records are only ever appended, by this process or another
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return None
+
+    def signature_after_append(self, signature, rows):
+        return (signature or 0) + len(rows) * _RECORD_SIZE
+
+    def rows_since(self, watermark):
+        # The watermark is a record count; records are only ever appended
+        with self._lock:
+            store = self._entry_store()
+            if watermark > len(store):
+                watermark = 0
+            return [list(row) for row in store.iter_csv_rows(watermark)], len(store)
+
+_BACKENDS = {'csv': CsvStorage, 'sqlite': SqliteStorage, 'binary': BinaryStorage}
+_storage = {}
+
+def get_storage(backend=None):
+    """Return the shared storage for a backend name (default STORAGE_BACKEND)."""
+    backend = backend or STORAGE_BACKEND
+    if backend not in _storage:
+        if backend not in _BACKENDS:
+            raise StorageError(f"Unknown storage backend '{backend}'; use one of {', '.join(_BACKENDS)}")
+        _storage[backend] = _BACKENDS[backend]()
+    return _storage[backend]
@@ -0,0 +1,204 @@
+"""Compact binary entry store: fixed-width records plus an interned project table."""
+import csv
+import datetime
+import json
+import os
+import sys
+from array import array
+
+from timetracking_core import (
+    CSV_FILE, CSV_HEADERS, EPOCH_ORDINAL, csv_epoch_minutes, from_epoch_minutes, to_epoch_minutes
+)
+from timetracking_reports import project_from_subject
+
+STORE_FILE = 'timetracking_entries.bin'
+
+# Each record is three little-endian int32s: project id, start minute, end minute
+_FIELDS = 3
+_RECORD_SIZE = _FIELDS * 4
+
+# Preformatted "HH:MM" strings for every minute of the day
+_TIMES = [f"{minute // 60:02d}:{minute % 60:02d}" for minute in range(1440)]
+
+class TimeEntry:
+    """One entry: an interned project name and start/end minutes since the epoch."""
+    __slots__ = ('project', 'start_minute', 'end_minute')
+
+    def __init__(self, project, start_minute, end_minute):
+        self.project = project
+        self.start_minute = start_minute
+        self.end_minute = end_minute
+
+    def __repr__(self):
+        return f"TimeEntry({self.project!r}, {self.start!r}, {self.end!r})"
+
+    def __eq__(self, other):
+        if not isinstance(other, TimeEntry):
+            return NotImplemented
+        return (self.project, self.start_minute, self.end_minute) == (
+            other.project, other.start_minute, other.end_minute)
+
+    @property
+    def start(self):
+        return from_epoch_minutes(self.start_minute)
+
+    @property
+    def end(self):
+        return from_epoch_minutes(self.end_minute)
+
+    @property
+    def minutes(self):
+        return self.end_minute - self.start_minute
+
+class EntryStore:
+    """Entries kept as three array columns and persisted as fixed-width records.
+
+    Project names are stored once in a sidecar table (one JSON string per line)
+    and referenced by id, so an entry costs 12 bytes on disk and in memory
+    instead of a ~100 byte CSV row. The Google Calendar CSV is generated from
+    the store on demand with export_csv().
+    """
+
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+        self.projects_path = path + '.projects'
+        self.projects = []
+        self._project_ids = {}
+        self.project_ids = array('i')
+        self.starts = array('i')
+        self.ends = array('i')
+        self._load()
+
+    def _load(self):
+        """Read the project table and records, dropping any torn tail left by a crash."""
+        if os.path.exists(self.projects_path):
+            with open(self.projects_path, 'rb+') as f:
+                data = f.read()
+                complete = data.rfind(b'\n') + 1
+                if complete != len(data):
+                    f.truncate(complete)
+            for line in data[:complete].decode('utf-8').splitlines():
+                self._add_project(json.loads(line))
+
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            complete = len(data) - len(data) % _RECORD_SIZE
+            if complete != len(data):
+                f.truncate(complete)
+
+        records = array('i')
+        records.frombytes(data[:complete])
+        if sys.byteorder == 'big':
+            records.byteswap()
+        self.project_ids = records[0::_FIELDS]
+        self.starts = records[1::_FIELDS]
+        self.ends = records[2::_FIELDS]
+
+        if any(project_id >= len(self.projects) for project_id in self.project_ids):
+            # Records whose project never reached the table can't be shown; drop them
+            keep = [i for i, project_id in enumerate(self.project_ids) if project_id < len(self.projects)]
+            self.project_ids = array('i', (self.project_ids[i] for i in keep))
+            self.starts = array('i', (self.starts[i] for i in keep))
+            self.ends = array('i', (self.ends[i] for i in keep))
+
+    def _add_project(self, name):
+        name = sys.intern(name)
+        self._project_ids[name] = len(self.projects)
+        self.projects.append(name)
+
+    def __len__(self):
+        return len(self.project_ids)
+
+    def __getitem__(self, i):
+        return TimeEntry(self.projects[self.project_ids[i]], self.starts[i], self.ends[i])
+
+    def __iter__(self):
+        projects = self.projects
+        for project_id, start, end in zip(self.project_ids, self.starts, self.ends):
+            yield TimeEntry(projects[project_id], start, end)
+
+    def append(self, project, start_time, end_time):
+        """Add one entry given its project name and start/end datetimes."""
+        self.extend_minutes([(project, to_epoch_minutes(start_time), to_epoch_minutes(end_time))])
+
+    def extend_minutes(self, entries):
+        """Add (project, start minute, end minute) entries with a single write per file."""
+        new_projects = []
+        records = array('i')
+        for project, start, end in entries:
+            project_id = self._project_ids.get(project)
+            if project_id is None:
+                project_id = len(self.projects)
+                self._add_project(project)
+                new_projects.append(project)
+            records.extend((project_id, start, end))
+        if not records:
+            return
+
+        # Names go to disk first so a record never points at a missing project
+        if new_projects:
+            with open(self.projects_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(name) + '\n' for name in new_projects))
+        self.project_ids.extend(records[0::_FIELDS])
+        self.starts.extend(records[1::_FIELDS])
+        self.ends.extend(records[2::_FIELDS])
+        if sys.byteorder == 'big':
+            records.byteswap()
+        with open(self.path, 'ab') as f:
+            f.write(records.tobytes())
+
+    def between(self, start_date, end_date):
+        """Yield entries whose start date falls between two dates (inclusive)."""
+        low = (start_date.toordinal() - EPOCH_ORDINAL) * 1440
+        high = (end_date.toordinal() - EPOCH_ORDINAL + 1) * 1440
+        projects = self.projects
+        for project_id, start, end in zip(self.project_ids, self.starts, self.ends):
+            if low <= start < high:
+                yield TimeEntry(projects[project_id], start, end)
+
+    def iter_csv_rows(self, first=0):
+        """Yield rows in the CSV_HEADERS layout from record first on, formatting each day's date only once."""
+        dates = {}
+        projects = self.projects
+        columns = (self.project_ids, self.starts, self.ends)
+        if first:
+            columns = [column[first:] for column in columns]
+        for project_id, start, end in zip(*columns):
+            project = projects[project_id]
+            start_day, start_minute = divmod(start, 1440)
+            end_day, end_minute = divmod(end, 1440)
+            start_date = dates.get(start_day)
+            if start_date is None:
+                start_date = dates[start_day] = _format_day(start_day)
+            end_date = dates.get(end_day)
+            if end_date is None:
+                end_date = dates[end_day] = _format_day(end_day)
+            yield (f"Timetracking: {project}", start_date, _TIMES[start_minute],
+                   end_date, _TIMES[end_minute], f"Time tracking for {project}")
+
+    def export_csv(self, path=CSV_FILE):
+        """Write the whole store as a Google Calendar CSV."""
+        with open(path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(CSV_HEADERS)
+            writer.writerows(self.iter_csv_rows())
+
+    def import_csv(self, path=CSV_FILE):
+        """Append every parseable row of an entries CSV to the store; return the count."""
+        entries = []
+        with open(path, newline='') as csvfile:
+            for row in csv.DictReader(csvfile):
+                try:
+                    start = csv_epoch_minutes(row['Start Date'], row['Start Time'])
+                    end = csv_epoch_minutes(row['End Date'], row['End Time'])
+                except (AttributeError, ValueError):
+                    continue
+                entries.append((project_from_subject(row['Subject']), start, end))
+        self.extend_minutes(entries)
+        return len(entries)
+
+def _format_day(day):
+    """Format days since the epoch as the CSV's MM/DD/YYYY."""
+    return datetime.date.fromordinal(day + EPOCH_ORDINAL).strftime("%m/%d/%Y")
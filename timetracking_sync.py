@@ -0,0 +1,370 @@
+"""Two-way sync of entries between trackers, one day at a time.
+
+Each side describes its entries as a manifest of day hashes: for every day
+with entries, an order-independent hash of the day's entries normalized to
+(project, start, end). Only the days whose hashes differ are read and
+written, so a sync costs about the same however long the history is.
+
+The other side is either another tracker's folder (with its own
+timetracking_entries.csv) or a sync folder, e.g. in Dropbox, holding a
+manifest.json and one small CSV per day that each machine syncs with.
+
+After a sync both sides hold the same entries on every day. The hashes
+agreed on are kept in timetracking_sync_state.json, so the next sync can
+tell which side changed a day: that side's version wins, deletions
+included. A day changed on both sides is merged by keeping every entry
+from either side once, which gives the same result whichever machine runs
+the sync; entries of the merge that overlap are reported.
+"""
+import contextlib
+import csv
+import datetime
+import hashlib
+import io
+import json
+import os
+
+from timetracking_core import CSV_FILE, CSV_HEADERS, csv_epoch_minutes, from_epoch_minutes
+from timetracking_index import START_DATE_COLUMN, iter_csv_records, parse_csv_date
+from timetracking_reports import Entry, project_from_subject
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks on Windows; don't run two syncs into one folder at once there
+    fcntl = None
+
+SYNC_STATE_FILE = 'timetracking_sync_state.json'
+_VERSION = 1
+_HASH_MODULUS = 1 << 128
+
+def normalize(row):
+    """Return (project, start minute, end minute) for a stored row, or None if it's malformed."""
+    try:
+        start = csv_epoch_minutes(row[1], row[2])
+        end = csv_epoch_minutes(row[3], row[4])
+    except (IndexError, ValueError):
+        return None
+    return project_from_subject(row[0]).strip(), start, end
+
+def _entry_hash(entry):
+    key = f"{entry[0]}\x1f{entry[1]}\x1f{entry[2]}".encode('utf-8')
+    return int.from_bytes(hashlib.sha1(key).digest()[:16], 'big')
+
+def _format_hash(total, count):
+    return f"{total:032x}-{count}"
+
+def day_hash(rows):
+    """Return the hash of one day's rows, or None if it has none."""
+    entries = [entry for entry in map(normalize, rows) if entry is not None]
+    if not entries:
+        return None
+    return _format_hash(sum(map(_entry_hash, entries)) % _HASH_MODULUS, len(entries))
+
+def _order(entry):
+    return entry[1], entry[2], entry[0]
+
+def merge_days(local_rows, remote_rows):
+    """Return (merged rows, overlapping pairs of normalized entries) for a day changed on both sides.
+
+    Every entry from either side is kept, an entry on both sides only as
+    often as the side with more copies has it (with that side's rows, so
+    descriptions travel along; on a tie, the rows that sort last), sorted by
+    start time. Overlaps between an
+    entry only one side had and one only the other had are returned as pairs.
+    """
+    local = _group(local_rows)
+    remote = _group(remote_rows)
+    merged = []
+    for entry in sorted(set(local) | set(remote), key=_order):
+        # Compared whole, so every machine picks the same side
+        merged.extend(max(local.get(entry, []), remote.get(entry, []),
+                          key=lambda copies: (len(copies), sorted(copies))))
+    local_only = [entry for entry in local if entry not in remote]
+    remote_only = [entry for entry in remote if entry not in local]
+    overlaps = [(a, b) for a in local_only for b in remote_only if a[1] < b[2] and b[1] < a[2]]
+    return merged, overlaps
+
+def _group(rows):
+    groups = {}
+    for row in rows:
+        entry = normalize(row)
+        if entry is not None:
+            groups.setdefault(entry, []).append(row)
+    return groups
+
+def _count(rows):
+    return {entry: len(copies) for entry, copies in _group(rows).items()}
+
+class DayHashes:
+    """Day hashes of a CsvStorage, kept in a file next to it and brought up to date incrementally.
+
+    The saved hashes cover the archive and the CSV up to a byte offset, so
+    only rows appended since are read. Days with edits are rehashed from
+    their resolved rows each time. When the CSV is replaced (by a fold) or
+    the archive changes, everything is hashed again.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.path = os.path.splitext(storage.path)[0] + '_days.json'
+
+    def _stamp(self):
+        storage = self.storage
+        archive = None
+        if storage._has_archive():
+            stat = os.stat(storage.archive().manifest_path)
+            archive = [stat.st_size, stat.st_mtime_ns]
+        try:
+            inode = os.stat(storage.path).st_ino
+        except OSError:
+            inode = None
+        return archive, inode
+
+    def _load(self, archive, inode):
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if saved.get('version') != _VERSION or saved.get('archive') != archive or saved.get('inode') != inode:
+            return None
+        return saved
+
+    def _add(self, days, rows):
+        for row in rows:
+            entry = normalize(row)
+            date = parse_csv_date(row[START_DATE_COLUMN]) if entry is not None else None
+            if date is None:
+                continue
+            total, count = days.get(date.isoformat(), (0, 0))
+            days[date.isoformat()] = [(total + _entry_hash(entry)) % _HASH_MODULUS, count + 1]
+
+    def manifest(self):
+        """Return {'YYYY-MM-DD': day hash} for every day with entries."""
+        storage = self.storage
+        archive, inode = self._stamp()
+        pending, csv_size = storage.journal.snapshot()
+        saved = self._load(archive, inode)
+        if saved is None or saved['offset'] > csv_size:
+            days, offset = {}, 0
+            if storage._has_archive():
+                self._add(days, storage.archive().iter_rows())
+        else:
+            days, offset = saved['days'], saved['offset']
+        if offset < csv_size and os.path.exists(storage.path):
+            with open(storage.path, 'rb') as f:
+                f.seek(offset)
+                self._add(days, (row for position, row in iter_csv_records(f)
+                                 if position < csv_size and row != CSV_HEADERS))
+            offset = csv_size
+        if saved is None or saved['offset'] != offset:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': _VERSION, 'archive': archive, 'inode': inode,
+                           'offset': offset, 'days': days}, f)
+            os.replace(tmp_path, self.path)
+
+        if pending:
+            days = {day: list(value) for day, value in days.items()}
+            self._add(days, pending)
+        manifest = {day: _format_hash(total, count) for day, (total, count) in days.items()}
+        if storage._has_edits():
+            _, dates, _ = storage.edits().state()
+            for value in dates:
+                date = parse_csv_date(value)
+                if date is None:
+                    continue
+                rehashed = day_hash(storage.iter_rows(date, date))
+                if rehashed is None:
+                    manifest.pop(date.isoformat(), None)
+                else:
+                    manifest[date.isoformat()] = rehashed
+        return manifest
+
+class StorePeer:
+    """A tracker's CSV storage as one side of a sync.
+
+    Entries are added through writer, an EntryWriter on the storage, when
+    one is given, so its listeners see them as they would any other entry.
+    """
+
+    def __init__(self, storage, writer=None):
+        self.storage = storage
+        self.writer = writer
+        self.name = os.path.abspath(storage.path)
+
+    @contextlib.contextmanager
+    def locked(self):
+        # The journal and edit log lock each write. A fold would give edited
+        # entries new ids between finding and deleting them, so none starts
+        # until the sync is over
+        with self.storage.folds_suspended():
+            yield self
+
+    def manifest(self):
+        return DayHashes(self.storage).manifest()
+
+    def read_day(self, date):
+        return list(self.storage.iter_rows(date, date))
+
+    def write_day(self, date, rows):
+        """Make the day's entries exactly these rows' entries, keeping stored rows that match one."""
+        wanted = _group(rows)
+        deleted = []
+        for entry_id, row in self.storage.find_entries(date, date):
+            copies = wanted.get(normalize(row))
+            if copies:
+                copies.pop()
+            else:
+                deleted.append(entry_id)
+        self.storage.delete_entries(deleted)
+        added = [dict(zip(CSV_HEADERS, row)) for copies in wanted.values() for row in copies]
+        if added and self.writer is not None:
+            self.writer.submit(added).result()
+        elif added:
+            self.storage.append_rows(added)
+
+    def close(self):
+        self.storage.flush()
+
+class FolderPeer:
+    """A sync folder: manifest.json plus one CSV per day under days/YYYY-MM/."""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.abspath(path)
+        self.manifest_path = os.path.join(path, 'manifest.json')
+        self._days = None
+        self._dirty = False
+
+    @contextlib.contextmanager
+    def locked(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, '.lock'), 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            yield self
+
+    def _day_path(self, date):
+        return os.path.join(self.path, 'days', f"{date:%Y-%m}", f"{date:%Y-%m-%d}.csv")
+
+    def manifest(self):
+        if self._days is None:
+            try:
+                with open(self.manifest_path) as f:
+                    self._days = json.load(f)['days']
+            except (OSError, ValueError, KeyError):
+                self._days = {}
+        return dict(self._days)
+
+    def read_day(self, date):
+        try:
+            with open(self._day_path(date), newline='', encoding='utf-8') as f:
+                return [row for row in csv.reader(f) if row and row != CSV_HEADERS]
+        except FileNotFoundError:
+            return []
+
+    def write_day(self, date, rows):
+        path = self._day_path(date)
+        if rows:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(CSV_HEADERS)
+            writer.writerows(rows)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+                f.write(buffer.getvalue())
+            os.replace(tmp_path, path)
+            self._days[date.isoformat()] = day_hash(rows)
+        else:
+            if os.path.exists(path):
+                os.remove(path)
+            self._days.pop(date.isoformat(), None)
+        self._dirty = True
+
+    def close(self):
+        # Written last: a sync that stops halfway leaves hashes that point the next one at those days
+        if self._dirty:
+            tmp_path = self.manifest_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': _VERSION, 'days': self._days}, f, sort_keys=True)
+            os.replace(tmp_path, self.manifest_path)
+            self._dirty = False
+
+def open_peer(path):
+    """Return the peer for a tracker folder (one with an entries CSV) or a sync folder."""
+    csv_path = os.path.join(path, CSV_FILE)
+    if os.path.exists(csv_path):
+        from timetracking_storage import CsvStorage
+        storage = CsvStorage(csv_path, partition_by_month=False)
+        storage.initialize()
+        return StorePeer(storage)
+    return FolderPeer(path)
+
+def _read_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+class SyncResult:
+    def __init__(self):
+        self.pulled = []      # Days taken from the other side
+        self.pushed = []      # Days sent to the other side
+        self.merged = []      # Days changed on both sides
+        self.overlaps = []    # (date, local Entry, remote Entry) that overlap after merging
+
+def sync(local, remote, state_path=SYNC_STATE_FILE, dry_run=False):
+    """Bring two peers to the same entries on every day; return a SyncResult."""
+    result = SyncResult()
+    with local.locked(), remote.locked():
+        state = _read_state(state_path)
+        base = state.get(remote.name, {})
+        local_days = local.manifest()
+        remote_days = remote.manifest()
+        agreed = dict(local_days)
+        for day in sorted(set(local_days) | set(remote_days)):
+            local_hash, remote_hash = local_days.get(day), remote_days.get(day)
+            if local_hash == remote_hash:
+                continue
+            date = datetime.date.fromisoformat(day)
+            local_rows = local.read_day(date)
+            remote_rows = remote.read_day(date)
+            if local_hash == base.get(day):
+                rows, target, changed = _sorted_rows(remote_rows), local, result.pulled
+            elif remote_hash == base.get(day):
+                rows, target, changed = _sorted_rows(local_rows), remote, result.pushed
+            else:
+                rows, overlaps = merge_days(local_rows, remote_rows)
+                target, changed = None, result.merged
+                result.overlaps.extend((date, _as_entry(a), _as_entry(b)) for a, b in overlaps)
+            changed.append(date)
+            if not dry_run:
+                for peer, peer_rows in ((local, local_rows), (remote, remote_rows)):
+                    if (target is None or peer is target) and _count(peer_rows) != _count(rows):
+                        peer.write_day(date, rows)
+            merged_hash = day_hash(rows)
+            if merged_hash is None:
+                agreed.pop(day, None)
+            else:
+                agreed[day] = merged_hash
+        if not dry_run:
+            local.close()
+            remote.close()
+            state[remote.name] = agreed
+            tmp_path = state_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f, sort_keys=True)
+            os.replace(tmp_path, state_path)
+    return result
+
+def _as_entry(entry):
+    return Entry(entry[0], from_epoch_minutes(entry[1]), from_epoch_minutes(entry[2]))
+
+def _sorted_rows(rows):
+    """Return the rows with an entry, sorted by start time."""
+    keyed = [(entry, row) for entry, row in zip(map(normalize, rows), rows) if entry is not None]
+    return [row for _, row in sorted(keyed, key=lambda item: _order(item[0]))]
@@ -0,0 +1,287 @@
+"""Columnar aggregation over one or more entries CSVs, vectorized with NumPy when available."""
+import csv
+import datetime
+from array import array
+
+from timetracking_core import CSV_FILE, CSV_HEADERS, EPOCH_ORDINAL, csv_epoch_minutes
+from timetracking_reports import project_from_subject
+
+try:
+    import numpy as np
+except ImportError:
+    # Everything below still works without NumPy, just row by row in Python
+    np = None
+
+_COLUMNS = [
+    CSV_HEADERS.index(name)
+    for name in ('Subject', 'Start Date', 'Start Time', 'End Date', 'End Time')
+]
+
+def has_numpy():
+    """Return True if the vectorized NumPy backend is available."""
+    return np is not None
+
+def _read_columns(paths):
+    """Read Subject and the four date/time columns from each CSV as tuples of strings."""
+    rows = []
+    for path in paths:
+        with open(path, newline='') as csvfile:
+            # Concatenated exports repeat the header, so skip it wherever it appears
+            rows.extend(
+                [row[i] for i in _COLUMNS]
+                for row in csv.reader(csvfile)
+                if len(row) >= len(_COLUMNS) and row != CSV_HEADERS
+            )
+    if not rows:
+        return [(), (), (), (), ()]
+    return list(zip(*rows))
+
+def _encode_projects(subjects):
+    """Dictionary-encode subjects (str, or raw UTF-8 bytes) into (project codes, project names)."""
+    subject_codes = {}
+    codes = [subject_codes.setdefault(subject, len(subject_codes)) for subject in subjects]
+
+    # Different subjects can name the same project (with and without the prefix)
+    project_codes = {}
+    remap = []
+    for subject in subject_codes:
+        if isinstance(subject, bytes):
+            subject = subject.decode('utf-8')
+        remap.append(project_codes.setdefault(project_from_subject(subject), len(project_codes)))
+    return [remap[code] for code in codes], list(project_codes)
+
+_MONTH_DAYS = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]) if np is not None else None
+
+# Byte layout that follows the Subject column in every row the writer produces:
+# MM/DD/YYYY,HH:MM,MM/DD/YYYY,HH:MM then a comma before the Description.
+_STAMP_LENGTH = 34
+_STAMP_SEPARATORS = [
+    (2, b'/'), (5, b'/'), (10, b','), (13, b':'), (16, b','),
+    (19, b'/'), (22, b'/'), (27, b','), (30, b':'),
+]
+_STAMP_DIGITS = [0, 1, 3, 4, 6, 7, 8, 9, 11, 12, 14, 15, 17, 18, 20, 21, 23, 24, 25, 26, 28, 29, 31, 32]
+
+def _vector_epoch_minutes(digit, date_at, time_at):
+    """Vectorized csv_epoch_minutes() over digits read by digit(position); returns (minutes, valid)."""
+    month = digit(date_at) * 10 + digit(date_at + 1)
+    day = digit(date_at + 3) * 10 + digit(date_at + 4)
+    year = (digit(date_at + 6) * 1000 + digit(date_at + 7) * 100
+            + digit(date_at + 8) * 10 + digit(date_at + 9))
+    hours = digit(time_at) * 10 + digit(time_at + 1)
+    minutes = digit(time_at + 3) * 10 + digit(time_at + 4)
+
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_days = _MONTH_DAYS[np.clip(month - 1, 0, 11)] + ((month == 2) & leap)
+    valid = (
+        (month >= 1) & (month <= 12) & (day >= 1) & (day <= month_days) & (year >= 1)
+        & (hours <= 23) & (minutes <= 59)
+    )
+
+    # Days since the epoch from a civil date (Howard Hinnant's days_from_civil)
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * np.where(month > 2, month - 3, month + 9) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    days = era * 146097 + day_of_era - 719468
+    return days * 1440 + hours * 60 + minutes, valid
+
+def _scan_file(path):
+    """Split a CSV into vectorized columns for regular rows plus parsed irregular rows.
+
+    Returns (subjects, starts, ends, slow_rows) where subjects are raw bytes for
+    the rows parsed with NumPy and slow_rows holds (subject, start, end) for
+    lines csv had to handle, or None if the file needs csv from start to end.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    size = len(data)
+    # Padding keeps every fixed-offset read in bounds, even on the last line
+    buf = np.frombuffer(data + b'\0' * (_STAMP_LENGTH + 1), dtype=np.uint8)
+    body = buf[:size]
+
+    ends = np.flatnonzero(body == ord('\n'))
+    if size and data[-1:] != b'\n':
+        ends = np.append(ends, size)
+    starts = np.concatenate(([0], ends[:-1] + 1)).astype(np.int64)
+    line_ends = ends - (buf[np.maximum(ends - 1, 0)] == ord('\r'))
+
+    quotes = np.flatnonzero(body == ord('"'))
+    quoted = np.zeros(len(starts), dtype=bool)
+    if len(quotes):
+        per_line = np.searchsorted(quotes, ends) - np.searchsorted(quotes, starts)
+        if (per_line % 2).any():
+            # A quoted field spans lines; only csv can split that correctly
+            return None
+        quoted = per_line > 0
+
+    commas = np.flatnonzero(body == ord(','))
+    if not len(commas):
+        commas = np.array([size], dtype=np.int64)
+    first_comma = commas[np.minimum(np.searchsorted(commas, starts), len(commas) - 1)]
+    stamp = first_comma + 1
+    regular = ~quoted & (first_comma >= starts) & (stamp + _STAMP_LENGTH - 1 <= line_ends)
+    stamp = np.where(regular, stamp, 0)
+    end_byte = buf[stamp + _STAMP_LENGTH - 1]
+    regular &= (end_byte == ord(',')) | (stamp + _STAMP_LENGTH - 1 == line_ends)
+    for position, separator in _STAMP_SEPARATORS:
+        regular &= buf[stamp + position] == separator[0]
+    for position in _STAMP_DIGITS:
+        regular &= (buf[stamp + position] - ord('0')) <= 9
+
+    digit = lambda position: buf[stamp + position].astype(np.int64) - ord('0')
+    start_minutes, valid_start = _vector_epoch_minutes(digit, 0, 11)
+    end_minutes, valid_end = _vector_epoch_minutes(digit, 17, 28)
+    fast = regular & valid_start & valid_end
+
+    subjects = [data[start:end] for start, end in zip(starts[fast].tolist(), first_comma[fast].tolist())]
+
+    slow_rows = []
+    for i in np.flatnonzero(~fast).tolist():
+        line = data[starts[i]:line_ends[i]].decode('utf-8')
+        for row in csv.reader([line]):
+            if len(row) < len(_COLUMNS) or row == CSV_HEADERS:
+                continue
+            subject, start_date, start_time, end_date, end_time = (row[c] for c in _COLUMNS)
+            try:
+                slow_rows.append((subject, csv_epoch_minutes(start_date, start_time),
+                                  csv_epoch_minutes(end_date, end_time)))
+            except ValueError:
+                pass
+    return subjects, start_minutes[fast], end_minutes[fast], slow_rows
+
+class EntryColumns:
+    """Entries stored column-wise: project codes plus start/end minutes since the epoch.
+
+    With NumPy the columns are int32/int64 arrays and every aggregate is a
+    vectorized operation; without it they are array.array columns summed in
+    plain Python, which gives the same answers more slowly.
+    """
+
+    def __init__(self, projects, codes, starts, ends):
+        self.projects = projects
+        self.codes = codes
+        self.starts = starts
+        self.ends = ends
+        self.vectorized = np is not None and isinstance(codes, np.ndarray)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def durations(self):
+        """Return each entry's length in minutes."""
+        if self.vectorized:
+            return self.ends - self.starts
+        return array('q', (end - start for start, end in zip(self.starts, self.ends)))
+
+    def project_minutes(self):
+        """Return {project: total minutes}."""
+        if self.vectorized:
+            sums = np.bincount(self.codes, weights=self.durations(), minlength=len(self.projects))
+            return {project: int(total) for project, total in zip(self.projects, sums)}
+        totals = [0] * len(self.projects)
+        for code, minutes in zip(self.codes, self.durations()):
+            totals[code] += minutes
+        return dict(zip(self.projects, totals))
+
+    def project_hours(self):
+        """Return {project: hours}, largest first (same ordering as ReportTotals)."""
+        return {
+            project: minutes / 60
+            for project, minutes in sorted(self.project_minutes().items(), key=lambda kv: (-kv[1], kv[0]))
+        }
+
+    def day_minutes(self):
+        """Return {date: total minutes}, keyed by each entry's start date."""
+        if self.vectorized:
+            days = self.starts // 1440
+            unique_days, inverse = np.unique(days, return_inverse=True)
+            sums = np.bincount(inverse, weights=self.durations())
+            return {
+                datetime.date.fromordinal(int(day) + EPOCH_ORDINAL): int(total)
+                for day, total in zip(unique_days, sums)
+            }
+        totals = {}
+        for start, minutes in zip(self.starts, self.durations()):
+            day = start // 1440
+            totals[day] = totals.get(day, 0) + minutes
+        return {
+            datetime.date.fromordinal(day + EPOCH_ORDINAL): total
+            for day, total in sorted(totals.items())
+        }
+
+    def duration_histogram(self, bin_minutes=30, max_minutes=480):
+        """Count entries by length in bins of bin_minutes; the last bin collects the rest."""
+        bins = max_minutes // bin_minutes + 1
+        if self.vectorized:
+            slots = np.minimum(self.durations() // bin_minutes, bins - 1)
+            return np.bincount(slots, minlength=bins).tolist()
+        counts = [0] * bins
+        for minutes in self.durations():
+            counts[min(minutes // bin_minutes, bins - 1)] += 1
+        return counts
+
+    def start_hour_histogram(self):
+        """Count entries by the hour of day they start in (24 bins)."""
+        if self.vectorized:
+            return np.bincount((self.starts % 1440) // 60, minlength=24).tolist()
+        counts = [0] * 24
+        for start in self.starts:
+            counts[(start % 1440) // 60] += 1
+        return counts
+
+def load_columns(paths=(CSV_FILE,), use_numpy=True):
+    """Load one or more entries CSVs into EntryColumns.
+
+    Rows that can't be parsed, or that end before they start, are skipped just
+    like the streaming report does.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    if np is not None and use_numpy:
+        return _load_vectorized(paths)
+
+    subjects, start_dates, start_times, end_dates, end_times = _read_columns(paths)
+    codes, projects = _encode_projects(subjects)
+    columns = EntryColumns(projects, array('i'), array('q'), array('q'))
+    for code, start_date, start_time, end_date, end_time in zip(
+            codes, start_dates, start_times, end_dates, end_times):
+        try:
+            start = csv_epoch_minutes(start_date, start_time)
+            end = csv_epoch_minutes(end_date, end_time)
+        except ValueError:
+            continue
+        if end > start:
+            columns.codes.append(code)
+            columns.starts.append(start)
+            columns.ends.append(end)
+    return columns
+
+def _load_vectorized(paths):
+    """NumPy path of load_columns(): parse timestamps straight from the file bytes."""
+    subjects, starts, ends = [], [], []
+    for path in paths:
+        scanned = _scan_file(path)
+        if scanned is None:
+            # Fall back to csv for the whole file, but keep NumPy for the aggregates
+            columns = load_columns([path], use_numpy=False)
+            subjects.extend(columns.projects[code] for code in columns.codes)
+            starts.append(np.asarray(columns.starts, dtype=np.int64))
+            ends.append(np.asarray(columns.ends, dtype=np.int64))
+            continue
+        file_subjects, file_starts, file_ends, slow_rows = scanned
+        subjects.extend(file_subjects)
+        starts.append(file_starts)
+        ends.append(file_ends)
+        if slow_rows:
+            slow_subjects, slow_starts, slow_ends = zip(*slow_rows)
+            subjects.extend(slow_subjects)
+            starts.append(np.array(slow_starts, dtype=np.int64))
+            ends.append(np.array(slow_ends, dtype=np.int64))
+
+    codes, projects = _encode_projects(subjects)
+    codes = np.array(codes, dtype=np.int32)
+    starts = np.concatenate(starts) if starts else np.zeros(0, dtype=np.int64)
+    ends = np.concatenate(ends) if ends else np.zeros(0, dtype=np.int64)
+    keep = ends > starts
+    return EntryColumns(projects, codes[keep], starts[keep], ends[keep])
@@ -0,0 +1,196 @@
+"""Background writer that appends entries to storage off the UI thread."""
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from enum import Enum
+
+from timetracking_core import CSV_FILE
+from timetracking_metrics import count, span
+from timetracking_storage import CsvStorage, get_storage
+
+class FlushPolicy(Enum):
+    BATCH = "batch"        # Flush after every batch of rows
+    INTERVAL = "interval"  # Flush at most once every flush_interval seconds
+    CLOSE = "close"        # Leave buffering to the OS until the writer closes
+
+# Marker put on the queue to stop the writer thread
+_STOP = object()
+
+class EntryWriter:
+    """Append entry rows to storage from a dedicated writer thread.
+
+    Rows are queued with submit() and written in batches by a single thread, so
+    each batch reaches the storage backend (the CSV journal by default) in one
+    write. Each submit() returns a Future that resolves to the
+    submitted rows once they have been written (and flushed or synced as the
+    policy requires), or to the error that stopped them.
+    """
+
+    def __init__(self, path=CSV_FILE, flush_policy=FlushPolicy.BATCH, fsync=False,
+                 flush_interval=5.0, max_batch=500, storage=None):
+        self.storage = storage or CsvStorage(path)
+        self.flush_policy = flush_policy
+        self.fsync = fsync
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._unreported = []
+
+    def add_listener(self, callback):
+        """Call callback(rows, offsets) on the writer thread after rows are flushed."""
+        self._listeners.append(callback)
+
+    def start(self):
+        """Start the writer thread if it isn't already running."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="EntryWriter", daemon=True
+                )
+                self._thread.start()
+        return self
+
+    def submit(self, rows):
+        """Queue one row or a list of rows and return a Future for the write."""
+        if isinstance(rows, dict):
+            rows = [rows]
+        future = Future()
+        self.start()
+        self._queue.put((list(rows), future))
+        return future
+
+    def close(self, timeout=None):
+        """Write everything still queued, close the file and stop the thread."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _run(self):
+        """Drain the queue in batches until asked to stop."""
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self._wait_timeout())
+            except queue.Empty:
+                self._flush_if_due()
+                continue
+
+            batch = []
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.max_batch:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write_batch(batch)
+        self._close_storage()
+
+    def _wait_timeout(self):
+        """How long the thread may block waiting for new rows."""
+        if self._dirty and self.flush_policy == FlushPolicy.INTERVAL:
+            return max(0.0, self._last_flush + self.flush_interval - time.monotonic())
+        return None
+
+    def _write_batch(self, batch):
+        """Write a batch of queued submissions with a single write call."""
+        rows = [row for submitted, _ in batch for row in submitted]
+        try:
+            with span('entry_write'):
+                offsets = self.storage.append_rows(rows) or [None] * len(rows)
+            count('entries_written', len(rows))
+            self._dirty = True
+            self._unreported.append((rows, offsets))
+            if self.flush_policy == FlushPolicy.BATCH:
+                self._flush()
+            else:
+                self._flush_if_due()
+        except Exception as e:
+            # Drop the handle so the next batch reopens the file; the thread keeps running
+            self._close_storage(discard=True)
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for submitted, future in batch:
+            future.set_result(submitted)
+
+    def _flush_if_due(self):
+        """Flush when the interval policy says it is time to."""
+        if (self._dirty and self.flush_policy == FlushPolicy.INTERVAL
+                and time.monotonic() - self._last_flush >= self.flush_interval):
+            try:
+                self._flush()
+            except Exception:
+                self._close_storage(discard=True)
+
+    def _flush(self):
+        """Flush buffered rows to the OS, and to disk if fsync is enabled."""
+        with span('entry_flush'):
+            self.storage.flush(self.fsync)
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self._notify_listeners()
+
+    def _notify_listeners(self):
+        """Tell listeners about rows that have reached the file since last time."""
+        unreported, self._unreported = self._unreported, []
+        if not self._listeners or not unreported:
+            return
+        rows = [row for batch_rows, _ in unreported for row in batch_rows]
+        offsets = [offset for _, batch_offsets in unreported for offset in batch_offsets]
+        for callback in self._listeners:
+            try:
+                callback(rows, offsets)
+            except Exception as e:
+                # A broken listener must never stop entries from being written
+                print(f"Entry writer listener failed: {e}")
+
+    def _close_storage(self, discard=False):
+        """Close the storage handles, flushing first unless they are being discarded."""
+        try:
+            if not discard and self._dirty:
+                self._flush()
+            self.storage.close()
+        except (IOError, OSError):
+            pass
+        self._dirty = False
+        self._unreported = []
+
+_default_writer = None
+
+def get_entry_writer():
+    """Return the shared entry writer (or the ingestion server client), creating it on first use."""
+    global _default_writer
+    if _default_writer is None and os.environ.get('TIMETRACKER_SERVER'):
+        # Entries go to a shared ingestion server rather than local storage
+        from timetracking_remote import RemoteEntryWriter
+        _default_writer = RemoteEntryWriter(os.environ['TIMETRACKER_SERVER'],
+                                            token=os.environ.get('TIMETRACKER_SERVER_TOKEN'))
+        atexit.register(_default_writer.close)
+    if _default_writer is None:
+        storage = get_storage()
+        _default_writer = EntryWriter(storage=storage)
+        if isinstance(storage, CsvStorage):
+            # Keep the date index in step with rows as they reach the CSV
+            from timetracking_index import get_date_index
+            storage.add_listener(get_date_index().on_rows_written)
+        atexit.register(_default_writer.close)
+    return _default_writer